@@ -97,7 +97,21 @@ class SleepRepository {
       formData: formData,
       token: token,
     );
-    return response.data ?? <String, dynamic>{};
+
+    // The import runs as a background job; poll until it finishes.
+    var job = response.data ?? <String, dynamic>{};
+    while (job['status'] == 'queued' || job['status'] == 'running') {
+      await Future<void>.delayed(const Duration(milliseconds: 500));
+      final poll = await _client.get<Map<String, dynamic>>(
+        '/me/import/${job['job_id']}',
+        token: token,
+      );
+      job = poll.data ?? <String, dynamic>{};
+    }
+    if (job['status'] != 'completed') {
+      throw Exception(job['detail'] ?? 'Import ${job['status']}');
+    }
+    return job;
   }
 
   Future<Map<String, dynamic>> fetchTimeline(String token, String range) async {
@@ -1,7 +1,25 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from .routers import auth, garmin, me
+from .services.compression import CompressionMiddleware
+from .services.container import ServiceContainer
+from .services.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from .services.rate_limit import RateLimitMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    services = ServiceContainer.build()
+    app.state.services = services
+    services.start()
+    try:
+        yield
+    finally:
+        services.shutdown()
 
 
 def create_app() -> FastAPI:
@@ -9,8 +27,19 @@ def create_app() -> FastAPI:
         title="SleepHabits API",
         version="0.0.1",
         description="Proof-of-concept API for SleepHabits.",
+        lifespan=lifespan,
     )
 
+    # Middleware added last runs first: CORS, then metrics, compression and
+    # the rate limiter, so even 429s carry CORS headers and are measured.
+    app.add_middleware(RateLimitMiddleware)
+
+    # Brotli/gzip for larger responses; whole bodies are cached compressed
+    app.add_middleware(CompressionMiddleware)
+
+    # Latency per route and requests in flight, for /metrics
+    app.add_middleware(MetricsMiddleware)
+
     # Add CORS middleware to allow web app to communicate with API
     # Note: For development only. In production, specify exact origins.
     app.add_middleware(
@@ -30,6 +59,11 @@ def create_app() -> FastAPI:
     async def healthcheck() -> dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/metrics", tags=["health"], include_in_schema=False)
+    async def metrics() -> Response:
+        """Prometheus text format; scrape it per worker process."""
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
     return app
 
 
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response, status
+from fastapi.security import HTTPAuthorizationCredentials
 
 from app.schemas.auth import LoginRequest, LoginResponse
-from app.services.auth import AuthService, get_auth_service
+from app.services.auth import AuthService
+from app.services.container import get_auth_service
+from app.services.storage import User
+from app.services.users import get_current_user, security
 
 router = APIRouter()
 
@@ -12,3 +16,14 @@ async def login(
     service: AuthService = Depends(get_auth_service),
 ) -> LoginResponse:
     return await service.login(payload)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    service: AuthService = Depends(get_auth_service),
+) -> Response:
+    """Revoke the bearer token; other sessions of the user stay signed in."""
+    service.logout(credentials.credentials)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
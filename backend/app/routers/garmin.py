@@ -1,16 +1,20 @@
 from __future__ import annotations
 
+import math
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
 from app.schemas.garmin import (
+    GarminBackfillResponse,
     GarminCredentialConnectRequest,
     GarminCredentialConnectResponse,
     GarminPullResponse,
 )
 from app.schemas.sleep import SleepSummaryResponse
-from app.services.sleep import SleepService, get_sleep_service
+from app.services.container import get_sleep_service
+from app.services.garmin_api import GarminConnectError, GarminRateLimited
+from app.services.sleep import SleepService
 from app.services.storage import User
 from app.services.users import get_current_user
 
@@ -44,13 +48,57 @@ async def connect_garmin(
     )
 
 
+@router.delete("/connect", status_code=status.HTTP_204_NO_CONTENT)
+async def disconnect_garmin(
+    user: User = Depends(get_current_user),
+    sleep_service: SleepService = Depends(get_sleep_service),
+) -> Response:
+    """Forget the Garmin login and its cached responses; imported nights are kept."""
+    await sleep_service.disconnect_garmin(user)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.post("/pull", response_model=GarminPullResponse)
 async def pull_garmin_sleep(
     user: User = Depends(get_current_user),
     sleep_service: SleepService = Depends(get_sleep_service),
 ) -> GarminPullResponse:
-    summary = await sleep_service.pull_latest(user)
+    try:
+        summary = await sleep_service.pull_latest(user)
+    except GarminRateLimited as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        ) from exc
+    except GarminConnectError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     return GarminPullResponse(
         refreshed_at=datetime.now(tz=UTC),
         summary=SleepSummaryResponse(**summary),
     )
+
+
+@router.post("/backfill", response_model=GarminBackfillResponse)
+async def backfill_garmin_sleep(
+    days: int = Query(90, ge=1, le=3650),
+    user: User = Depends(get_current_user),
+    sleep_service: SleepService = Depends(get_sleep_service),
+) -> GarminBackfillResponse:
+    """Fetch up to ``days`` nights older than anything synced so far."""
+    try:
+        result = await sleep_service.backfill_garmin(user, days)
+    except GarminRateLimited as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        ) from exc
+    except GarminConnectError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return GarminBackfillResponse(
+        nights_imported=result["nights_imported"],
+        backfilled_until=result["backfilled_until"],
+        complete=result["complete"],
+        summary=SleepSummaryResponse(**result["summary"]),
+    )
@@ -1,48 +1,183 @@
 from __future__ import annotations
 
-import csv
-import io
-from datetime import date
-from typing import List, Optional
+import asyncio
+from datetime import date, timedelta
+import tempfile
+from typing import AsyncIterator, BinaryIO, List, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 
-from app.schemas.habits import HabitCheckinRequest, HabitCheckinResponse, HabitResponse
+from app.schemas.habits import (
+    HabitCheckinRequest,
+    HabitCheckinResponse,
+    HabitResponse,
+    HabitStatsResponse,
+)
+from app.schemas.imports import ImportJobResponse
 from app.schemas.sleep import ManualSleepEntryRequest, SleepSummaryResponse
-from app.services.habits import HabitService, get_habit_service
-from app.services.sleep import SleepService, get_sleep_service
+from app.services.container import (
+    get_event_bus,
+    get_export_service,
+    get_habit_service,
+    get_import_job_manager,
+    get_sleep_service,
+)
+from app.services.events import HEARTBEAT_SECONDS, EventBus, Subscription, format_event
+from app.services.executors import run_cpu, run_io
+from app.services.export import EXPORT_FORMATS, ExportService
+from app.services.habits import HabitService
+from app.services.import_jobs import ImportJobManager
+from app.services.sleep import SleepService
+from app.services.sleep_series import SERIES
 from app.services.storage import User
+from app.services.uploads import MAX_UPLOAD_BYTES, SPOOL_WRITE_BYTES, UPLOAD_FIELD, extract_upload
 from app.services.users import get_current_user
+from app.services.wire import render
 
 router = APIRouter()
 
+# Uploads are read as a raw body and parsed by spooled_upload, so describe the form by hand
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": [UPLOAD_FIELD],
+                    "properties": {UPLOAD_FIELD: {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+async def spooled_upload(request: Request, user: User = Depends(get_current_user)) -> AsyncIterator[BinaryIO]:
+    """The uploaded file, with the multipart body parsed on the I/O pool instead of the event loop.
+
+    Depends on the signed-in user, so anonymous uploads are turned away
+    before their body is read. Bodies over ``MAX_UPLOAD_BYTES`` get a 413.
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Uploads are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB",
+    )
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES:
+        raise too_large
+    body = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        received = 0
+        pending: list[bytes] = []
+        pending_bytes = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > MAX_UPLOAD_BYTES:
+                raise too_large
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+            if pending_bytes >= SPOOL_WRITE_BYTES:
+                # Past 1 MB the spool is a file on disk
+                await run_io(body.writelines, pending)
+                pending, pending_bytes = [], 0
+        if pending:
+            await run_io(body.writelines, pending)
+        body.seek(0)
+    except BaseException:
+        body.close()
+        raise
+    try:
+        upload = await run_io(extract_upload, body, request.headers.get("content-type", ""))
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+    try:
+        yield upload
+    finally:
+        upload.close()
+
 
 @router.get("/summary", response_model=SleepSummaryResponse)
 async def get_summary(
     user: User = Depends(get_current_user),
     sleep_service: SleepService = Depends(get_sleep_service),
 ) -> SleepSummaryResponse:
-    summary = sleep_service.get_summary(user)
+    summary = await run_cpu(sleep_service.get_summary, user)
     return SleepSummaryResponse(**summary)
 
 
+@router.get("/events")
+async def stream_events(
+    user: User = Depends(get_current_user),
+    sleep_service: SleepService = Depends(get_sleep_service),
+    events: EventBus = Depends(get_event_bus),
+) -> StreamingResponse:
+    """Server-Sent Events for this user's devices, instead of polling /me/summary.
+
+    ``summary`` is sent on connect and again whenever sleep or habit data
+    changes; ``sync`` when a Garmin sync finishes; ``import`` with a job's
+    progress (as GET /me/import/{job_id} returns it).
+    """
+    subscription = events.subscribe(user.id)
+    return StreamingResponse(
+        _event_stream(subscription, events, sleep_service, user),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _event_stream(subscription: Subscription, events: EventBus, sleep_service: SleepService, user: User):
+    try:
+        yield format_event("summary", await run_cpu(sleep_service.get_summary, user))
+        while True:
+            try:
+                batch = await asyncio.wait_for(subscription.next(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            # Any number of store changes since the last message make one summary
+            summary_due = False
+            for event, data in batch:
+                if event == "changed":
+                    summary_due = summary_due or data in ("sleep", "habits")
+                else:
+                    yield format_event(event, data)
+            if summary_due:
+                yield format_event("summary", await run_cpu(sleep_service.get_summary, user))
+    finally:
+        events.unsubscribe(subscription)
+
+
 @router.get("/habits", response_model=List[HabitResponse])
 async def list_habits(
     target_date: Optional[date] = None,
     user: User = Depends(get_current_user),
     habit_service: HabitService = Depends(get_habit_service),
 ) -> List[HabitResponse]:
-    habits = habit_service.get_habits(user, target_date)
+    habits = await run_cpu(habit_service.get_habits, user, target_date)
     return [HabitResponse(**habit) for habit in habits]
 
 
+@router.get("/habits/stats", response_model=List[HabitStatsResponse])
+async def get_habit_stats(
+    as_of: Optional[date] = None,
+    user: User = Depends(get_current_user),
+    habit_service: HabitService = Depends(get_habit_service),
+) -> List[HabitStatsResponse]:
+    """Current/longest streaks and 7/30/90-day compliance per habit."""
+    stats = await run_cpu(habit_service.get_stats, user, as_of)
+    return [HabitStatsResponse(**item) for item in stats]
+
+
 @router.post("/habits/checkin", response_model=HabitCheckinResponse)
 async def checkin_habit(
     payload: HabitCheckinRequest,
     user: User = Depends(get_current_user),
     habit_service: HabitService = Depends(get_habit_service),
 ) -> HabitCheckinResponse:
-    habit = habit_service.check_in(
+    habit = await run_cpu(
+        habit_service.check_in,
         user=user,
         habit_id=payload.habit_id,
         value=payload.value,
@@ -51,23 +186,49 @@ async def checkin_habit(
     return HabitCheckinResponse(**habit)
 
 
+# Responses below are JSON by default; see app.services.wire for the
+# compact formats a client can ask for with its Accept header
 @router.get("/analytics")
 async def get_analytics(
+    request: Request,
     user: User = Depends(get_current_user),
     sleep_service: SleepService = Depends(get_sleep_service),
-) -> dict:
+) -> Response:
     """Get correlations between habits and sleep quality."""
-    return sleep_service.get_analytics(user)
+    return await run_cpu(_render_with, sleep_service.get_analytics, request, user)
 
 
 @router.get("/sleep/timeline")
 async def get_sleep_timeline(
+    request: Request,
     range: str = "week",  # week, month, year
     user: User = Depends(get_current_user),
     sleep_service: SleepService = Depends(get_sleep_service),
-) -> dict:
+) -> Response:
     """Get sleep timeline data for visualization."""
-    return sleep_service.get_timeline(user, range)
+    return await run_cpu(_render_with, sleep_service.get_timeline, request, user, range)
+
+
+@router.get("/sleep/series")
+async def get_sleep_series(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    series: Optional[List[str]] = Query(None),
+    resolution: Optional[int] = Query(None, ge=1, le=86400),
+    max_points: int = Query(1000, ge=10, le=10000),
+    user: User = Depends(get_current_user),
+    sleep_service: SleepService = Depends(get_sleep_service),
+) -> Response:
+    """Intraday stages, heart rate, HRV and SpO2 downsampled to min/max buckets (default: the last 7 nights)."""
+    unknown = sorted(set(series or ()) - set(SERIES))
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown series: {', '.join(unknown)}")
+    end = end or date.today()
+    start = start or end - timedelta(days=6)
+    return await run_cpu(
+        _render_with, sleep_service.get_series, request, user, start, end, series, resolution, max_points
+    )
 
 
 @router.post("/sleep/manual", response_model=SleepSummaryResponse)
@@ -77,7 +238,8 @@ async def add_manual_sleep_entry(
     sleep_service: SleepService = Depends(get_sleep_service),
 ) -> SleepSummaryResponse:
     """Manually add a sleep entry for a specific date."""
-    summary = sleep_service.add_manual_entry(
+    summary = await run_cpu(
+        sleep_service.add_manual_entry,
         user=user,
         local_date=payload.local_date,
         sleep_score=payload.sleep_score,
@@ -88,78 +250,81 @@ async def add_manual_sleep_entry(
     return SleepSummaryResponse(**summary)
 
 
-@router.post("/import/csv")
+@router.post(
+    "/import/csv",
+    response_model=ImportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=UPLOAD_OPENAPI,
+)
 async def import_csv_data(
-    file: UploadFile = File(...),
     user: User = Depends(get_current_user),
-    sleep_service: SleepService = Depends(get_sleep_service),
-    habit_service: HabitService = Depends(get_habit_service),
-) -> dict:
-    """Import sleep and habit data from CSV file."""
-    
-    # Read file content
-    contents = await file.read()
-    
-    try:
-        # Decode CSV
-        csv_text = contents.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_text))
-        
-        sleep_count = 0
-        habit_count = 0
-        errors = []
-        
-        for row in csv_reader:
-            try:
-                row_type = row.get('type', '').strip()
-                
-                if row_type == 'sleep':
-                    # Parse sleep entry
-                    local_date = date.fromisoformat(row['date'])
-                    sleep_score = int(row['sleep_score'])
-                    duration_minutes = int(row['duration_minutes'])
-                    bedtime = row['bedtime']
-                    wake_time = row['wake_time']
-                    
-                    sleep_service.add_manual_entry(
-                        user=user,
-                        local_date=local_date,
-                        sleep_score=sleep_score,
-                        bedtime=bedtime,
-                        wake_time=wake_time,
-                        duration_minutes=duration_minutes,
-                    )
-                    sleep_count += 1
-                
-                elif row_type == 'habit':
-                    # Parse habit checkin
-                    local_date = date.fromisoformat(row['date'])
-                    habit_id = row['habit_id']
-                    value_str = row['value'].strip()
-                    
-                    # Try to parse as integer first, then as boolean
-                    try:
-                        value = int(value_str)
-                    except ValueError:
-                        value = value_str.lower() in ('true', '1', 'yes')
-                    
-                    habit_service.check_in(
-                        user=user,
-                        habit_id=habit_id,
-                        value=value,
-                        target_date=local_date,
-                    )
-                    habit_count += 1
-            
-            except Exception as e:
-                errors.append(f"Row error: {str(e)}")
-        
-        return {
-            'success': True,
-            'sleep_imported': sleep_count,
-            'habits_imported': habit_count,
-            'errors': errors[:10],  # Limit error list
-        }
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {str(e)}")
+    upload: BinaryIO = Depends(spooled_upload),
+    jobs: ImportJobManager = Depends(get_import_job_manager),
+) -> ImportJobResponse:
+    """Queue a CSV import of sleep and habit data; poll the returned job for progress.
+
+    Re-uploading a file with the same content returns the existing job.
+    """
+    job = await run_io(jobs.submit, user, upload)
+    return ImportJobResponse(**job.snapshot())
+
+
+@router.post(
+    "/import/garmin",
+    response_model=ImportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=UPLOAD_OPENAPI,
+)
+async def import_garmin_export(
+    user: User = Depends(get_current_user),
+    upload: BinaryIO = Depends(spooled_upload),
+    jobs: ImportJobManager = Depends(get_import_job_manager),
+) -> ImportJobResponse:
+    """Queue an import of a Garmin Connect export (Sleep.csv, Activities.csv or the account ZIP)."""
+    job = await run_io(jobs.submit, user, upload, "garmin")
+    return ImportJobResponse(**job.snapshot())
+
+
+@router.get("/import/{job_id}", response_model=ImportJobResponse)
+async def get_import_job(
+    job_id: str,
+    user: User = Depends(get_current_user),
+    jobs: ImportJobManager = Depends(get_import_job_manager),
+) -> ImportJobResponse:
+    job = jobs.get(user, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return ImportJobResponse(**job.snapshot())
+
+
+@router.delete("/import/{job_id}", response_model=ImportJobResponse)
+async def cancel_import_job(
+    job_id: str,
+    user: User = Depends(get_current_user),
+    jobs: ImportJobManager = Depends(get_import_job_manager),
+) -> ImportJobResponse:
+    """Stop a queued or running import; rows already written are kept."""
+    job = jobs.cancel(user, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return ImportJobResponse(**job.snapshot())
+
+
+@router.get("/export")
+async def export_data(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    user: User = Depends(get_current_user),
+    export_service: ExportService = Depends(get_export_service),
+) -> StreamingResponse:
+    """Stream the full sleep and habit history; the CSV re-imports via /me/import/csv."""
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_service.stream(user, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="sleephabits-export.{extension}"'},
+    )
+
+
+def _render_with(build, request: Request, *args) -> Response:
+    """``build(*args)`` in the format the request accepts; run on the CPU pool."""
+    return render(build(*args), request.headers.get("accept"))
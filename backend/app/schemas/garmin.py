@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import BaseModel, EmailStr
@@ -26,3 +26,10 @@ class GarminCredentialConnectResponse(BaseModel):
 class GarminPullResponse(BaseModel):
     refreshed_at: datetime
     summary: SleepSummaryResponse
+
+
+class GarminBackfillResponse(BaseModel):
+    nights_imported: int
+    backfilled_until: Optional[date] = None
+    complete: bool
+    summary: SleepSummaryResponse
@@ -26,3 +26,15 @@ class HabitCheckinRequest(BaseModel):
 
 class HabitCheckinResponse(HabitResponse):
     pass
+
+
+class HabitStatsResponse(BaseModel):
+    habit_id: str
+    name: str
+    type: str
+    current_streak: int
+    longest_streak: int
+    compliance_7d: float
+    compliance_30d: float
+    compliance_90d: float
+    last_completed: Optional[str]
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from app.schemas.sleep import SleepSummaryResponse
+
+
+class ImportJobResponse(BaseModel):
+    job_id: str
+    status: str
+    rows_processed: int
+    sleep_imported: int
+    habits_imported: int
+    activities_imported: int = 0
+    error_count: int
+    errors: List[str]
+    rows_per_second: float
+    detail: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    summary: Optional[SleepSummaryResponse] = None
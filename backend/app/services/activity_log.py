@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, fields
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Activities before this hour still belong to the previous evening's night
+NIGHT_ROLLOVER_HOUR = 4
+EVENING_HOUR = 18
+HIGH_TSS = 50.0
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class Activity:
+    user_id: str
+    activity_type: str
+    start: datetime  # local time as recorded by the device
+    title: str = ""
+    distance_km: Optional[float] = None
+    calories: Optional[int] = None
+    duration_seconds: Optional[int] = None
+    elapsed_seconds: Optional[int] = None
+    avg_hr: Optional[int] = None
+    max_hr: Optional[int] = None
+    training_stress_score: Optional[float] = None
+    steps: Optional[int] = None
+
+
+NUMERIC_FIELDS = tuple(
+    f.name for f in fields(Activity) if f.name not in ("user_id", "activity_type", "start", "title")
+)
+INTEGER_FIELDS = {"calories", "duration_seconds", "elapsed_seconds", "avg_hr", "max_hr", "steps"}
+
+
+def night_of(start: datetime) -> date:
+    """The sleep night an activity leads into, keyed like SleepSession.date (the wake-up date)."""
+    return (start - timedelta(hours=NIGHT_ROLLOVER_HOUR)).date() + timedelta(days=1)
+
+
+@dataclass
+class NightActivity:
+    """Additive per-night aggregates, so replacing an activity can be undone exactly."""
+
+    count: int = 0
+    runs: int = 0
+    evening_count: int = 0
+    evening_runs: int = 0
+    total_tss: float = 0.0
+    total_seconds: int = 0
+
+    def apply(self, activity: Activity, sign: int) -> None:
+        is_run = "run" in activity.activity_type.lower()
+        is_evening = activity.start.hour >= EVENING_HOUR
+        self.count += sign
+        self.runs += sign * is_run
+        self.evening_count += sign * is_evening
+        self.evening_runs += sign * (is_run and is_evening)
+        self.total_tss += sign * (activity.training_stress_score or 0.0)
+        self.total_seconds += sign * (activity.elapsed_seconds or activity.duration_seconds or 0)
+
+
+@dataclass(frozen=True)
+class VirtualHabit:
+    id: str
+    name: str
+    type: str
+    description: str
+    predicate: Callable[[NightActivity], bool]
+
+
+# Derived from activities and joined into analytics as if they were check-ins
+VIRTUAL_HABITS = [
+    VirtualHabit(
+        id="activity-any",
+        name="Worked out",
+        type="healthy",
+        description="Any recorded activity that day.",
+        predicate=lambda night: night.count > 0,
+    ),
+    VirtualHabit(
+        id="activity-run-evening",
+        name=f"Ran after {EVENING_HOUR}:00",
+        type="unhealthy",
+        description="A run started in the evening.",
+        predicate=lambda night: night.evening_runs > 0,
+    ),
+    VirtualHabit(
+        id="activity-evening",
+        name=f"Exercised after {EVENING_HOUR}:00",
+        type="unhealthy",
+        description="Any activity started in the evening.",
+        predicate=lambda night: night.evening_count > 0,
+    ),
+    VirtualHabit(
+        id="activity-high-tss",
+        name=f"Training load > {HIGH_TSS:g} TSS",
+        type="unhealthy",
+        description="Hard training day by Training Stress Score.",
+        predicate=lambda night: night.total_tss > HIGH_TSS,
+    ),
+]
+
+
+class ActivityLog:
+    """One user's activities, sorted by start time, stored column by column.
+
+    Numeric fields live in ``array('d')`` columns (NaN for missing), so range
+    scans and aggregations touch flat buffers instead of Activity objects.
+    Per-night aggregates are maintained on insert for the analytics join.
+    """
+
+    def __init__(self, user_id: str) -> None:
+        self.user_id = user_id
+        self.starts = array("d")  # seconds since 1970-01-01, local time
+        self.types: List[str] = []
+        self.titles: List[str] = []
+        self.columns: Dict[str, array] = {name: array("d") for name in NUMERIC_FIELDS}
+        self.nights: Dict[date, NightActivity] = {}
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, activity: Activity) -> None:
+        """Insert in start order, replacing an activity with the same start and type."""
+        ts = (activity.start - _EPOCH).total_seconds()
+        if self._replace(ts, activity):
+            return
+        position = bisect_left(self.starts, ts)
+        self.starts.insert(position, ts)
+        self.types.insert(position, activity.activity_type)
+        self.titles.insert(position, activity.title)
+        for name, column in self.columns.items():
+            column.insert(position, _to_float(getattr(activity, name)))
+        self._night(activity.start).apply(activity, 1)
+
+    def add_many(self, activities: Iterable[Activity]) -> None:
+        """Bulk ``add``: the batch is sorted and merged into the columns in one pass.
+
+        Inserting row by row shifts every later row each time, which is
+        quadratic for newest-first input such as Garmin's Activities.csv.
+        Within the batch, a later row replaces an earlier one with the same
+        start and type.
+        """
+        batch: Dict[Tuple[float, str], Activity] = {}
+        for activity in activities:
+            batch[((activity.start - _EPOCH).total_seconds(), activity.activity_type)] = activity
+        fresh = sorted(
+            ((ts, activity) for (ts, _), activity in batch.items() if not self._replace(ts, activity)),
+            key=lambda item: item[0],
+        )
+        if not fresh:
+            return
+
+        starts, types, titles = array("d"), [], []
+        columns = {name: array("d") for name in self.columns}
+        done = 0
+        for ts, activity in fresh:
+            position = bisect_right(self.starts, ts, lo=done)
+            if position > done:
+                starts.extend(self.starts[done:position])
+                types.extend(self.types[done:position])
+                titles.extend(self.titles[done:position])
+                for name, column in columns.items():
+                    column.extend(self.columns[name][done:position])
+                done = position
+            starts.append(ts)
+            types.append(activity.activity_type)
+            titles.append(activity.title)
+            for name, column in columns.items():
+                column.append(_to_float(getattr(activity, name)))
+            self._night(activity.start).apply(activity, 1)
+        starts.extend(self.starts[done:])
+        types.extend(self.types[done:])
+        titles.extend(self.titles[done:])
+        for name, column in columns.items():
+            column.extend(self.columns[name][done:])
+        self.starts, self.types, self.titles, self.columns = starts, types, titles, columns
+
+    def row(self, index: int) -> Activity:
+        values = {}
+        for name, column in self.columns.items():
+            value = column[index]
+            if math.isnan(value):
+                values[name] = None
+            else:
+                values[name] = int(value) if name in INTEGER_FIELDS else value
+        return Activity(
+            user_id=self.user_id,
+            activity_type=self.types[index],
+            start=_EPOCH + timedelta(seconds=self.starts[index]),
+            title=self.titles[index],
+            **values,
+        )
+
+    def index_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> range:
+        """Indexes of activities starting in ``[start, end)``."""
+        lo = bisect_left(self.starts, (start - _EPOCH).total_seconds()) if start else 0
+        hi = bisect_left(self.starts, (end - _EPOCH).total_seconds()) if end else len(self.starts)
+        return range(lo, max(lo, hi))
+
+    def iter_rows(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[Activity]:
+        for index in self.index_range(start, end):
+            yield self.row(index)
+
+    def column(self, name: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> array:
+        span = self.index_range(start, end)
+        return self.columns[name][span.start:span.stop]
+
+    # ------------------------------------------------------------------
+    def _replace(self, ts: float, activity: Activity) -> bool:
+        """Overwrite the stored activity with this start and type, if there is one."""
+        index = bisect_left(self.starts, ts)
+        while index < len(self.starts) and self.starts[index] == ts:
+            if self.types[index] == activity.activity_type:
+                self._night(activity.start).apply(self.row(index), -1)
+                self._write(index, activity)
+                self._night(activity.start).apply(activity, 1)
+                return True
+            index += 1
+        return False
+
+    def _write(self, index: int, activity: Activity) -> None:
+        self.titles[index] = activity.title
+        for name, column in self.columns.items():
+            column[index] = _to_float(getattr(activity, name))
+
+    def _night(self, start: datetime) -> NightActivity:
+        night = night_of(start)
+        aggregate = self.nights.get(night)
+        if aggregate is None:
+            aggregate = self.nights[night] = NightActivity()
+        return aggregate
+
+
+def _to_float(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
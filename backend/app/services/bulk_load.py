@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from app.services.habits import HabitService
+from app.services.imports import ImportResult, parse_habit_value
+from app.services.storage import SleepSession, User
+
+SUPPORTED_SUFFIXES = (".csv", ".ndjson")
+# Users created from a bare file name (e.g. synthetic-000042.csv) get this domain
+DEFAULT_EMAIL_DOMAIN = "sleephabits.app"
+REQUIRED_COLUMNS = frozenset(("type", "date"))
+# Loaded into the store in the background when the app starts; the store only lives in memory
+STARTUP_DIR = os.getenv("BULK_LOAD_DIR")
+CHECKPOINT_NAME = ".bulk_load_checkpoint"
+# Parsed files waiting for the writer, per worker; bounds parent memory
+PENDING_PER_WORKER = 4
+
+logger = logging.getLogger(__name__)
+
+SleepRow = Tuple[date, Optional[int], int, str, str, Dict[str, int]]
+HabitRow = Tuple[str, date, Union[bool, int]]
+
+
+@dataclass
+class ParsedFile:
+    """One user's validated rows, as plain tuples so they pickle cheaply."""
+
+    name: str
+    email: str
+    sleep: List[SleepRow] = field(default_factory=list)
+    habits: List[HabitRow] = field(default_factory=list)
+    result: ImportResult = field(default_factory=ImportResult)
+
+
+@dataclass
+class BulkLoadReport:
+    files_total: int = 0
+    files_loaded: int = 0
+    files_skipped: int = 0
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    rows_processed: int = 0
+    sleep_imported: int = 0
+    habits_imported: int = 0
+    error_count: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_processed / self.elapsed if self.elapsed else 0.0
+
+    def add(self, parsed: ParsedFile) -> None:
+        self.files_loaded += 1
+        self.rows_processed += parsed.result.rows_processed
+        self.sleep_imported += parsed.result.sleep_imported
+        self.habits_imported += parsed.result.habits_imported
+        self.error_count += parsed.result.error_count
+
+
+def email_for(path: Path) -> str:
+    """Files are named after the user: ``alice@example.com.csv`` or ``synthetic-000042.csv``."""
+    stem = path.stem
+    return stem if "@" in stem else f"{stem}@{DEFAULT_EMAIL_DOMAIN}"
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    if path.suffix == ".ndjson":
+        with path.open(encoding="utf-8-sig") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with path.open(encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            missing = REQUIRED_COLUMNS.difference(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"missing columns: {', '.join(sorted(missing))}")
+            yield from reader
+
+
+def parse_user_file(path: Path) -> ParsedFile:
+    """Parse and validate one per-user file; runs in a worker process.
+
+    Row problems are counted like in the CSV import; an unreadable file raises.
+    """
+    parsed = ParsedFile(name=path.name, email=email_for(path))
+    result = parsed.result
+    for record in iter_records(path):
+        result.rows_processed += 1
+        try:
+            row_type = (record.get("type") or "").strip()
+            if row_type == "sleep":
+                score = record.get("sleep_score")
+                parsed.sleep.append(
+                    (
+                        date.fromisoformat(record["date"]),
+                        int(score) if score not in (None, "") else None,
+                        int(record["duration_minutes"]),
+                        record["bedtime"],
+                        record["wake_time"],
+                        record.get("stage_minutes") or {},
+                    )
+                )
+                result.sleep_imported += 1
+            elif row_type == "habit":
+                value = record["value"]
+                parsed.habits.append(
+                    (
+                        record["habit_id"],
+                        date.fromisoformat(record["date"]),
+                        value if isinstance(value, (bool, int)) else parse_habit_value(str(value)),
+                    )
+                )
+                result.habits_imported += 1
+        except Exception as e:
+            result.add_error(f"{path.name}: row error: {str(e)}")
+    return parsed
+
+
+class Checkpoint:
+    """Append-only list of files already written to one store.
+
+    A file is only recorded after its rows are stored, and store writes are
+    upserts, so re-running after a failure redoes at most the files in
+    flight. The first line names the store (``InMemoryStore.instance_id``):
+    a new process starts with an empty store, so a checkpoint written by
+    another one is discarded instead of skipping files it no longer holds.
+    """
+
+    def __init__(self, path: Path, owner: str) -> None:
+        self.path = path
+        self.owner = owner
+        self.done: Set[str] = set()
+        lines = path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+        self.fresh = not lines or lines[0] != owner
+        if not self.fresh:
+            self.done = {line.strip() for line in lines[1:] if line.strip()}
+        self._file = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.done
+
+    def mark(self, name: str) -> None:
+        if self._file is None:
+            self._file = self.path.open("w" if self.fresh else "a", encoding="utf-8")
+            if self.fresh:
+                self._file.write(self.owner + "\n")
+                self.fresh = False
+        self._file.write(name + "\n")
+        self._file.flush()
+        self.done.add(name)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BulkLoader:
+    """Loads a directory of per-user CSV/NDJSON files through the bulk store APIs.
+
+    Parsing and validation are spread over a process pool; the parent process
+    owns the store and applies each parsed file with one bulk write per kind.
+    """
+
+    def __init__(self, habit_service: HabitService | None = None) -> None:
+        self.habits = habit_service or HabitService()
+        self.store = self.habits.store
+
+    def load_directory(
+        self,
+        directory: Union[str, Path],
+        *,
+        workers: int = 0,
+        checkpoint: Optional[Checkpoint] = None,
+        stop: Optional[threading.Event] = None,
+        progress: Callable[[BulkLoadReport], None] | None = None,
+    ) -> BulkLoadReport:
+        paths = sorted(p for p in Path(directory).iterdir() if p.suffix in SUPPORTED_SUFFIXES)
+        report = BulkLoadReport(files_total=len(paths))
+        if checkpoint is not None:
+            pending = [p for p in paths if p.name not in checkpoint]
+            report.files_skipped = len(paths) - len(pending)
+            paths = pending
+
+        started = time.perf_counter()
+        workers = workers or os.cpu_count() or 1
+        for path, outcome in self._parse_all(paths, workers):
+            if isinstance(outcome, BaseException):
+                report.failed.append((path.name, str(outcome)))
+            else:
+                self.write(outcome)
+                report.add(outcome)
+                if checkpoint is not None:
+                    checkpoint.mark(outcome.name)
+            report.elapsed = time.perf_counter() - started
+            if progress:
+                progress(report)
+            if stop is not None and stop.is_set():
+                break
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def write(self, parsed: ParsedFile) -> User:
+        user = self.store.get_user_by_email(parsed.email)
+        if not user:
+            user_id = Path(parsed.name).stem
+            if self.store.get_user(user_id) is not None:
+                user_id = str(uuid.uuid4())
+            user = self.store.upsert_user(User(id=user_id, email=parsed.email))
+        self.store.upsert_sleep_sessions(
+            user.id,
+            [
+                SleepSession(
+                    user_id=user.id,
+                    date=local_date,
+                    duration_minutes=duration,
+                    sleep_score=score,
+                    bedtime=bedtime,
+                    wake_time=wake_time,
+                    stage_minutes=stages,
+                )
+                for local_date, score, duration, bedtime, wake_time, stages in parsed.sleep
+            ],
+        )
+        self.habits.bulk_check_in(user, parsed.habits)
+        return user
+
+    # ------------------------------------------------------------------
+    def _parse_all(
+        self, paths: List[Path], workers: int
+    ) -> Iterable[Tuple[Path, Union[ParsedFile, BaseException]]]:
+        if workers == 1:
+            for path in paths:
+                try:
+                    yield path, parse_user_file(path)
+                except Exception as exc:
+                    yield path, exc
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            remaining = iter(paths)
+            in_flight: Dict[Future, Path] = {}
+            limit = workers * PENDING_PER_WORKER
+            while True:
+                for path in remaining:
+                    in_flight[pool.submit(parse_user_file, path)] = path
+                    if len(in_flight) >= limit:
+                        break
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = in_flight.pop(future)
+                    exc = future.exception()
+                    yield path, exc if exc is not None else future.result()
+
+
+class StartupLoad:
+    """Loads ``BULK_LOAD_DIR`` into the app's store on a background thread.
+
+    The app serves requests meanwhile. Loaded files go into a checkpoint in
+    the directory, so a load that stops part-way (a file that could not be
+    read, or a shutdown) picks up where it left off the next time the app
+    starts in the same process.
+    """
+
+    def __init__(self, directory: Union[str, Path], habit_service: HabitService) -> None:
+        self.directory = Path(directory)
+        self.loader = BulkLoader(habit_service)
+        self.report: Optional[BulkLoadReport] = None
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="bulk-load", daemon=True)
+
+    def start(self) -> StartupLoad:
+        self.thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[BulkLoadReport]:
+        self.thread.join(timeout)
+        return self.report
+
+    def stop(self) -> None:
+        self.stopping.set()
+        self.thread.join()
+
+    def _run(self) -> None:
+        checkpoint = Checkpoint(self.directory / CHECKPOINT_NAME, owner=self.loader.store.instance_id)
+        try:
+            report = self.loader.load_directory(self.directory, checkpoint=checkpoint, stop=self.stopping)
+        except Exception:
+            logger.exception("Bulk load of %s failed", self.directory)
+            return
+        finally:
+            checkpoint.close()
+        self.report = report
+        logger.info(
+            "Bulk-loaded %d users (%d rows, %d unparseable, %d files already loaded) from %s in %.1fs",
+            report.files_loaded, report.rows_processed, report.error_count, report.files_skipped,
+            self.directory, report.elapsed,
+        )
+        for name, error in report.failed:
+            logger.error("Could not bulk-load %s: %s", name, error)
+
+
+def start_at_startup(habit_service: HabitService) -> Optional[StartupLoad]:
+    """Start loading ``BULK_LOAD_DIR``, if it is set."""
+    return StartupLoad(STARTUP_DIR, habit_service).start() if STARTUP_DIR else None
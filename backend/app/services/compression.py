@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import zlib
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import watch_cache
+
+# Smaller bodies go out as they are; headers would eat most of the saving
+MINIMUM_SIZE = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+CACHE_MB = int(os.getenv("COMPRESS_CACHE_MB", "32"))
+GZIP_LEVEL = 6
+# Whole bodies are compressed once and cached, so they can afford a higher
+# quality than chunks of a stream, which are compressed as they are sent
+BROTLI_QUALITY = 5
+BROTLI_STREAM_QUALITY = 4
+# Preferred first when the client accepts both equally
+ENCODINGS = ("br", "gzip")
+COMPRESSIBLE = ("text/", "application/json", "application/x-ndjson", "application/msgpack", "application/vnd.")
+# Small messages that must reach the client as they happen
+UNCOMPRESSED = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best of ``ENCODINGS`` the client accepts (q > 0), or None."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, *params = (item.strip() for item in part.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, raw = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        accepted[name.lower()] = q
+
+    def weight(name: str) -> float:
+        return accepted.get(name, accepted.get("*", 0.0))
+
+    best = max(ENCODINGS, key=weight)  # the first on ties
+    return best if weight(best) > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+
+class CompressedBodyCache:
+    """Compressed bodies by content digest, evicting least recently used past ``max_bytes``.
+
+    Unchanged payloads (a timeline polled again, the same analytics for
+    every open tab) are compressed once and served from here afterwards.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MB * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[Tuple[bytes, str], bytes] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self.entries.get(key)
+        if compressed is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return compressed
+        self.misses += 1
+        compressed = compress(body, encoding)
+        if len(compressed) <= self.max_bytes:
+            self.entries[key] = compressed
+            self.size += len(compressed)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+        return compressed
+
+
+compressed_bodies = CompressedBodyCache()
+watch_cache("compressed_bodies", compressed_bodies)
+
+
+class CompressionMiddleware:
+    """Brotli or gzip for compressible responses of at least ``minimum_size`` bytes.
+
+    Whole bodies go through the cache above; streamed bodies (exports) are
+    compressed chunk by chunk as they are sent.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_SIZE, cache: CompressedBodyCache | None = None) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache or compressed_bodies
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size, self.cache))
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str, minimum_size: int, cache: CompressedBodyCache) -> None:
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.cache = cache
+        self.start: Optional[Message] = None
+        self.mode: Optional[str] = None  # passthrough | stream, once the first body part is seen
+        self.compress_chunk: Optional[Callable[[bytes, bool], bytes]] = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.mode == "passthrough":
+            await self.send(message)
+            return
+        if self.mode == "stream":
+            more = message.get("more_body", False)
+            await self.send({"type": "http.response.body", "body": self.compress_chunk(message.get("body", b""), more), "more_body": more})
+            return
+
+        assert self.start is not None
+        headers = MutableHeaders(raw=self.start["headers"])
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if (
+            "content-encoding" in headers
+            or not headers.get("content-type", "").startswith(COMPRESSIBLE)
+            or headers.get("content-type", "").startswith(UNCOMPRESSED)
+            or (not more and len(body) < self.minimum_size)
+        ):
+            self.mode = "passthrough"
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if not more:
+            compressed = self.cache.compress(body, self.encoding)
+            headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        self.mode = "stream"
+        self.compress_chunk = _stream_compressor(self.encoding)
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": self.compress_chunk(body, True), "more_body": True})
+
+
+def _stream_compressor(encoding: str) -> Callable[[bytes, bool], bytes]:
+    """compress(chunk, more): each chunk is flushed so the client can start decoding."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_STREAM_QUALITY)
+        return lambda chunk, more: compressor.process(chunk) + (compressor.flush() if more else compressor.finish())
+    deflate = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip framing
+    return lambda chunk, more: deflate.compress(chunk) + deflate.flush(zlib.Z_SYNC_FLUSH if more else zlib.Z_FINISH)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request
+
+from app.services import bulk_load, executors, garmin_scheduler as scheduling
+from app.services.auth import AuthService
+from app.services.events import EventBus, event_bus
+from app.services.export import ExportService
+from app.services.garmin_api import REPROCESS_CACHE_ON_START, LazyGarminService
+from app.services.garmin_clients import garmin_clients
+from app.services.habits import HabitService
+from app.services.import_jobs import ImportJobManager
+from app.services.sleep import SleepService
+from app.services.sleep_series import sleep_series
+from app.services.storage import store
+
+
+@dataclass
+class ServiceContainer:
+    """The services the routes use, built once per application.
+
+    ``main.lifespan`` builds the container at startup and shuts it down on
+    exit, so requests only look services up instead of constructing them.
+    Everything shut down here is built again by the next ``build``/``start``,
+    so the app can go through its lifespan more than once.
+    """
+
+    habits: HabitService
+    garmin: LazyGarminService
+    sleep: SleepService
+    auth: AuthService
+    export: ExportService
+    jobs: ImportJobManager
+    events: EventBus
+    startup_load: Optional[bulk_load.StartupLoad] = None
+
+    @classmethod
+    def build(cls) -> ServiceContainer:
+        habits = HabitService()
+        garmin = LazyGarminService()
+        return cls(
+            habits=habits,
+            garmin=garmin,
+            sleep=SleepService(habit_service=habits, garmin_service=garmin),
+            auth=AuthService(habit_service=habits),
+            export=ExportService(),
+            jobs=ImportJobManager(),
+            events=event_bus,
+        )
+
+    def start(self) -> None:
+        executors.start()
+        store.subscribe(self.events.store_changed)
+        self.startup_load = bulk_load.start_at_startup(self.habits)
+        if REPROCESS_CACHE_ON_START:
+            self.garmin.reprocess_from_cache()
+        if scheduling.ENABLED:
+            scheduling.garmin_scheduler.start()
+
+    def shutdown(self) -> None:
+        # Producers first, then the pools and clients they use
+        scheduling.garmin_scheduler.stop()
+        if self.startup_load is not None:
+            self.startup_load.stop()
+        store.unsubscribe(self.events.store_changed)
+        self.jobs.shutdown()
+        garmin_clients.close()
+        sleep_series.close()
+        executors.shutdown()
+
+
+# Async so FastAPI resolves them inline instead of on its thread pool
+async def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+async def get_habit_service(request: Request) -> HabitService:
+    return request.app.state.services.habits
+
+
+async def get_sleep_service(request: Request) -> SleepService:
+    return request.app.state.services.sleep
+
+
+async def get_auth_service(request: Request) -> AuthService:
+    return request.app.state.services.auth
+
+
+async def get_export_service(request: Request) -> ExportService:
+    return request.app.state.services.export
+
+
+async def get_import_job_manager(request: Request) -> ImportJobManager:
+    return request.app.state.services.jobs
+
+
+async def get_event_bus(request: Request) -> EventBus:
+    return request.app.state.services.events
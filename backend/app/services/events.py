@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.services.metrics import registry
+
+# Seconds between comment lines on an idle stream, so proxies keep it open
+HEARTBEAT_SECONDS = 15.0
+
+
+class Subscription:
+    """One connected device's queue of pending events.
+
+    Events with the same key replace each other until the stream sends
+    them, so a device that falls behind gets the latest import progress
+    or summary instead of a backlog, and memory per connection stays small.
+    """
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop) -> None:
+        self.user_id = user_id
+        self.loop = loop
+        self.pending: Dict[Hashable, Tuple[str, Any]] = {}
+        self.ready = asyncio.Event()
+
+    def deliver(self, key: Hashable, event: str, data: Any) -> None:
+        """Queue an event; call on the subscription's loop."""
+        self.pending.pop(key, None)
+        self.pending[key] = (event, data)
+        self.ready.set()
+
+    async def next(self) -> List[Tuple[str, Any]]:
+        """Every event queued since the last call, oldest first; waits for at least one."""
+        await self.ready.wait()
+        self.ready.clear()
+        events = list(self.pending.values())
+        self.pending.clear()
+        return events
+
+
+class EventBus:
+    """In-process pub/sub of per-user events for the /me/events stream.
+
+    ``publish`` may be called from any thread (sync and import workers do);
+    events are handed to each subscriber's event loop. Publishing for a
+    user nobody is listening to costs one dict lookup.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscribers[subscription.user_id]
+
+    def watching(self, user_id: str) -> bool:
+        return user_id in self.subscribers
+
+    def connections(self) -> int:
+        with self.lock:
+            return sum(len(subscriptions) for subscriptions in self.subscribers.values())
+
+    def publish(self, user_id: str, event: str, data: Any = None, key: Optional[Hashable] = None) -> None:
+        """Send ``event`` to every device of ``user_id``; same-``key`` events coalesce (default: by name)."""
+        subscriptions = self.subscribers.get(user_id)
+        if not subscriptions:
+            return
+        self.published += 1
+        with self.lock:
+            subscriptions = list(subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, key or event, event, data)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # its loop is gone
+
+    def store_changed(self, user_id: str, topic: str) -> None:
+        """Store listener: note that a user's sleep, habit or activity data changed."""
+        self.publish(user_id, "changed", topic, key=("changed", topic))
+
+
+def format_event(event: str, data: Any) -> bytes:
+    """One Server-Sent Events message."""
+    payload = json.dumps(jsonable_encoder(data), separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+event_bus = EventBus()
+registry.gauge("sleephabits_event_streams", "Open /me/events connections.", read=event_bus.connections)
+registry.counter(
+    "sleephabits_events_published_total", "Events published to users with an open stream.", read=lambda: event_bus.published
+)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Blocking I/O (Garmin HTTP, upload spooling, disk): mostly waiting, so many threads
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+# Work that scales with a user's history (analytics, intraday series). These
+# are threads rather than processes because they read the in-memory store;
+# a small pool keeps a burst of them from starving everything else of the GIL.
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+# App lifespans running; the pools are shut down when the last one ends
+# and recreated by the next start
+_users = 0
+_stopped = False
+_lock = threading.Lock()
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking call on the I/O pool without holding up the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(io_pool, partial(func, *args, **kwargs))
+
+
+async def run_cpu(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a history-sized computation on the CPU pool without holding up the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, partial(func, *args, **kwargs))
+
+
+def start() -> None:
+    global io_pool, cpu_pool, _users, _stopped
+    with _lock:
+        if _stopped:
+            io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+            cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+            _stopped = False
+        _users += 1
+
+
+def shutdown() -> None:
+    global _users, _stopped
+    with _lock:
+        _users = max(_users - 1, 0)
+        if _users:
+            return
+        io_pool.shutdown(wait=False, cancel_futures=True)
+        cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _stopped = True
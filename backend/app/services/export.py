@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import io
+import json
+from typing import Any, Iterator
+
+from app.services.storage import HabitCheckin, SleepSession, User, store
+
+# Same layout as generate_synthetic_data.py, so exports can be re-imported
+CSV_COLUMNS = [
+    "type",
+    "date",
+    "sleep_score",
+    "duration_minutes",
+    "bedtime",
+    "wake_time",
+    "habit_id",
+    "habit_name",
+    "value",
+]
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+# Encoded output is handed to the response in chunks of roughly this size
+FLUSH_BYTES = 64 * 1024
+
+
+class ExportService:
+    """Streams a user's sleep and habit history straight from the store."""
+
+    def __init__(self) -> None:
+        self.store = store
+
+    def iter_records(self, user: User) -> Iterator[SleepSession | HabitCheckin]:
+        """Sleep sessions and check-ins merged in date order (sleep first per night)."""
+        sessions = ((s.date, 0, s) for s in self.store.iter_sleep_sessions(user.id))
+        checkins = ((c.local_date, 1, c) for c in self.store.iter_checkins(user.id))
+        for _, _, record in heapq.merge(sessions, checkins, key=lambda item: item[:2]):
+            yield record
+
+    def iter_csv(self, user: User) -> Iterator[bytes]:
+        names = self._habit_names(user)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        for record in self.iter_records(user):
+            if isinstance(record, SleepSession):
+                writer.writerow([
+                    "sleep",
+                    record.date.isoformat(),
+                    "" if record.sleep_score is None else record.sleep_score,
+                    record.duration_minutes,
+                    record.bedtime,
+                    record.wake_time,
+                    "",
+                    "",
+                    "",
+                ])
+            else:
+                writer.writerow([
+                    "habit",
+                    record.local_date.isoformat(),
+                    "",
+                    "",
+                    "",
+                    "",
+                    record.habit_id,
+                    names.get(record.habit_id, record.habit_id),
+                    record.value,
+                ])
+            if buffer.tell() >= FLUSH_BYTES:
+                yield self._drain(buffer)
+        yield self._drain(buffer)
+
+    def iter_ndjson(self, user: User) -> Iterator[bytes]:
+        names = self._habit_names(user)
+        buffer = io.StringIO()
+        for record in self.iter_records(user):
+            item: dict[str, Any]
+            if isinstance(record, SleepSession):
+                item = {
+                    "type": "sleep",
+                    "date": record.date.isoformat(),
+                    "sleep_score": record.sleep_score,
+                    "duration_minutes": record.duration_minutes,
+                    "bedtime": record.bedtime,
+                    "wake_time": record.wake_time,
+                    "stage_minutes": record.stage_minutes,
+                }
+            else:
+                item = {
+                    "type": "habit",
+                    "date": record.local_date.isoformat(),
+                    "habit_id": record.habit_id,
+                    "habit_name": names.get(record.habit_id, record.habit_id),
+                    "value": record.value,
+                }
+            buffer.write(json.dumps(item, ensure_ascii=False))
+            buffer.write("\n")
+            if buffer.tell() >= FLUSH_BYTES:
+                yield self._drain(buffer)
+        yield self._drain(buffer)
+
+    def stream(self, user: User, export_format: str) -> Iterator[bytes]:
+        if export_format == "ndjson":
+            return self.iter_ndjson(user)
+        return self.iter_csv(user)
+
+    def _habit_names(self, user: User) -> dict[str, str]:
+        return {habit.id: habit.name for habit in self.store.list_habits(user.id)}
+
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
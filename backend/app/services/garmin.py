@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import json
+import logging
 import os
+import shutil
 import uuid
-from datetime import UTC, date, datetime, timedelta
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from datetime import UTC, date, datetime, time, timedelta
 from pathlib import Path
-from typing import Any
+from functools import partial
+from typing import Any, NamedTuple, Optional
 
 import requests
 from garminconnect import (
@@ -14,8 +17,27 @@ from garminconnect import (
     GarminConnectConnectionError,
     GarminConnectTooManyRequestsError,
 )
+from garth import Client as GarthClient
+from garth.auth_tokens import OAuth2Token
 from garth.data import SleepData
-
+from garth.utils import camel_to_snake_dict
+
+from app.services.events import event_bus
+from app.services.garmin_api import (
+    GarminConnectError,
+    GarminMFARequired,
+    GarminRateLimited,
+    is_rate_limited,
+    observed,
+    request_budget,
+)
+from app.services.garmin_cache import NOT_CACHED, garmin_cache
+from app.services.garmin_clients import garmin_clients
+from app.services.garmin_transport import garmin_transport
+from app.services.metrics import registry
+from app.services.sample_data import sample_dataset
+from app.services.single_flight import SingleFlight
+from app.services.sleep_series import series_from_payload, sleep_series
 from app.services.storage import (
     GarminAccount,
     GarminMFASession,
@@ -25,28 +47,69 @@ from app.services.storage import (
 )
 
 
-class GarminConnectError(Exception):
-    """Base error for Garmin Connect integration."""
+# Day fetches share one pool, so concurrent syncs can't flood Garmin
+SYNC_WORKERS = int(os.getenv("GARMIN_SYNC_WORKERS", "8"))
+REQUEST_TIMEOUT = float(os.getenv("GARMIN_REQUEST_TIMEOUT", "10"))
+# Budget for a whole sync; days still pending after it count as failed
+SYNC_DEADLINE = float(os.getenv("GARMIN_SYNC_DEADLINE", "60"))
+# Nights up to and including the last synced one that are fetched again,
+# since Garmin can still revise a recent night's score
+RECHECK_DAYS = 1
+# A pull within this many seconds of the last clean sync answers from the
+# store instead of asking Garmin again
+PULL_FRESH_SECONDS = float(os.getenv("GARMIN_PULL_FRESH_SECONDS", "60"))
+BACKFILL_PAGE_DAYS = 30
+# Nights in a row without data before a backfill decides the history has
+# ended; a month or two without wearing the watch doesn't end it
+BACKFILL_EMPTY_NIGHTS = 3 * BACKFILL_PAGE_DAYS
+SLEEP_PATH = "/wellness-service/wellness/dailySleepData/{username}?nonSleepBufferMinutes=60&date={day}"
+DEBUG = os.getenv("GARMIN_DEBUG", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+_fetch_pool = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix="garmin-fetch")
+# Recent-sleep syncs in flight per user, days and throttling
+sync_flights: SingleFlight[list] = SingleFlight()
+registry.counter(
+    "sleephabits_garmin_syncs_total", "Recent-sleep syncs started, and calls that joined one in flight.", ("result",),
+    read=lambda: {("started",): sync_flights.started, ("shared",): sync_flights.shared},
+)
+
 
+class SleepFetch(NamedTuple):
+    found: dict[date, SleepData]
+    failed: list[date]
+    rate_limited: bool = False
+    payloads: dict[date, Any] | None = None  # raw responses of the nights found
 
-class GarminMFARequired(GarminConnectError):
-    """Raised when MFA is required to complete login."""
 
-    def __init__(self, token: str) -> None:
-        super().__init__("MFA verification required")
-        self.token = token
+def parse_sleep_payload(payload: Any) -> SleepData | None:
+    """Build garth's SleepData from a raw dailySleepData response (None: no night)."""
+    if not payload:
+        return None
+    data = camel_to_snake_dict(payload)
+    if not (data.get("daily_sleep_dto") or {}).get("id"):
+        return None
+    return SleepData(**data)
 
 
 class GarminConnectService:
     """Integrates with python-garminconnect for credential-based syncing."""
 
-    def __init__(self) -> None:
+    def __init__(self, throttle: bool = False) -> None:
         self.store = store
+        self.throttle = throttle
+        self.clients = garmin_clients
+        self.transport = garmin_transport
+        self.cache = garmin_cache
+        self.series = sleep_series
         self.base_dir = Path(__file__).resolve().parent.parent / "data"
+        # Created per user on first login, by _token_root_for
         self.token_root = self.base_dir / "garmin_tokens"
-        self.token_root.mkdir(parents=True, exist_ok=True)
-        self.sample_file = self.base_dir / "sample_garmin_sleep.json"
+        self.samples = sample_dataset
         self.allow_sample = os.getenv("GARMIN_SAMPLE_MODE", "1") != "0"
+        self.flights = sync_flights
+        self.events = event_bus
 
     # ------------------------------------------------------------------
     def connect(
@@ -66,10 +129,11 @@ class GarminConnectService:
         if not email or not password:
             raise GarminConnectError("Email and password are required for Garmin connect")
 
-        garmin = Garmin(email=email, password=password, return_on_mfa=True)
+        garmin = self.transport.garmin(email=email, password=password, return_on_mfa=True)
 
         try:
-            result = garmin.login()
+            with observed("login"):
+                result = garmin.login()
             if result and isinstance(result, tuple) and result[0] == "needs_mfa":
                 token = self._store_mfa_session(user=user, email=email, garmin=garmin, client_state=result[1])
                 raise GarminMFARequired(token)
@@ -130,7 +194,8 @@ class GarminConnectService:
         garmin = session.garmin_object
         client_state = session.client_state
         try:
-            garmin.resume_login(client_state, code)
+            with observed("mfa"):
+                garmin.resume_login(client_state, code)
             self._persist_tokens(user=user, garmin=garmin, email=session.email)
             sessions = self.sync_recent_sleep(user=user, days=30)
             return {
@@ -142,86 +207,374 @@ class GarminConnectService:
         except (GarminConnectAuthenticationError, GarminConnectConnectionError) as exc:
             raise GarminConnectError(f"Failed to complete MFA: {exc}") from exc
 
+    def disconnect(self, *, user: User) -> None:
+        """Forget the user's Garmin login, pooled client and cached responses.
+
+        Nights already imported stay in the user's history.
+        """
+        account = self.store.get_garmin_account(user.id)
+        self.store.delete_garmin_account(user.id)
+        self.clients.discard(user.id)
+        shutil.rmtree(account.token_path if account else self.token_root / user.id, ignore_errors=True)
+        self.cache.forget(user.id)
+        user.garmin_connected = False
+        self.store.upsert_user(user)
+
     # ------------------------------------------------------------------
     def sync_recent_sleep(self, *, user: User, days: int = 30) -> list[SleepSession]:
+        """Fetch nights since the last sync and merge them into the stored history.
+
+        The first sync covers the last ``days`` nights; later syncs start at
+        the high-water mark (``last_synced_at``) minus ``RECHECK_DAYS``, so a
+        daily pull costs one or two requests. Older history is left alone.
+        A call while the same sync is already running waits for that one.
+        """
+        return self.start_sync(user=user, days=days).result()
+
+    def start_sync(self, *, user: User, days: int = 30, executor: Optional[Executor] = None) -> Future:
+        """The user's sync in flight, or a new one started on ``executor`` (default: inline).
+
+        Only a sync over the same ``days`` by an equally throttled service is
+        joined, so an interactive pull never ends up waiting for the budget
+        behind a background sync.
+        """
+        key = (user.id, days, self.throttle)
+        return self.flights.run(key, partial(self._sync_and_notify, user, days), executor)
+
+    def synced_recently(self, user: User) -> bool:
+        """Whether the last sync covered everything and finished within ``PULL_FRESH_SECONDS``."""
+        account = self.store.get_garmin_account(user.id)
+        if account is None or account.last_synced_at is None:
+            return False
+        return (datetime.now(tz=UTC) - account.last_synced_at).total_seconds() < PULL_FRESH_SECONDS
+
+    def _sync_and_notify(self, user: User, days: int) -> list[SleepSession]:
+        """Sync, then tell the user's connected devices how it went."""
+        try:
+            with observed("sync"):
+                sessions = self._sync_recent_sleep(user, days)
+        except GarminRateLimited as exc:
+            self.events.publish(user.id, "sync", {"status": "rate_limited", "detail": str(exc)})
+            raise
+        except Exception as exc:
+            self.events.publish(user.id, "sync", {"status": "failed", "detail": str(exc)})
+            raise
+        account = self.store.get_garmin_account(user.id)
+        self.events.publish(user.id, "sync", {
+            "status": "completed",
+            "nights": len(sessions),
+            "last_synced_at": account.last_synced_at if account else None,
+        })
+        return sessions
+
+    def _sync_recent_sleep(self, user: User, days: int) -> list[SleepSession]:
         account = self.store.get_garmin_account(user.id)
         if not account:
             if self.allow_sample:
                 return self._load_sample_data(user)
             raise GarminConnectError("Garmin account not connected")
 
-        token_path = Path(account.token_path)
-        garmin = Garmin()
+        client = self._client_for(user, account)
+        if client is None:
+            return self._load_sample_data(user)
+
+        today = datetime.now(tz=UTC).astimezone().date()
+        start = today - timedelta(days=days - 1)
+        if account.last_synced_at is None:
+            account.backfilled_until = account.backfilled_until or start
+        else:
+            high_water = account.last_synced_at.astimezone().date()
+            start = min(high_water - timedelta(days=RECHECK_DAYS - 1), today)
+        target_dates = [today - timedelta(days=offset) for offset in range((today - start).days + 1)]
+        sessions, fetch = self._fetch_and_merge(user, client, target_dates)
+
+        # Don't move the mark past a night we could not fetch; the next sync retries it
+        if fetch.failed:
+            account.last_synced_at = datetime.combine(fetch.failed[0], time.min).astimezone()
+        else:
+            account.last_synced_at = datetime.now(tz=UTC)
+        self.store.set_garmin_account(account)
+        self.clients.save_tokens(user.id)
+        if fetch.rate_limited:
+            raise GarminRateLimited(
+                "Garmin rate limit reached; try again later",
+                retry_after=max(request_budget.wait_time(len(fetch.failed)), 1.0),
+            )
+        return sessions
+
+    def backfill_sleep(
+        self,
+        *,
+        user: User,
+        days: int = BACKFILL_PAGE_DAYS,
+        page_days: int = BACKFILL_PAGE_DAYS,
+    ) -> list[SleepSession]:
+        """Page backwards through nights older than anything synced so far.
+
+        Each call fetches up to ``days`` nights, continuing from where the
+        previous backfill stopped. Once ``BACKFILL_EMPTY_NIGHTS`` nights in a
+        row have come back empty, the account's history is taken to be
+        exhausted and the backfill is marked complete.
+        """
+        with observed("backfill"):
+            return self._backfill_sleep(user, days, page_days)
+
+    def _backfill_sleep(self, user: User, days: int, page_days: int) -> list[SleepSession]:
+        account = self.store.get_garmin_account(user.id)
+        if not account:
+            raise GarminConnectError("Garmin account not connected")
+        if account.backfill_complete:
+            return []
+
+        client = self._client_for(user, account)
+        if client is None:
+            raise GarminConnectError("Failed to use stored Garmin tokens")
+
+        # Exclusive upper bound: the oldest night any sync or backfill asked for
+        cursor = account.backfilled_until or datetime.now(tz=UTC).astimezone().date() + timedelta(days=1)
+
+        sessions: list[SleepSession] = []
+        fetch = SleepFetch({}, [])
+        remaining = days
+        while remaining > 0:
+            size = min(page_days, remaining)
+            page = [cursor - timedelta(days=offset) for offset in range(1, size + 1)]
+            fetched, fetch = self._fetch_and_merge(user, client, page)
+            sessions.extend(fetched)
+            if fetch.failed:
+                # Resume from the newest failed night next time
+                cursor = fetch.failed[-1] + timedelta(days=1)
+                break
+            cursor = page[-1]
+            remaining -= size
+            if fetched:
+                oldest = min(session.date for session in fetched)
+                account.backfill_empty_nights = sum(1 for day in page if day < oldest)
+            else:
+                account.backfill_empty_nights += size
+            if account.backfill_empty_nights >= BACKFILL_EMPTY_NIGHTS:
+                account.backfill_complete = True
+                break
+
+        account.backfilled_until = cursor
+        self.store.set_garmin_account(account)
+        self.clients.save_tokens(user.id)
+        if fetch.rate_limited:
+            raise GarminRateLimited(
+                "Garmin rate limit reached; try again later",
+                retry_after=max(request_budget.wait_time(len(fetch.failed)), 1.0),
+            )
+        return sessions
+
+    def _fetch_and_merge(
+        self,
+        user: User,
+        client: GarthClient,
+        target_dates: list[date],
+    ) -> tuple[list[SleepSession], SleepFetch]:
+        fetch = self.fetch_sleep_days(client, target_dates, user_id=user.id)
+        if fetch.failed:
+            logger.warning(
+                "%d/%d Garmin day fetches failed for %s: %s",
+                len(fetch.failed), len(target_dates), user.id, ", ".join(map(str, fetch.failed)),
+            )
+        sessions = [
+            self._session_from_sleep_data(user.id, fetch.found[target_date])
+            for target_date in target_dates
+            if target_date in fetch.found
+        ]
+        # Merge per night: older history and manual entries on other dates stay
+        self.store.upsert_sleep_sessions(user.id, sessions)
+        for day, payload in (fetch.payloads or {}).items():
+            self.series.put(user.id, day, series_from_payload(payload))
+        return sessions, fetch
+
+    def _client_for(self, user: User, account: GarminAccount) -> GarthClient | None:
+        """The user's pooled, authenticated garth client, or None if the tokens don't work."""
         try:
-            garmin.login(str(token_path))
+            return self.clients.get(user.id, account.token_path, lambda: self._login_with_tokens(account))
         except Exception as exc:
+            self.clients.discard(user.id)
             if not self.allow_sample:
                 raise GarminConnectError(f"Failed to use stored tokens: {exc}") from exc
-            return self._load_sample_data(user)
+            return None
 
-        sessions: list[SleepSession] = []
-        today = datetime.now(tz=UTC).astimezone()
-        for offset in range(days):
-            target_date = (today - timedelta(days=offset)).date()
-            data = self._fetch_sleep_dataclass(garmin, target_date)
-            if not data:
-                continue
-            dto = data.daily_sleep_dto
-            
-            # Debug logging for Garmin data
-            print(f"\n[GARMIN DEBUG] Sleep data for {target_date}")
-            print(f"  Calendar Date: {dto.calendar_date}")
-            print(f"  Sleep Start: {dto.sleep_start}")
-            print(f"  Sleep End: {dto.sleep_end}")
-            print(f"  Sleep Time (seconds): {dto.sleep_time_seconds}")
-            print(f"  Deep Sleep (seconds): {dto.deep_sleep_seconds}")
-            print(f"  Light Sleep (seconds): {dto.light_sleep_seconds}")
-            print(f"  REM Sleep (seconds): {dto.rem_sleep_seconds}")
-            print(f"  Awake (seconds): {dto.awake_sleep_seconds}")
-            if dto.sleep_scores:
-                print(f"  Overall Score: {dto.sleep_scores.overall.value}")
-                print(f"  Sleep Quality: {getattr(dto.sleep_scores, 'quality_score', 'N/A')}")
-                print(f"  Sleep Recovery: {getattr(dto.sleep_scores, 'recovery_score', 'N/A')}")
-                print(f"  Sleep Duration: {getattr(dto.sleep_scores, 'duration_score', 'N/A')}")
-            print(f"  Validation: {getattr(dto, 'validation', 'N/A')}")
-            print(f"  Naps (if any): {getattr(data, 'naps', 'N/A')}")
-            print(f"  Available attributes: {dir(dto)}")
-            
-            duration_minutes = int(dto.sleep_time_seconds / 60) if dto.sleep_time_seconds else 0
-            session = SleepSession(
-                user_id=user.id,
-                date=dto.calendar_date,
-                duration_minutes=duration_minutes,
-                sleep_score=(dto.sleep_scores.overall.value if dto.sleep_scores else None),
-                bedtime=dto.sleep_start.strftime("%H:%M"),
-                wake_time=dto.sleep_end.strftime("%H:%M"),
-                stage_minutes={
-                    "deep": int((dto.deep_sleep_seconds or 0) / 60),
-                    "light": int((dto.light_sleep_seconds or 0) / 60),
-                    "rem": int((dto.rem_sleep_seconds or 0) / 60),
-                    "awake": int((dto.awake_sleep_seconds or 0) / 60),
-                },
-            )
-            sessions.append(session)
+    def _login_with_tokens(self, account: GarminAccount) -> GarthClient:
+        garmin = self.transport.garmin()
+        with observed("token_login"):
+            garmin.login(str(Path(account.token_path)))
+        garmin.garth.configure(timeout=REQUEST_TIMEOUT)
+        return garmin.garth
 
-        if sessions:
-            self.store.overwrite_sleep_sessions(user.id, sessions)
-            account.last_synced_at = datetime.now(tz=UTC)
-            self.store.set_garmin_account(account)
-        return sessions
+    def fetch_sleep_days(
+        self,
+        client: GarthClient,
+        days: list[date],
+        user_id: str | None = None,
+    ) -> SleepFetch:
+        """Fetch several days concurrently; returns the nights found and the days that failed.
+
+        Each request is bounded by the client's timeout and the whole batch by
+        ``SYNC_DEADLINE``. A day without a recorded night is not a failure.
+        On the first 429 the requests that haven't started are cancelled.
+        A throttled service waits for ``request_budget`` before handing each
+        day to the pool, so that wait is not part of the deadline.
+        With ``user_id``, raw responses are cached, and nights the cache
+        already holds in their final form are not requested again.
+        """
+        found: dict[date, SleepData] = {}
+        payloads: dict[date, Any] = {}
+        to_fetch = []
+        for day in days:
+            payload = self.cache.get(user_id, day, settled_only=True) if user_id else NOT_CACHED
+            if payload is NOT_CACHED:
+                to_fetch.append(day)
+            elif (data := parse_sleep_payload(payload)) is not None:
+                found[day] = data
+                payloads[day] = payload
+        if not to_fetch:
+            return SleepFetch(found, [], payloads=payloads)
+
+        # Resolve the profile and OAuth2 token once instead of racing in every worker;
+        # garth's username property fetches the profile on first access and caches it
+        try:
+            _ = client.username
+            if not isinstance(client.oauth2_token, OAuth2Token) or client.oauth2_token.expired:
+                client.refresh_oauth2()
+        except Exception as exc:
+            if is_rate_limited(exc):
+                raise GarminRateLimited(
+                    "Garmin rate limit reached; try again later",
+                    retry_after=max(request_budget.wait_time(len(to_fetch)), 1.0),
+                ) from exc
+            raise GarminConnectError(f"Failed to load the Garmin profile: {exc}") from exc
+
+        futures = {}
+        failed: list[date] = []
+        rate_limited = False
+        for index, day in enumerate(to_fetch):
+            if self.throttle:
+                # Wait for the budget here, not in the shared pool: a waiting
+                # background sync must not hold a worker an interactive pull needs
+                request_budget.acquire()
+                if any(future.done() and self._hit_rate_limit(future) for future in futures):
+                    failed.extend(to_fetch[index:])
+                    break
+            else:
+                request_budget.debit()
+            futures[_fetch_pool.submit(self._fetch_sleep_payload, client, day, user_id)] = day
+        try:
+            for future in as_completed(futures, timeout=SYNC_DEADLINE):
+                day = futures.pop(future)
+                exc = None if future.cancelled() else future.exception()
+                if future.cancelled() or exc is not None:
+                    failed.append(day)
+                    if exc is not None and not rate_limited and is_rate_limited(exc):
+                        rate_limited = True
+                        for other in futures:
+                            other.cancel()
+                elif (data := parse_sleep_payload(future.result())) is not None:
+                    found[day] = data
+                    payloads[day] = future.result()
+        except TimeoutError:
+            pass
+        for future, day in futures.items():
+            future.cancel()
+            failed.append(day)
+        if user_id:
+            self.cache.flush(user_id)
+        return SleepFetch(found, sorted(failed), rate_limited, payloads)
+
+    @staticmethod
+    def _hit_rate_limit(future: Future) -> bool:
+        return not future.cancelled() and (exc := future.exception()) is not None and is_rate_limited(exc)
+
+    def reprocess_from_cache(self, user_ids: list[str] | None = None) -> dict[str, int]:
+        """Rebuild stored sleep sessions from cached Garmin responses, without network I/O."""
+        users = nights = 0
+        for user_id in user_ids or self.cache.users():
+            sessions = []
+            for day, payload in self.cache.iter_user(user_id):
+                if (data := parse_sleep_payload(payload)) is not None:
+                    sessions.append(self._session_from_sleep_data(user_id, data))
+                    self.series.put(user_id, day, series_from_payload(payload))
+            self.store.upsert_sleep_sessions(user_id, sessions)
+            users += 1
+            nights += len(sessions)
+        return {"users": users, "nights": nights}
+
+    def _session_from_sleep_data(self, user_id: str, data: SleepData) -> SleepSession:
+        dto = data.daily_sleep_dto
+        if DEBUG:
+            self._log_sleep_debug(data)
+
+        duration_minutes = int(dto.sleep_time_seconds / 60) if dto.sleep_time_seconds else 0
+        return SleepSession(
+            user_id=user_id,
+            date=dto.calendar_date,
+            duration_minutes=duration_minutes,
+            sleep_score=(dto.sleep_scores.overall.value if dto.sleep_scores else None),
+            bedtime=dto.sleep_start.strftime("%H:%M"),
+            wake_time=dto.sleep_end.strftime("%H:%M"),
+            stage_minutes={
+                "deep": int((dto.deep_sleep_seconds or 0) / 60),
+                "light": int((dto.light_sleep_seconds or 0) / 60),
+                "rem": int((dto.rem_sleep_seconds or 0) / 60),
+                "awake": int((dto.awake_sleep_seconds or 0) / 60),
+            },
+        )
+
+    @staticmethod
+    def _log_sleep_debug(data: SleepData) -> None:
+        dto = data.daily_sleep_dto
+        scores = dto.sleep_scores
+        logger.debug(
+            "Garmin sleep data for %s: start %s, end %s, sleep %ss (deep %ss, light %ss, REM %ss, awake %ss)",
+            dto.calendar_date,
+            dto.sleep_start,
+            dto.sleep_end,
+            dto.sleep_time_seconds,
+            dto.deep_sleep_seconds,
+            dto.light_sleep_seconds,
+            dto.rem_sleep_seconds,
+            dto.awake_sleep_seconds,
+        )
+        if scores:
+            logger.debug(
+                "Garmin sleep scores for %s: overall %s, quality %s, recovery %s, duration %s",
+                dto.calendar_date,
+                scores.overall.value,
+                getattr(scores, "quality_score", "N/A"),
+                getattr(scores, "recovery_score", "N/A"),
+                getattr(scores, "duration_score", "N/A"),
+            )
+        logger.debug(
+            "Garmin sleep extras for %s: validation %s, naps %s",
+            dto.calendar_date,
+            getattr(dto, "validation", "N/A"),
+            getattr(data, "naps", "N/A"),
+        )
 
     # ------------------------------------------------------------------
     def _persist_tokens(self, *, user: User, garmin: Garmin, email: str) -> None:
         token_dir = self._token_root_for(user)
         garmin.garth.dump(str(token_dir))
+        # A pooled client may still hold the previous login's tokens
+        self.clients.discard(user.id)
 
         account = GarminAccount(
             user_id=user.id,
             email=email,
             token_path=str(token_dir),
             display_name=getattr(garmin, "display_name", None),
-            last_synced_at=datetime.now(tz=UTC),
         )
+        previous = self.store.get_garmin_account(user.id)
+        if previous and previous.email == email:
+            # Reconnecting the same Garmin account keeps the sync progress
+            account.last_synced_at = previous.last_synced_at
+            account.backfilled_until = previous.backfilled_until
+            account.backfill_empty_nights = previous.backfill_empty_nights
+            account.backfill_complete = previous.backfill_complete
         self.store.set_garmin_account(account)
         user.garmin_connected = True
         self.store.upsert_user(user)
@@ -245,11 +598,13 @@ class GarminConnectService:
         self.store.save_mfa_session(session)
         return token
 
-    def _fetch_sleep_dataclass(self, garmin: Garmin, day: date) -> SleepData | None:
-        try:
-            return SleepData.get(day.isoformat(), client=garmin.garth)
-        except Exception:
-            return None
+    def _fetch_sleep_payload(self, client: GarthClient, day: date, user_id: str | None = None) -> Any:
+        """One day's raw response; the caller has already taken it from ``request_budget``."""
+        with observed("sleep_day"):
+            payload = client.connectapi(SLEEP_PATH.format(username=client.username, day=day.isoformat()))
+        if user_id:
+            self.cache.put(user_id, day, payload)
+        return payload
 
     def _token_root_for(self, user: User) -> Path:
         path = self.token_root / user.id
@@ -257,28 +612,14 @@ class GarminConnectService:
         return path
 
     def _load_sample_data(self, user: User) -> list[SleepSession]:
-        if not self.sample_file.exists():
-            return []
-        payload = json.loads(self.sample_file.read_text())
-        sessions: list[SleepSession] = []
-        for item in payload.get("sleep_sessions", []):
-            sessions.append(
-                SleepSession(
-                    user_id=user.id,
-                    date=datetime.fromisoformat(item["date"]).date(),
-                    duration_minutes=int(item.get("duration_minutes", 0)),
-                    sleep_score=item.get("sleep_score"),
-                    bedtime=item.get("bedtime", "22:30"),
-                    wake_time=item.get("wake_time", "06:30"),
-                    stage_minutes={
-                        key: int(value) for key, value in item.get("stage_minutes", {}).items()
-                    },
-                )
-            )
-        if sessions:
-            self.store.overwrite_sleep_sessions(user.id, sessions)
+        """Lay the demo nights out up to today, replacing the ones laid out before."""
+        today = datetime.now(tz=UTC).astimezone().date()
+        sessions = self.samples.sessions_for(user.id, today)
+        if not sessions:
+            return sessions
+        oldest = sessions[-1].date
+        start = min(oldest, self.samples.laid_out.get(user.id, oldest))
+        kept = [s for s in self.store.iter_sleep_sessions(user.id) if not start <= s.date <= today]
+        self.store.overwrite_sleep_sessions(user.id, kept + sessions)
+        self.samples.laid_out[user.id] = oldest
         return sessions
-
-
-def get_garmin_service() -> GarminConnectService:
-    return GarminConnectService()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+from app.services.metrics import registry
+from app.services.token_bucket import TokenBucket
+
+if TYPE_CHECKING:
+    from app.services.garmin import GarminConnectService
+    from app.services.storage import SleepSession, User
+
+# Rebuild stored nights from the cached Garmin responses when the app starts
+REPROCESS_CACHE_ON_START = os.getenv("GARMIN_REPROCESS_CACHE", "0") == "1"
+# Shared Garmin request budget. Background syncs wait for it; interactive
+# pulls are never delayed but still draw it down.
+request_budget = TokenBucket(
+    rate=float(os.getenv("GARMIN_REQUESTS_PER_SECOND", "5")),
+    capacity=float(os.getenv("GARMIN_REQUEST_BURST", "60")),
+)
+garmin_calls = registry.histogram(
+    "sleephabits_garmin_call_duration_seconds",
+    "Garmin calls by kind: login, mfa, token_login, sleep_day (one request), sync and backfill (whole runs).",
+    ("call",),
+)
+garmin_errors = registry.counter(
+    "sleephabits_garmin_errors_total", "Garmin calls that raised, by kind and exception type.", ("call", "exception")
+)
+
+
+class GarminConnectError(Exception):
+    """Base error for Garmin Connect integration."""
+
+
+class GarminRateLimited(GarminConnectError):
+    """Garmin answered 429; nights fetched before that were still stored.
+
+    ``retry_after`` is how many seconds the request budget needs before
+    the nights that failed could be asked for again.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GarminMFARequired(GarminConnectError):
+    """Raised when MFA is required to complete login."""
+
+    def __init__(self, token: str) -> None:
+        super().__init__("MFA verification required")
+        self.token = token
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """Whether ``exc`` (or what caused it) is Garmin saying "too many requests"."""
+    # Only Garmin calls raise these, so by now the stack is already loaded
+    import requests
+    from garminconnect import GarminConnectTooManyRequestsError
+
+    while exc is not None:
+        if isinstance(exc, (GarminConnectTooManyRequestsError, GarminRateLimited)):
+            return True
+        response = getattr(getattr(exc, "error", None), "response", None)
+        if response is not None and response.status_code == 429:
+            return True
+        # urllib3 gives up retrying 429s with a RetryError
+        if isinstance(exc, requests.exceptions.RetryError) and "429" in str(exc):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+@contextmanager
+def observed(call: str) -> Iterator[None]:
+    """Time a Garmin call and count its failures by exception type."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        garmin_errors.inc(call, type(exc).__name__)
+        raise
+    finally:
+        garmin_calls.observe(time.perf_counter() - started, call)
+
+
+class LazyGarminService:
+    """The app's handle on GarminConnectService, built on first use.
+
+    garminconnect, garth and requests are slow to import, and most
+    processes (tests, workers that never see a Garmin user) don't need
+    them. Nothing here imports them: ``app.services.garmin`` is loaded by
+    the first call that talks to Garmin.
+    """
+
+    def __init__(self, throttle: bool = False) -> None:
+        self.throttle = throttle
+        self._service: Optional[GarminConnectService] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._service is not None
+
+    @property
+    def service(self) -> GarminConnectService:
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    from app.services.garmin import GarminConnectService
+
+                    self._service = GarminConnectService(throttle=self.throttle)
+        return self._service
+
+    def connect(self, **kwargs: Any) -> dict[str, Any]:
+        return self.service.connect(**kwargs)
+
+    def sync_recent_sleep(self, *, user: User, days: int = 30) -> list[SleepSession]:
+        return self.service.sync_recent_sleep(user=user, days=days)
+
+    def start_sync(self, *, user: User, days: int = 30, executor: Optional[Executor] = None) -> Future:
+        return self.service.start_sync(user=user, days=days, executor=executor)
+
+    def synced_recently(self, user: User) -> bool:
+        return self.service.synced_recently(user)
+
+    def backfill_sleep(self, *, user: User, **kwargs: Any) -> list[SleepSession]:
+        return self.service.backfill_sleep(user=user, **kwargs)
+
+    def disconnect(self, *, user: User) -> None:
+        self.service.disconnect(user=user)
+
+    def reprocess_from_cache(self, user_ids: Optional[list[str]] = None) -> dict[str, int]:
+        return self.service.reprocess_from_cache(user_ids)
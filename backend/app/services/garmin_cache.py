@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.services.metrics import watch_cache
+
+CACHE_DIR = Path(
+    os.getenv("GARMIN_CACHE_DIR", Path(__file__).resolve().parent.parent / "data" / "garmin_cache")
+)
+MAX_BYTES = int(float(os.getenv("GARMIN_CACHE_MAX_MB", "256")) * 1024 * 1024)
+MAX_AGE = timedelta(days=int(os.getenv("GARMIN_CACHE_MAX_AGE_DAYS", "400")))
+# A night fetched at least this long after its date is treated as final
+SETTLE_AFTER = timedelta(days=1)
+# Returned for nights with no cached response; a cached ``null`` reads back as None
+NOT_CACHED: Any = object()
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    digest: str
+    fetched_at: datetime
+
+
+class SleepPayloadCache:
+    """Raw dailySleepData responses on disk, per user and night.
+
+    Payloads are stored gzip-compressed under their sha256, so identical
+    responses (e.g. the empty "no night" answer) are kept once. A small
+    JSON index per user maps each night to its payload and fetch time.
+    Entries older than ``max_age`` go first, then the least recently fetched
+    ones until the objects fit in ``max_bytes``.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = MAX_BYTES, max_age: timedelta = MAX_AGE) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.indexes: Dict[str, Dict[date, CacheEntry]] = {}
+        self.dirty: set[str] = set()
+        self.lock = threading.Lock()
+        self.total_bytes: Optional[int] = None  # computed lazily from disk
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    def put(self, user_id: str, day: date, payload: Any) -> str:
+        data = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            compressed = gzip.compress(data, mtime=0)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(compressed)
+            os.replace(tmp, path)
+            with self.lock:
+                if self.total_bytes is not None:
+                    self.total_bytes += len(compressed)
+        with self.lock:
+            self._index(user_id)[day] = CacheEntry(digest, datetime.now(tz=UTC))
+            self.dirty.add(user_id)
+        return digest
+
+    def get(self, user_id: str, day: date, settled_only: bool = False) -> Any:
+        """The cached payload for a night, or ``NOT_CACHED``.
+
+        With ``settled_only``, a payload fetched before the night settled
+        counts as not cached.
+        """
+        with self.lock:
+            entry = self._index(user_id).get(day)
+        if entry is None or (settled_only and entry.fetched_at.date() < day + SETTLE_AFTER):
+            payload = NOT_CACHED
+        else:
+            payload = self._read(entry.digest)
+        with self.lock:
+            if payload is NOT_CACHED:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return payload
+
+    def iter_user(self, user_id: str) -> Iterator[Tuple[date, Any]]:
+        with self.lock:
+            entries = sorted(self._index(user_id).items())
+        for day, entry in entries:
+            payload = self._read(entry.digest)
+            if payload is not NOT_CACHED:
+                yield day, payload
+
+    def users(self) -> list[str]:
+        index_dir = self.root / "index"
+        on_disk = {path.stem for path in index_dir.glob("*.json")} if index_dir.exists() else set()
+        return sorted(on_disk | set(self.indexes))
+
+    def forget(self, user_id: str) -> int:
+        """Drop a user's index; returns the payload files no other user shares, now removed."""
+        with self.lock:
+            self.indexes.pop(user_id, None)
+            self.dirty.discard(user_id)
+            self._index_path(user_id).unlink(missing_ok=True)
+        return self.prune()
+
+    def flush(self, user_id: Optional[str] = None) -> None:
+        """Write changed indexes, then evict if the cache has grown past its limits."""
+        with self.lock:
+            users = [user_id] if user_id is not None else list(self.dirty)
+            for uid in users:
+                if uid in self.dirty:
+                    self._write_index(uid)
+                    self.dirty.discard(uid)
+            over = self._size() > self.max_bytes
+        if over:
+            self.prune()
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Apply age and size limits; returns the number of payload files removed."""
+        now = now or datetime.now(tz=UTC)
+        with self.lock:
+            for uid in self.users():
+                index = self._index(uid)
+                expired = [day for day, entry in index.items() if now - entry.fetched_at > self.max_age]
+                for day in expired:
+                    del index[day]
+                if expired:
+                    self._write_index(uid)
+
+            referenced: Dict[str, datetime] = {}
+            for uid in self.users():
+                for entry in self._index(uid).values():
+                    referenced[entry.digest] = max(entry.fetched_at, referenced.get(entry.digest, entry.fetched_at))
+            sizes = {path.name.split(".")[0]: path.stat().st_size for path in self._objects()}
+            removed = [digest for digest in sizes if digest not in referenced]
+
+            total = sum(size for digest, size in sizes.items() if digest in referenced)
+            if total > self.max_bytes:
+                evict: set[str] = set()
+                for digest, _ in sorted(referenced.items(), key=lambda item: item[1]):
+                    if total <= self.max_bytes:
+                        break
+                    evict.add(digest)
+                    total -= sizes.get(digest, 0)
+                for uid in self.users():
+                    index = self._index(uid)
+                    stale = [day for day, entry in index.items() if entry.digest in evict]
+                    for day in stale:
+                        del index[day]
+                    if stale:
+                        self._write_index(uid)
+                removed.extend(evict)
+
+            for digest in removed:
+                self._object_path(digest).unlink(missing_ok=True)
+            self.total_bytes = total
+        return len(removed)
+
+    # ------------------------------------------------------------------
+    def _index(self, user_id: str) -> Dict[date, CacheEntry]:
+        index = self.indexes.get(user_id)
+        if index is None:
+            index = self.indexes[user_id] = {}
+            path = self._index_path(user_id)
+            if path.exists():
+                for day, (digest, fetched_at) in json.loads(path.read_text(encoding="utf-8")).items():
+                    index[date.fromisoformat(day)] = CacheEntry(digest, datetime.fromisoformat(fetched_at))
+        return index
+
+    def _write_index(self, user_id: str) -> None:
+        path = self._index_path(user_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            day.isoformat(): [entry.digest, entry.fetched_at.isoformat()]
+            for day, entry in sorted(self.indexes.get(user_id, {}).items())
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _read(self, digest: str) -> Any:
+        try:
+            return json.loads(gzip.decompress(self._object_path(digest).read_bytes()))
+        except FileNotFoundError:
+            return NOT_CACHED
+
+    def _size(self) -> int:
+        if self.total_bytes is None:
+            self.total_bytes = sum(path.stat().st_size for path in self._objects())
+        return self.total_bytes
+
+    def _objects(self) -> Iterator[Path]:
+        objects = self.root / "objects"
+        return objects.glob("*/*.json.gz") if objects.exists() else iter(())
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}.json.gz"
+
+    def _index_path(self, user_id: str) -> Path:
+        return self.root / "index" / f"{user_id}.json"
+
+
+garmin_cache = SleepPayloadCache()
+watch_cache("garmin_payloads", garmin_cache)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Optional
+
+from app.services.metrics import registry, watch_cache
+
+if TYPE_CHECKING:  # garth is imported by the first login, not with the pool
+    from garth import Client as GarthClient
+
+POOL_SIZE = int(os.getenv("GARMIN_CLIENT_POOL_SIZE", "256"))
+IDLE_SECONDS = float(os.getenv("GARMIN_CLIENT_IDLE_SECONDS", "900"))
+# Refresh OAuth2 this long before it expires, so a sync never starts on a dying token
+REFRESH_MARGIN = 300
+
+
+@dataclass
+class PooledClient:
+    client: GarthClient
+    token_path: str
+    last_used: float = field(default_factory=time.monotonic)
+    access_token: Optional[str] = None  # as last written to token_path
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class GarminClientPool:
+    """Bounded LRU of authenticated garth clients, one per user.
+
+    Keeping the client keeps its requests session (and so its open TLS
+    connections) and the cached profile, so back-to-back syncs skip the token
+    load and login round trips. Idle clients are dropped after ``idle_seconds``.
+    Refreshed OAuth2 tokens are written back to the user's token directory.
+    """
+
+    def __init__(self, max_size: int = POOL_SIZE, idle_seconds: float = IDLE_SECONDS) -> None:
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.entries: OrderedDict[str, PooledClient] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, token_path: str, login: Callable[[], GarthClient]) -> GarthClient:
+        """Return the user's warm client, logging in with ``login`` on a miss."""
+        with self.lock:
+            self._evict_idle()
+            entry = self.entries.get(user_id)
+            if entry is not None and entry.token_path != token_path:
+                self._close(self.entries.pop(user_id))
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            # Log in outside the pool lock; it reads files and may hit the network
+            client = login()
+            entry = PooledClient(client=client, token_path=token_path, access_token=_access_token(client))
+            with self.lock:
+                previous = self.entries.pop(user_id, None)
+                if previous is not None:
+                    self._close(previous)
+                self.entries[user_id] = entry
+                while len(self.entries) > self.max_size:
+                    _, oldest = self.entries.popitem(last=False)
+                    self._close(oldest)
+
+        from garth.auth_tokens import OAuth2Token
+
+        with entry.lock:
+            entry.last_used = time.monotonic()
+            token = entry.client.oauth2_token
+            if not isinstance(token, OAuth2Token) or token.expires_at - REFRESH_MARGIN < time.time():
+                entry.client.refresh_oauth2()
+            self._write_back(entry)
+        return entry.client
+
+    def save_tokens(self, user_id: str) -> None:
+        """Persist the token if it was refreshed while the client was in use."""
+        entry = self.entries.get(user_id)
+        if entry is not None:
+            with entry.lock:
+                self._write_back(entry)
+
+    def discard(self, user_id: str) -> None:
+        with self.lock:
+            entry = self.entries.pop(user_id, None)
+        if entry is not None:
+            self._close(entry)
+
+    def close(self) -> None:
+        with self.lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+        for entry in entries:
+            self._close(entry)
+
+    # ------------------------------------------------------------------
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        while self.entries:
+            user_id, entry = next(iter(self.entries.items()))
+            if entry.last_used >= cutoff:
+                break
+            del self.entries[user_id]
+            self._close(entry)
+
+    @staticmethod
+    def _write_back(entry: PooledClient) -> None:
+        access_token = _access_token(entry.client)
+        if access_token != entry.access_token:
+            entry.client.dump(entry.token_path)
+            entry.access_token = access_token
+
+    @staticmethod
+    def _close(entry: PooledClient) -> None:
+        entry.client.sess.close()
+
+
+def _access_token(client: GarthClient) -> Optional[str]:
+    from garth.auth_tokens import OAuth2Token
+
+    token = client.oauth2_token
+    return token.access_token if isinstance(token, OAuth2Token) else None
+
+
+garmin_clients = GarminClientPool()
+watch_cache("garmin_clients", garmin_clients)
+registry.gauge("sleephabits_garmin_clients", "Authenticated Garmin clients in the pool.", read=lambda: len(garmin_clients.entries))
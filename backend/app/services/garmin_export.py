@@ -0,0 +1,462 @@
+from __future__ import annotations
+
+import csv
+import json
+import re
+import zipfile
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional
+from zoneinfo import ZoneInfo
+
+from app.services.imports import ImportCancelled, ImportResult, iter_text_lines
+from app.services.sleep import SleepService
+from app.services.storage import Activity, SleepSession, User, store
+
+BATCH_SIZE = 10_000
+MISSING = frozenset({"", "--"})
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"),
+        start=1,
+    )
+}
+
+# "Oct 1-7", "Aug 27 - Sep 2", "Dec 25-31, 2024", "Oct 7" or "Oct 7, 2024"
+DATE_LABEL_RE = re.compile(
+    r"^(?P<m1>[A-Za-z]{3})\s+(?P<d1>\d{1,2})"
+    r"(?:\s*-\s*(?:(?P<m2>[A-Za-z]{3})\s+)?(?P<d2>\d{1,2}))?"
+    r"(?:,\s*(?P<year>\d{4}))?$"
+)
+# "7h 40min", "8h", "45min"
+DURATION_RE = re.compile(r"^(?:(?P<h>\d+)\s*h)?\s*(?:(?P<m>\d+)\s*min)?$")
+
+# Column name candidates per field; weekly reports prefix everything with "Avg"
+SLEEP_COLUMNS = {
+    "date": ("Date",),
+    "score": ("Avg Score", "Score"),
+    "duration": ("Avg Duration", "Duration"),
+    "bedtime": ("Avg Bedtime", "Bedtime"),
+    "wake_time": ("Avg Wake Time", "Wake Time"),
+}
+ACTIVITY_COLUMNS = {
+    "type": ("Activity Type",),
+    "date": ("Date",),
+    "title": ("Title",),
+    "distance": ("Distance",),
+    "calories": ("Calories",),
+    "time": ("Time",),
+    "elapsed": ("Elapsed Time",),
+    "avg_hr": ("Avg HR",),
+    "max_hr": ("Max HR",),
+    "tss": ("Training Stress Score®", "Training Stress Score"),
+    "steps": ("Steps",),
+}
+
+
+# Scalar parsers ---------------------------------------------------------
+# Garmin reports repeat the same few hundred values (clock times, durations,
+# "--"), so each parser is memoised and applied to whole columns at once.
+@lru_cache(maxsize=8192)
+def parse_number(value: str) -> Optional[float]:
+    """"7,902" -> 7902.0; "--" -> None."""
+    value = value.strip()
+    if value in MISSING:
+        return None
+    try:
+        return float(value.replace(",", ""))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def parse_duration_minutes(value: str) -> Optional[int]:
+    """"7h 40min" -> 460."""
+    value = value.strip()
+    if value in MISSING:
+        return None
+    match = DURATION_RE.match(value)
+    if not match or not (match["h"] or match["m"]):
+        return None
+    return int(match["h"] or 0) * 60 + int(match["m"] or 0)
+
+
+@lru_cache(maxsize=4096)
+def parse_clock(value: str) -> Optional[str]:
+    """"12:12 AM" -> "00:12"; 24-hour values pass through."""
+    value = value.strip()
+    if value in MISSING:
+        return None
+    for pattern in ("%I:%M %p", "%H:%M"):
+        try:
+            return datetime.strptime(value, pattern).strftime("%H:%M")
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=8192)
+def parse_elapsed_seconds(value: str) -> Optional[int]:
+    """"00:47:58" or "00:06:28.9" -> seconds."""
+    value = value.strip()
+    if value in MISSING:
+        return None
+    try:
+        parts = [float(part) for part in value.split(":")]
+    except ValueError:
+        return None
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return round(seconds)
+
+
+@dataclass(frozen=True)
+class DateLabel:
+    start_month: int
+    start_day: int
+    end_month: int
+    end_day: int
+    year: Optional[int]
+
+
+@lru_cache(maxsize=4096)
+def parse_date_label(value: str) -> Optional[DateLabel]:
+    value = value.strip()
+    try:
+        day = date.fromisoformat(value[:10])
+        return DateLabel(day.month, day.day, day.month, day.day, day.year)
+    except ValueError:
+        pass
+    match = DATE_LABEL_RE.match(value)
+    if not match:
+        return None
+    start_month = MONTHS.get(match["m1"].lower())
+    end_month = MONTHS.get((match["m2"] or match["m1"]).lower())
+    if not start_month or not end_month:
+        return None
+    start_day = int(match["d1"])
+    end_day = int(match["d2"] or start_day)
+    year = int(match["year"]) if match["year"] else None
+    return DateLabel(start_month, start_day, end_month, end_day, year)
+
+
+def resolve_date_labels(
+    labels: list[Optional[DateLabel]],
+    reference_year: int,
+) -> list[Optional[tuple[date, date]]]:
+    """Turn labels into (first, last) night, filling in omitted years.
+
+    Garmin drops the year for the current year only and lists newest first,
+    so year-less rows belong to the year after the first explicit one (or to
+    ``reference_year`` if there is none). Crossing between January and
+    December moves the year back (newest first) or forward (oldest first).
+    """
+    explicit = next((label.year for label in labels if label and label.year), None)
+    year = explicit + 1 if explicit else reference_year
+    previous_month: Optional[int] = None
+    resolved: list[Optional[tuple[date, date]]] = []
+    for label in labels:
+        if label is None:
+            resolved.append(None)
+            continue
+        if label.year:
+            year = label.year
+        elif previous_month in (1, 2) and label.end_month in (11, 12):
+            year -= 1
+        elif previous_month in (11, 12) and label.end_month in (1, 2):
+            year += 1
+        previous_month = label.end_month
+        # A range such as "Dec 29 - Jan 4" starts in the previous year
+        start_year = year - 1 if label.start_month > label.end_month else year
+        try:
+            resolved.append(
+                (
+                    date(start_year, label.start_month, label.start_day),
+                    date(year, label.end_month, label.end_day),
+                )
+            )
+        except ValueError:
+            resolved.append(None)
+    return resolved
+
+
+# Column-wise batch parsing ---------------------------------------------
+def _column_index(header: list[str], columns: dict[str, tuple[str, ...]]) -> dict[str, int]:
+    positions = {name.strip(): index for index, name in enumerate(header)}
+    found: dict[str, int] = {}
+    for field_name, candidates in columns.items():
+        for candidate in candidates:
+            if candidate in positions:
+                found[field_name] = positions[candidate]
+                break
+    return found
+
+
+def _column(rows: list[list[str]], index: Optional[int]) -> list[str]:
+    if index is None:
+        return [""] * len(rows)
+    return [row[index] if index < len(row) else "" for row in rows]
+
+
+def _rejoin_year(rows: list[list[str]], width: int) -> list[list[str]]:
+    """Garmin writes "Dec 25-31, 2024" unquoted, so the year lands in its own field."""
+    fixed = []
+    for row in rows:
+        if len(row) == width + 1 and row[1].strip().isdigit() and len(row[1].strip()) == 4:
+            row = [f"{row[0]},{row[1]}", *row[2:]]
+        fixed.append(row)
+    return fixed
+
+
+def detect_report(header: list[str]) -> Optional[str]:
+    names = {name.strip() for name in header}
+    if "Activity Type" in names and "Date" in names:
+        return "activities"
+    if "Date" in names and names & {"Avg Score", "Score"} and names & {"Avg Duration", "Duration"}:
+        return "sleep"
+    return None
+
+
+@dataclass
+class GarminSleepRow:
+    first_night: date
+    last_night: date
+    sleep_score: Optional[int]
+    duration_minutes: int
+    bedtime: Optional[str]
+    wake_time: Optional[str]
+
+
+def parse_sleep_rows(
+    header: list[str],
+    rows: list[list[str]],
+    reference_year: int,
+) -> list[GarminSleepRow]:
+    """Parse a weekly or daily Garmin sleep report; rows without data ("--") are dropped."""
+    index = _column_index(header, SLEEP_COLUMNS)
+    labels = list(map(parse_date_label, _column(rows, index.get("date"))))
+    nights = resolve_date_labels(labels, reference_year)
+    scores = list(map(parse_number, _column(rows, index.get("score"))))
+    durations = list(map(parse_duration_minutes, _column(rows, index.get("duration"))))
+    bedtimes = list(map(parse_clock, _column(rows, index.get("bedtime"))))
+    wake_times = list(map(parse_clock, _column(rows, index.get("wake_time"))))
+    parsed: list[GarminSleepRow] = []
+    for night, score, duration, bedtime, wake_time in zip(nights, scores, durations, bedtimes, wake_times):
+        if night is None or duration is None:
+            continue
+        parsed.append(
+            GarminSleepRow(
+                first_night=night[0],
+                last_night=night[1],
+                sleep_score=int(score) if score is not None else None,
+                duration_minutes=duration,
+                bedtime=bedtime,
+                wake_time=wake_time,
+            )
+        )
+    return parsed
+
+
+def parse_activity_rows(
+    user_id: str,
+    header: list[str],
+    rows: list[list[str]],
+    result: ImportResult,
+) -> list[Activity]:
+    index = _column_index(header, ACTIVITY_COLUMNS)
+    types = _column(rows, index.get("type"))
+    starts = _column(rows, index.get("date"))
+    titles = _column(rows, index.get("title"))
+    distances = list(map(parse_number, _column(rows, index.get("distance"))))
+    calories = list(map(parse_number, _column(rows, index.get("calories"))))
+    times = list(map(parse_elapsed_seconds, _column(rows, index.get("time"))))
+    elapsed = list(map(parse_elapsed_seconds, _column(rows, index.get("elapsed"))))
+    avg_hr = list(map(parse_number, _column(rows, index.get("avg_hr"))))
+    max_hr = list(map(parse_number, _column(rows, index.get("max_hr"))))
+    tss = list(map(parse_number, _column(rows, index.get("tss"))))
+    steps = list(map(parse_number, _column(rows, index.get("steps"))))
+
+    activities: list[Activity] = []
+    for i, activity_type in enumerate(types):
+        try:
+            start = datetime.fromisoformat(starts[i].strip())
+        except ValueError:
+            result.add_error(f"Row error: invalid activity date {starts[i]!r}")
+            continue
+        distance = distances[i]
+        if distance is not None and "swim" in activity_type.lower():
+            distance /= 1000  # pool distances are reported in metres
+        activities.append(
+            Activity(
+                user_id=user_id,
+                activity_type=activity_type.strip(),
+                start=start,
+                title=titles[i].strip(),
+                distance_km=distance,
+                calories=_as_int(calories[i]),
+                duration_seconds=times[i],
+                elapsed_seconds=elapsed[i],
+                avg_hr=_as_int(avg_hr[i]),
+                max_hr=_as_int(max_hr[i]),
+                training_stress_score=tss[i],
+                steps=_as_int(steps[i]),
+            )
+        )
+    return activities
+
+
+def _as_int(value: Optional[float]) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+def _batched(rows: Iterable[list[str]], size: int) -> Iterator[list[list[str]]]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# Importer ---------------------------------------------------------------
+class GarminExportImporter:
+    """Loads Garmin Connect exports (CSV reports or a full account ZIP) into the store.
+
+    ZIP members are streamed straight out of the archive; nothing is
+    extracted to disk.
+    """
+
+    def __init__(self, sleep_service: SleepService | None = None) -> None:
+        self.store = store
+        self.sleep = sleep_service or SleepService()
+
+    def import_stream(
+        self,
+        user: User,
+        stream: BinaryIO,
+        *,
+        result: ImportResult | None = None,
+        should_stop: Callable[[], bool] | None = None,
+        reference_year: int | None = None,
+    ) -> dict:
+        """Import a seekable ZIP or CSV stream; same contract as ``CsvImportService.import_stream``."""
+        result = result if result is not None else ImportResult()
+        reference_year = reference_year or date.today().year
+        if zipfile.is_zipfile(stream):
+            stream.seek(0)
+            with zipfile.ZipFile(stream) as archive:
+                for info in archive.infolist():
+                    self._check_stop(should_stop, result)
+                    name = info.filename.lower()
+                    if name.endswith(".csv"):
+                        with archive.open(info) as member:
+                            # Reports carry no export date; the member's timestamp is the best hint
+                            self._import_csv(user, member, result, should_stop, info.date_time[0])
+                    elif name.endswith(".json") and "sleepdata" in name:
+                        with archive.open(info) as member:
+                            self._import_sleep_json(user, json.load(member), result)
+        else:
+            stream.seek(0)
+            self._import_csv(user, stream, result, should_stop, reference_year)
+
+        return {
+            "success": True,
+            "sleep_imported": result.sleep_imported,
+            "activities_imported": result.activities_imported,
+            "error_count": result.error_count,
+            "errors": result.errors,
+            "summary": self.sleep.get_summary(user),
+        }
+
+    # ------------------------------------------------------------------
+    def _import_csv(
+        self,
+        user: User,
+        stream: BinaryIO,
+        result: ImportResult,
+        should_stop: Callable[[], bool] | None,
+        reference_year: int,
+    ) -> None:
+        reader = csv.reader(iter_text_lines(stream))
+        header = next(reader, None)
+        if not header:
+            return
+        report = detect_report(header)
+        if report == "sleep":
+            # Sleep reports are a row per night or week; year inference needs the whole file
+            rows = _rejoin_year(list(reader), len(header))
+            result.rows_processed += len(rows)
+            self._store_sleep_rows(user, parse_sleep_rows(header, rows, reference_year), result)
+        elif report == "activities":
+            for batch in _batched(reader, BATCH_SIZE):
+                result.rows_processed += len(batch)
+                activities = parse_activity_rows(user.id, header, batch, result)
+                self.store.upsert_activities(user.id, activities)
+                result.activities_imported += len(activities)
+                self._check_stop(should_stop, result)
+        else:
+            result.add_error(f"Unrecognised Garmin report with columns: {', '.join(header[:4])}")
+
+    def _store_sleep_rows(self, user: User, rows: list[GarminSleepRow], result: ImportResult) -> None:
+        """Daily rows become sessions; weekly averages are skipped, not spread over invented nights."""
+        sessions = [
+            SleepSession(
+                user_id=user.id,
+                date=row.first_night,
+                duration_minutes=row.duration_minutes,
+                sleep_score=row.sleep_score,
+                bedtime=row.bedtime or "22:30",
+                wake_time=row.wake_time or "06:30",
+                stage_minutes={},
+            )
+            for row in rows
+            if row.first_night == row.last_night
+        ]
+        if len(sessions) < len(rows):
+            result.add_error(
+                f"Skipped {len(rows) - len(sessions)} weekly sleep averages; export the daily sleep report instead"
+            )
+        self.store.upsert_sleep_sessions(user.id, sessions)
+        result.sleep_imported += len(sessions)
+
+    def _import_sleep_json(self, user: User, payload: Any, result: ImportResult) -> None:
+        """Nightly records from DI-Connect-Wellness ``*_sleepData.json`` files."""
+        items = payload if isinstance(payload, list) else [payload]
+        tz = ZoneInfo(user.timezone)
+        sessions: list[SleepSession] = []
+        for item in items:
+            result.rows_processed += 1
+            try:
+                start = _parse_gmt(item["sleepStartTimestampGMT"]).astimezone(tz)
+                end = _parse_gmt(item["sleepEndTimestampGMT"]).astimezone(tz)
+                stages = {
+                    stage: int((item.get(f"{stage}SleepSeconds") or 0) / 60)
+                    for stage in ("deep", "light", "rem", "awake")
+                }
+                sessions.append(
+                    SleepSession(
+                        user_id=user.id,
+                        date=date.fromisoformat(item["calendarDate"]),
+                        duration_minutes=stages["deep"] + stages["light"] + stages["rem"],
+                        sleep_score=(item.get("sleepScores") or {}).get("overallScore"),
+                        bedtime=start.strftime("%H:%M"),
+                        wake_time=end.strftime("%H:%M"),
+                        stage_minutes=stages,
+                    )
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                result.add_error(f"Row error: {str(e)}")
+        self.store.upsert_sleep_sessions(user.id, sessions)
+        result.sleep_imported += len(sessions)
+
+    @staticmethod
+    def _check_stop(should_stop: Callable[[], bool] | None, result: ImportResult) -> None:
+        if should_stop and should_stop():
+            raise ImportCancelled(f"Stopped after {result.rows_processed} rows")
+
+
+def _parse_gmt(value: Any) -> datetime:
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, tz=UTC)
+    return datetime.fromisoformat(str(value)).replace(tzinfo=UTC)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+
+from app.services.garmin_api import is_rate_limited, request_budget
+from app.services.metrics import registry
+from app.services.storage import store
+
+if TYPE_CHECKING:
+    from app.services.garmin import GarminConnectService
+
+ENABLED = os.getenv("GARMIN_BACKGROUND_SYNC", "0") == "1"
+SYNC_INTERVAL = float(os.getenv("GARMIN_SYNC_INTERVAL", str(6 * 3600)))
+# People who opened the app recently are kept fresher
+ACTIVE_SYNC_INTERVAL = float(os.getenv("GARMIN_ACTIVE_SYNC_INTERVAL", str(15 * 60)))
+ACTIVE_WINDOW = timedelta(hours=24)
+SCHEDULER_WORKERS = int(os.getenv("GARMIN_SCHEDULER_WORKERS", "2"))
+# Each user's interval is stretched or shrunk by up to this fraction, so syncs don't line up
+JITTER = 0.1
+TICK_SECONDS = 5.0
+BACKOFF_BASE = 60.0
+BACKOFF_MAX = 3600.0
+
+logger = logging.getLogger(__name__)
+
+
+class GarminSyncScheduler:
+    """Periodically runs the incremental sync for every connected Garmin account.
+
+    Every tick, accounts whose next sync is due are ordered recently active
+    users first, then by how overdue they are, and handed to a small worker
+    pool. Day fetches wait on the shared ``request_budget`` token bucket. A
+    429 from Garmin pauses the whole scheduler with exponential backoff;
+    other failures only delay that one user.
+    """
+
+    def __init__(
+        self,
+        workers: int = SCHEDULER_WORKERS,
+        interval: float = SYNC_INTERVAL,
+        active_interval: float = ACTIVE_SYNC_INTERVAL,
+        clock: Callable[[], float] = time.time,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.store = store
+        self.workers = workers
+        self.interval = interval
+        self.active_interval = active_interval
+        self.clock = clock
+        self.rng = rng or random.Random()
+
+        self.jitter: Dict[str, float] = {}
+        self.retry_at: Dict[str, float] = {}
+        self.failures: Dict[str, int] = {}
+        self.running: Set[str] = set()
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.lock = threading.Lock()
+
+        self.queue_depth = 0
+        self.lag_seconds = 0.0
+        self.syncs_completed = 0
+        self.syncs_failed = 0
+        self.rate_limited = 0
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @cached_property
+    def service(self) -> GarminConnectService:
+        """Built on first use, so an idle scheduler doesn't load the Garmin stack."""
+        from app.services.garmin import GarminConnectService
+
+        service = GarminConnectService(throttle=True)
+        # Never replace a real user's data with the demo dataset
+        service.allow_sample = False
+        return service
+
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        _ = self.service  # built here, before the workers race to build it
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="garmin-sync")
+        self._thread = threading.Thread(target=self._loop, name="garmin-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def tick(self, now: Optional[float] = None) -> List[str]:
+        """Start syncs for due users; without a running pool they run inline."""
+        now = self.clock() if now is None else now
+        due = self.due_users(now)
+        with self.lock:
+            self.queue_depth = len(due)
+            self.lag_seconds = max((now - due_at for due_at, _ in due), default=0.0)
+            if now < self.paused_until:
+                return []
+            slots = self.workers - len(self.running) if self._executor else len(due)
+            started = [user_id for _, user_id in due[:max(slots, 0)]]
+            self.running.update(started)
+        for user_id in started:
+            if self._executor:
+                self._executor.submit(self._sync, user_id)
+            else:
+                self._sync(user_id)
+        return started
+
+    def due_users(self, now: float) -> List[tuple[float, str]]:
+        """``(due_at, user_id)`` for accounts due a sync, in the order they should run."""
+        seen_after = datetime.utcnow() - ACTIVE_WINDOW
+        ranked = []
+        for account in self.store.list_garmin_accounts():
+            user = self.store.get_user(account.user_id)
+            if user is None or account.user_id in self.running:
+                continue
+            active = user.last_seen_at is not None and user.last_seen_at >= seen_after
+            interval = self.active_interval if active else self.interval
+            jitter = self.jitter.get(account.user_id)
+            if jitter is None:
+                jitter = self.jitter[account.user_id] = self.rng.uniform(-JITTER, JITTER)
+            last = account.last_synced_at.timestamp() if account.last_synced_at else 0.0
+            due_at = max(last + interval * (1 + jitter), self.retry_at.get(account.user_id, 0.0))
+            if due_at <= now:
+                ranked.append((not active, due_at, account.user_id))
+        ranked.sort()
+        return [(due_at, user_id) for _, due_at, user_id in ranked]
+
+    def metrics(self) -> dict:
+        now = self.clock()
+        return {
+            "accounts": len(self.store.list_garmin_accounts()),
+            "queue_depth": self.queue_depth,
+            "running": len(self.running),
+            "lag_seconds": round(self.lag_seconds, 1),
+            "syncs_completed": self.syncs_completed,
+            "syncs_failed": self.syncs_failed,
+            "rate_limited": self.rate_limited,
+            "paused_for_seconds": round(max(self.paused_until - now, 0.0), 1),
+            "request_tokens": round(request_budget.available(), 1),
+        }
+
+    # ------------------------------------------------------------------
+    def _loop(self) -> None:
+        while not self._stop.wait(TICK_SECONDS):
+            try:
+                self.tick()
+            except Exception:  # keep the loop alive
+                logger.exception("Garmin scheduler tick failed")
+
+    def _sync(self, user_id: str) -> None:
+        try:
+            user = self.store.get_user(user_id)
+            if user is not None:
+                self.service.sync_recent_sleep(user=user)
+        except Exception as exc:
+            with self.lock:
+                if is_rate_limited(exc):
+                    self.rate_limited += 1
+                    self.backoff = min(max(self.backoff * 2, BACKOFF_BASE), BACKOFF_MAX)
+                    self.paused_until = self.clock() + self.backoff * (1 + self.rng.uniform(0, JITTER))
+                else:
+                    self.syncs_failed += 1
+                    failures = self.failures[user_id] = self.failures.get(user_id, 0) + 1
+                    self.retry_at[user_id] = self.clock() + min(BACKOFF_BASE * 2 ** (failures - 1), BACKOFF_MAX)
+            logger.warning("Garmin sync for %s failed: %s", user_id, exc)
+        else:
+            with self.lock:
+                self.syncs_completed += 1
+                self.backoff = 0.0
+                self.failures.pop(user_id, None)
+                self.retry_at.pop(user_id, None)
+        finally:
+            with self.lock:
+                self.running.discard(user_id)
+
+
+garmin_scheduler = GarminSyncScheduler()
+registry.gauge(
+    "sleephabits_garmin_scheduler", "Background sync state, as reported by GarminSyncScheduler.metrics().", ("stat",),
+    read=lambda: {(stat,): value for stat, value in garmin_scheduler.metrics().items()},
+)
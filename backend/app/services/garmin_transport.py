@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from garminconnect import Garmin
+from garth import Client as GarthClient
+from garth.auth_tokens import OAuth1Token, OAuth2Token
+from requests.adapters import HTTPAdapter
+
+API_PREFIX = "https://connectapi.garmin.com"
+# Recorded fixtures never contain the real account name
+FIXTURE_USERNAME = "fixture-user"
+SCRUB_KEYS = {"fullName", "emailAddress", "location", "profileImageUrlLarge", "profileImageUrlMedium", "profileImageUrlSmall"}
+
+
+class GarminTransport:
+    """Creates the ``Garmin`` objects the service logs in with; this one talks to Garmin."""
+
+    def garmin(self, **kwargs: Any) -> Garmin:
+        return Garmin(**kwargs)
+
+
+class RecordingTransport(GarminTransport):
+    """Writes every Garmin API response that passes through ``inner`` to ``fixture_dir``.
+
+    Only connectapi traffic is recorded; the SSO login is not. The account's
+    username is replaced with ``FIXTURE_USERNAME`` and obvious personal
+    profile fields are blanked, but the sleep data itself is real, so treat
+    the fixtures as personal data.
+    """
+
+    def __init__(self, fixture_dir: Path, inner: Optional[GarminTransport] = None) -> None:
+        self.fixture_dir = Path(fixture_dir)
+        self.inner = inner or GarminTransport()
+
+    def garmin(self, **kwargs: Any) -> Garmin:
+        garmin = self.inner.garmin(**kwargs)
+        sess = garmin.garth.sess
+        upstream = sess.adapters.get(API_PREFIX) or HTTPAdapter()
+        # A more specific prefix than garth's own "https://" mount, so configure() keeps it
+        sess.mount(API_PREFIX, RecordingAdapter(self.fixture_dir, upstream))
+        return garmin
+
+
+class ReplayTransport(GarminTransport):
+    """Sends all Garmin API traffic to ``base_url`` and skips the SSO login.
+
+    Credential logins are answered with dummy tokens, so any email and
+    password "connect". Use it with ``benchmarks.fake_garmin`` servers.
+    """
+
+    def __init__(self, base_url: str, pool_maxsize: int = 16) -> None:
+        self.base_url = base_url
+        self.pool_maxsize = pool_maxsize
+
+    def garmin(self, **kwargs: Any) -> Garmin:
+        garmin = _OfflineGarmin(**kwargs)
+        self._attach(garmin.garth)
+        return garmin
+
+    def client(self, retries: int = 0, pool_maxsize: Optional[int] = None) -> GarthClient:
+        """A garth client with dummy tokens, talking to ``base_url``."""
+        pool_maxsize = pool_maxsize or self.pool_maxsize
+        client = GarthClient()
+        oauth1, oauth2 = dummy_tokens()
+        client.configure(retries=retries, pool_maxsize=pool_maxsize, oauth1_token=oauth1, oauth2_token=oauth2)
+        self._attach(client, pool_maxsize)
+        return client
+
+    def _attach(self, client: GarthClient, pool_maxsize: Optional[int] = None) -> None:
+        client.sess.mount(API_PREFIX, RedirectAdapter(self.base_url, pool_maxsize=pool_maxsize or self.pool_maxsize))
+
+
+class _OfflineGarmin(Garmin):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        # No SSO: a credential login just hands out dummy tokens
+        self.garth.login = self._dummy_login
+
+    def _dummy_login(self, *args: Any, **kwargs: Any) -> tuple[OAuth1Token, OAuth2Token]:
+        oauth1, oauth2 = dummy_tokens()
+        self.garth.configure(oauth1_token=oauth1, oauth2_token=oauth2)
+        return oauth1, oauth2
+
+
+def dummy_tokens(lifetime: int = 24 * 3600) -> tuple[OAuth1Token, OAuth2Token]:
+    now = int(time.time())
+    return (
+        OAuth1Token(oauth_token="token", oauth_token_secret="secret"),
+        OAuth2Token(
+            scope="", jti="", token_type="Bearer", access_token="access", refresh_token="refresh",
+            expires_in=lifetime, expires_at=now + lifetime,
+            refresh_token_expires_in=30 * lifetime, refresh_token_expires_at=now + 30 * lifetime,
+        ),
+    )
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Sends requests to ``base_url``, keeping their path and query."""
+
+    def __init__(self, base_url: str, pool_maxsize: int = 10) -> None:
+        super().__init__(pool_maxsize=pool_maxsize)
+        self.base_url = base_url.rstrip("/")
+
+    def send(self, request, *args, **kwargs):
+        url = urlsplit(request.url)
+        request.url = f"{self.base_url}{url.path}?{url.query}" if url.query else f"{self.base_url}{url.path}"
+        return super().send(request, *args, **kwargs)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Passes requests to ``inner`` and saves each response as a fixture file."""
+
+    def __init__(self, fixture_dir: Path, inner: HTTPAdapter) -> None:
+        super().__init__()
+        self.fixture_dir = fixture_dir
+        self.inner = inner
+        self.username: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def send(self, request, *args, **kwargs):
+        url = urlsplit(request.url)
+        response = self.inner.send(request, *args, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            return response
+        if url.path == "/userprofile-service/socialProfile" and isinstance(body, dict):
+            with self.lock:
+                self.username = body.get("userName") or self.username
+        self.save(request.method, url.path, url.query, response.status_code, body)
+        return response
+
+    def save(self, method: str, path: str, query: str, status: int, body: Any) -> Path:
+        text = json.dumps(
+            {"method": method, "path": path, "query": query, "status": status, "body": scrub(body)},
+            indent=1,
+        )
+        if self.username:
+            text = text.replace(self.username, FIXTURE_USERNAME)
+        fixture = json.loads(text)
+        path = self.fixture_dir / fixture_name(fixture["method"], fixture["path"], fixture["query"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def close(self) -> None:
+        self.inner.close()
+        super().close()
+
+
+def fixture_name(method: str, path: str, query: str) -> str:
+    digest = hashlib.sha1(f"{method} {path}?{query}".encode()).hexdigest()[:16]
+    return f"{path.strip('/').replace('/', '.') or 'root'}-{digest}.json"
+
+
+def scrub(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: ("" if key in SCRUB_KEYS else scrub(item)) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    return value
+
+
+def transport_from_env() -> GarminTransport:
+    """``GARMIN_TRANSPORT``: unset/``live``, ``record:<fixture dir>`` or ``replay:<server url>``."""
+    setting = os.getenv("GARMIN_TRANSPORT", "live")
+    kind, _, target = setting.partition(":")
+    if kind == "record":
+        return RecordingTransport(Path(target))
+    if kind == "replay":
+        return ReplayTransport(target)
+    return GarminTransport()
+
+
+garmin_transport = transport_from_env()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, Optional, Set
+
+COMPLIANCE_WINDOWS = (7, 30, 90)
+
+
+class ComplianceRing:
+    """Fixed-size ring of per-day flags with running counts per window.
+
+    Each slot holds whether the habit was done on one day. The counts for the
+    7/30/90-day windows are adjusted as days are set or as the head of the
+    ring moves forward, so reading a rate never walks the buffer.
+    """
+
+    def __init__(self, size: int = max(COMPLIANCE_WINDOWS)) -> None:
+        self.size = size
+        self.slots = [False] * size
+        self.head: Optional[int] = None  # ordinal of the newest day covered
+        self.counts: Dict[int, int] = {window: 0 for window in COMPLIANCE_WINDOWS}
+
+    def advance(self, day: int) -> None:
+        if self.head is None:
+            self.head = day
+            return
+        if day <= self.head:
+            return
+        if day - self.head >= self.size:
+            self.slots = [False] * self.size
+            self.counts = {window: 0 for window in COMPLIANCE_WINDOWS}
+            self.head = day
+            return
+        while self.head < day:
+            self.head += 1
+            for window in COMPLIANCE_WINDOWS:
+                if self.slots[(self.head - window) % self.size]:
+                    self.counts[window] -= 1
+            self.slots[self.head % self.size] = False
+
+    def set(self, day: int, done: bool) -> None:
+        self.advance(day)
+        assert self.head is not None
+        age = self.head - day
+        if age >= self.size:
+            return  # older than the widest window
+        slot = day % self.size
+        if self.slots[slot] == done:
+            return
+        self.slots[slot] = done
+        delta = 1 if done else -1
+        for window in COMPLIANCE_WINDOWS:
+            if age < window:
+                self.counts[window] += delta
+
+    def rates(self, as_of: int) -> Dict[int, float]:
+        """Rates for the windows ending on ``as_of`` (not before ``head``); reading leaves the ring as it is."""
+        if self.head is None:
+            return {window: 0.0 for window in COMPLIANCE_WINDOWS}
+        shift = as_of - self.head
+        assert shift >= 0, "as_of is before the ring's head"
+        rates = {}
+        for window in COMPLIANCE_WINDOWS:
+            count = self.counts[window]
+            # Days that drop out of the window once it ends ``shift`` days later
+            for age in range(max(window - shift, 0), window):
+                if self.slots[(self.head - age) % self.size]:
+                    count -= 1
+            rates[window] = count / window
+        return rates
+
+
+class HabitStreakTracker:
+    """Streak and compliance counters for one user's habit.
+
+    Done days are kept as runs of consecutive dates (start -> end and
+    end -> start), with a multiset of run lengths for the longest streak.
+    Adding a day merges at most two neighbouring runs; removing one splits
+    only the run it belonged to, so back-dated check-ins repair the affected
+    segment without rescanning the history.
+    """
+
+    def __init__(self) -> None:
+        self.done: Set[date] = set()
+        self.run_end: Dict[date, date] = {}
+        self.run_start: Dict[date, date] = {}
+        self.run_lengths: Counter[int] = Counter()
+        self.longest = 0
+        self.last_done: Optional[date] = None
+        self.ring = ComplianceRing()
+
+    # ------------------------------------------------------------------
+    def record(self, day: date, done: bool) -> None:
+        if done:
+            self._add(day)
+        else:
+            self._remove(day)
+        self.ring.set(day.toordinal(), done)
+
+    def current_streak(self, as_of: date) -> int:
+        """Length of the run ending today, or yesterday if today isn't logged yet."""
+        for anchor in (as_of, as_of - timedelta(days=1)):
+            if anchor not in self.done:
+                continue
+            start = self.run_start.get(anchor)
+            if start is None:  # run continues past the anchor (future check-ins)
+                start = self._find_start(anchor)
+            return (anchor - start).days + 1
+        return 0
+
+    def compliance(self, as_of: date) -> Dict[int, float]:
+        if self.ring.head is None or as_of.toordinal() >= self.ring.head:
+            return self.ring.rates(as_of.toordinal())
+        # Before the newest logged day the ring has moved on; count the done days
+        return {
+            window: sum(as_of - timedelta(days=offset) in self.done for offset in range(window)) / window
+            for window in COMPLIANCE_WINDOWS
+        }
+
+    # ------------------------------------------------------------------
+    def _add(self, day: date) -> None:
+        if day in self.done:
+            return
+        self.done.add(day)
+        start = end = day
+        left_start = self.run_start.pop(day - timedelta(days=1), None)
+        if left_start is not None:
+            del self.run_end[left_start]
+            self._drop_length((day - left_start).days)
+            start = left_start
+        right_end = self.run_end.pop(day + timedelta(days=1), None)
+        if right_end is not None:
+            del self.run_start[right_end]
+            self._drop_length((right_end - day).days)
+            end = right_end
+        self._add_run(start, end)
+        if self.last_done is None or day > self.last_done:
+            self.last_done = day
+
+    def _remove(self, day: date) -> None:
+        if day not in self.done:
+            return
+        start = self._find_start(day)
+        end = self.run_end.pop(start)
+        del self.run_start[end]
+        self._drop_length((end - start).days + 1)
+        self.done.discard(day)
+        if start < day:
+            self._add_run(start, day - timedelta(days=1))
+        if day < end:
+            self._add_run(day + timedelta(days=1), end)
+        if day == self.last_done:
+            self.last_done = max(self.run_start) if self.run_start else None
+
+    def _find_start(self, day: date) -> date:
+        while day - timedelta(days=1) in self.done:
+            day -= timedelta(days=1)
+        return day
+
+    def _add_run(self, start: date, end: date) -> None:
+        self.run_end[start] = end
+        self.run_start[end] = start
+        length = (end - start).days + 1
+        self.run_lengths[length] += 1
+        self.longest = max(self.longest, length)
+
+    def _drop_length(self, length: int) -> None:
+        self.run_lengths[length] -= 1
+        if self.run_lengths[length] <= 0:
+            del self.run_lengths[length]
+            if length == self.longest:
+                self.longest = max(self.run_lengths, default=0)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import Union
+from typing import Iterable, Union
 
 from app.services.storage import Habit, HabitCheckin, User, store
 
@@ -128,7 +128,8 @@ class HabitService:
                 value=value,
                 timestamp=datetime.utcnow(),
             )
-            self.store.record_checkin(checkin)
+        # Always go through the store so streak counters see value changes
+        self.store.record_checkin(checkin)
         for habit in self.store.list_habits(user.id):
             if habit.id == habit_id:
                 break
@@ -153,6 +154,62 @@ class HabitService:
             "last_check_in": checkin.timestamp.isoformat(),
         }
 
+    def bulk_check_in(
+        self,
+        user: User,
+        entries: Iterable[tuple[str, date, Union[bool, int]]],
+    ) -> int:
+        """Record many ``(habit_id, local_date, value)`` check-ins in one store write."""
+        self.ensure_defaults(user)
+        habits = self.store.list_habits(user.id)
+        known = {habit.id for habit in habits}
+        now = datetime.utcnow()
+        checkins: list[HabitCheckin] = []
+        for habit_id, local_date, value in entries:
+            if habit_id not in known:
+                known.add(habit_id)
+                habits.append(Habit(id=habit_id, name=habit_id, type="healthy"))
+            checkins.append(
+                HabitCheckin(
+                    user_id=user.id,
+                    habit_id=habit_id,
+                    local_date=local_date,
+                    value=value,
+                    timestamp=now,
+                )
+            )
+        if len(known) != len(self.store.list_habits(user.id)):
+            self.store.set_habits(user.id, habits)
+        self.store.record_checkins(checkins)
+        return len(checkins)
 
-def get_habit_service() -> HabitService:
-    return HabitService()
+    def get_stats(self, user: User, as_of: date | None = None) -> list[dict]:
+        """Streaks and compliance rates per habit from the maintained counters."""
+        self.ensure_defaults(user)
+        as_of = as_of or date.today()
+        results: list[dict] = []
+        for habit in self.store.list_habits(user.id):
+            tracker = self.store.get_habit_stats(user.id, habit.id)
+            if tracker:
+                rates = tracker.compliance(as_of)
+                current = tracker.current_streak(as_of)
+                longest = tracker.longest
+                last_done = tracker.last_done
+            else:
+                rates = {7: 0.0, 30: 0.0, 90: 0.0}
+                current = longest = 0
+                last_done = None
+            results.append(
+                {
+                    "habit_id": habit.id,
+                    "name": habit.name,
+                    "type": habit.type,
+                    "current_streak": current,
+                    "longest_streak": longest,
+                    "compliance_7d": round(rates[7], 3),
+                    "compliance_30d": round(rates[30], 3),
+                    "compliance_90d": round(rates[90], 3),
+                    "last_completed": last_done.isoformat() if last_done else None,
+                }
+            )
+        return results
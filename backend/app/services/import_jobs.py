@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional
+
+from app.services.events import event_bus
+from app.services.garmin_export import GarminExportImporter
+from app.services.imports import CHUNK_SIZE, CsvImportService, ImportCancelled, ImportResult
+from app.services.metrics import registry
+from app.services.storage import User
+
+IMPORTERS = {
+    "csv": CsvImportService,
+    "garmin": GarminExportImporter,
+}
+# How a failed job names the file it couldn't read
+IMPORTER_LABELS = {
+    "csv": "CSV",
+    "garmin": "Garmin export",
+}
+ACTIVE_STATUSES = ("queued", "running")
+# Progress is pushed to connected devices at most this often per job
+PROGRESS_INTERVAL = 0.5
+# Finished jobs are kept around this long so clients can still poll them
+JOB_RETENTION = timedelta(hours=1)
+
+import_rows = registry.counter("sleephabits_import_rows_total", "Rows parsed by import jobs, as they go.", ("importer",))
+import_jobs_finished = registry.counter("sleephabits_import_jobs_total", "Import jobs by final status.", ("importer", "status"))
+import_durations = registry.histogram(
+    "sleephabits_import_duration_seconds", "Time from an import job starting to finishing.", ("importer",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+
+@dataclass
+class ImportJob:
+    id: str
+    user_id: str
+    content_hash: str
+    path: Path
+    importer: str = "csv"  # key into IMPORTERS
+    status: str = "queued"  # queued | running | completed | failed | cancelled
+    progress: ImportResult = field(default_factory=ImportResult)
+    result: Optional[Dict[str, Any]] = None
+    detail: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(tz=UTC))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+    _started: Optional[float] = field(default=None, repr=False)
+    _elapsed: Optional[float] = field(default=None, repr=False)
+
+    def snapshot(self) -> dict:
+        elapsed = self._elapsed
+        if elapsed is None and self._started is not None:
+            elapsed = time.perf_counter() - self._started
+        progress = self.progress
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "rows_processed": progress.rows_processed,
+            "sleep_imported": progress.sleep_imported,
+            "habits_imported": progress.habits_imported,
+            "activities_imported": progress.activities_imported,
+            "error_count": progress.error_count,
+            "errors": list(progress.errors),
+            "rows_per_second": round(progress.rows_processed / elapsed, 1) if elapsed else 0.0,
+            "detail": self.detail,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "summary": self.result.get("summary") if self.result else None,
+        }
+
+
+class ImportJobManager:
+    """Runs CSV imports on a worker pool and tracks their progress.
+
+    Threads rather than processes: the in-memory store lives in this process.
+    The interpreter switches threads often enough that the event loop keeps
+    serving other requests while an import is parsing.
+    """
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        workers = max_workers or int(os.getenv("IMPORT_WORKERS", "2"))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="csv-import")
+        self.jobs: Dict[str, ImportJob] = {}
+        # (user id, importer, content hash) -> job id
+        self.by_hash: Dict[tuple[str, str, str], str] = {}
+        self.lock = threading.Lock()
+        self.events = event_bus
+
+    def submit(self, user: User, upload: BinaryIO, importer: str = "csv") -> ImportJob:
+        """Spool ``upload`` to disk and queue it, or return the job for an identical file."""
+        path, content_hash = self._spool(upload)
+        with self.lock:
+            self._prune()
+            existing_id = self.by_hash.get((user.id, importer, content_hash))
+            existing = self.jobs.get(existing_id) if existing_id else None
+            if existing and existing.status in ACTIVE_STATUSES + ("completed",):
+                path.unlink(missing_ok=True)
+                return existing
+            job = ImportJob(
+                id=uuid.uuid4().hex,
+                user_id=user.id,
+                content_hash=content_hash,
+                path=path,
+                importer=importer,
+            )
+            self.jobs[job.id] = job
+            self.by_hash[(user.id, importer, content_hash)] = job.id
+        job.future = self.executor.submit(self._run, job, user)
+        self._notify(job)
+        return job
+
+    def get(self, user: User, job_id: str) -> Optional[ImportJob]:
+        job = self.jobs.get(job_id)
+        if job is None or job.user_id != user.id:
+            return None
+        return job
+
+    def cancel(self, user: User, job_id: str) -> Optional[ImportJob]:
+        job = self.get(user, job_id)
+        if job is None:
+            return None
+        self._cancel(job)
+        return job
+
+    def shutdown(self) -> None:
+        for job in list(self.jobs.values()):
+            self._cancel(job)
+        self.executor.shutdown(wait=True)
+
+    # ------------------------------------------------------------------
+    def _cancel(self, job: ImportJob) -> None:
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started; the worker won't clean up for us
+            self._finish(job, "cancelled", detail="Cancelled before start")
+            job.path.unlink(missing_ok=True)
+
+    def _run(self, job: ImportJob, user: User) -> None:
+        job.status = "running"
+        job.started_at = datetime.now(tz=UTC)
+        job._started = time.perf_counter()
+        self._notify(job)
+        last_notified = job._started
+        counted = 0
+
+        def should_stop() -> bool:
+            # Polled once per batch; doubles as the progress tick
+            nonlocal last_notified, counted
+            rows = job.progress.rows_processed
+            import_rows.inc(job.importer, amount=rows - counted)
+            counted = rows
+            now = time.perf_counter()
+            if now - last_notified >= PROGRESS_INTERVAL:
+                last_notified = now
+                self._notify(job)
+            return job.cancel_event.is_set()
+
+        try:
+            with job.path.open("rb") as stream:
+                job.result = IMPORTERS[job.importer]().import_stream(
+                    user,
+                    stream,
+                    result=job.progress,
+                    should_stop=should_stop,
+                )
+            self._finish(job, "completed")
+        except ImportCancelled as exc:
+            self._finish(job, "cancelled", detail=str(exc))
+        except Exception as exc:
+            self._finish(job, "failed", detail=f"Failed to parse {IMPORTER_LABELS[job.importer]}: {str(exc)}")
+        finally:
+            import_rows.inc(job.importer, amount=job.progress.rows_processed - counted)
+            job.path.unlink(missing_ok=True)
+
+    def _finish(self, job: ImportJob, status: str, detail: str | None = None) -> None:
+        if job._started is not None:
+            job._elapsed = time.perf_counter() - job._started
+            import_durations.observe(job._elapsed, job.importer)
+        import_jobs_finished.inc(job.importer, status)
+        job.detail = detail
+        job.finished_at = datetime.now(tz=UTC)
+        job.status = status
+        self._notify(job)
+
+    def _notify(self, job: ImportJob) -> None:
+        if self.events.watching(job.user_id):
+            self.events.publish(job.user_id, "import", job.snapshot(), key=("import", job.id))
+
+    def _spool(self, upload: BinaryIO) -> tuple[Path, str]:
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(prefix="sleephabits-import-", suffix=".csv", delete=False) as out:
+            while chunk := upload.read(CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+        return Path(out.name), digest.hexdigest()
+
+    def _prune(self) -> None:
+        cutoff = datetime.now(tz=UTC) - JOB_RETENTION
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at and job.finished_at < cutoff:
+                del self.jobs[job_id]
+                key = (job.user_id, job.importer, job.content_hash)
+                if self.by_hash.get(key) == job_id:
+                    del self.by_hash[key]
+
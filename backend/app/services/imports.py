@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import codecs
+import csv
+from dataclasses import dataclass, field
+from datetime import date
+from typing import BinaryIO, Callable, Iterator, Union
+
+from app.services.habits import HabitService
+from app.services.sleep import SleepService
+from app.services.storage import SleepSession, User
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 5_000
+# Sleep rows are merged into a date-sorted list, so they are flushed less often
+SLEEP_BATCH_SIZE = 100_000
+MAX_REPORTED_ERRORS = 10
+
+
+def iter_text_lines(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Decode a binary stream chunk by chunk and yield lines with their endings.
+
+    Only one chunk plus the trailing partial line is held in memory, so the
+    csv module can consume arbitrarily large uploads.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        pending += decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            break
+        lines = pending.split("\n")
+        # The last piece is an incomplete line; keep it for the next chunk
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def parse_habit_value(raw: str) -> Union[bool, int]:
+    value_str = raw.strip()
+    # Try to parse as integer first, then as boolean
+    try:
+        return int(value_str)
+    except ValueError:
+        return value_str.lower() in ("true", "1", "yes")
+
+
+class ImportCancelled(Exception):
+    """Raised when an import is stopped before reaching the end of the file."""
+
+
+@dataclass
+class ImportResult:
+    rows_processed: int = 0
+    sleep_imported: int = 0
+    habits_imported: int = 0
+    activities_imported: int = 0
+    error_count: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def add_error(self, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+class CsvImportService:
+    """Streams the SleepHabits CSV format into the store in bulk batches."""
+
+    def __init__(
+        self,
+        sleep_service: SleepService | None = None,
+        habit_service: HabitService | None = None,
+    ) -> None:
+        self.habits = habit_service or HabitService()
+        self.sleep = sleep_service or SleepService(habit_service=self.habits)
+        self.store = self.sleep.store
+
+    def import_stream(
+        self,
+        user: User,
+        stream: BinaryIO,
+        *,
+        chunk_size: int = CHUNK_SIZE,
+        batch_size: int = BATCH_SIZE,
+        result: ImportResult | None = None,
+        should_stop: Callable[[], bool] | None = None,
+    ) -> dict:
+        """Import all rows from ``stream``; the summary is computed once at the end.
+
+        ``result`` is updated in place as rows are read, so a caller on another
+        thread can report progress. ``should_stop`` is polled once per batch;
+        rows parsed so far are flushed before ``ImportCancelled`` is raised.
+
+        Raises ``ValueError`` (or ``csv.Error``) if the file is not valid UTF-8 CSV.
+        """
+        result = result if result is not None else ImportResult()
+        sleep_batch: dict[date, SleepSession] = {}
+        habit_batch: list[tuple[str, date, Union[bool, int]]] = []
+
+        reader = csv.DictReader(iter_text_lines(stream, chunk_size))
+        for row in reader:
+            result.rows_processed += 1
+            try:
+                row_type = (row.get("type") or "").strip()
+                if row_type == "sleep":
+                    local_date = date.fromisoformat(row["date"])
+                    sleep_batch[local_date] = SleepSession(
+                        user_id=user.id,
+                        date=local_date,
+                        duration_minutes=int(row["duration_minutes"]),
+                        sleep_score=int(row["sleep_score"]) if row["sleep_score"] else None,
+                        bedtime=row["bedtime"],
+                        wake_time=row["wake_time"],
+                        stage_minutes={},  # No stage data for manual entries
+                    )
+                    result.sleep_imported += 1
+                elif row_type == "habit":
+                    habit_batch.append(
+                        (
+                            row["habit_id"],
+                            date.fromisoformat(row["date"]),
+                            parse_habit_value(row["value"]),
+                        )
+                    )
+                    result.habits_imported += 1
+            except Exception as e:
+                result.add_error(f"Row error: {str(e)}")
+
+            if len(habit_batch) >= batch_size:
+                self._flush_habits(user, habit_batch)
+            if len(sleep_batch) >= SLEEP_BATCH_SIZE:
+                self._flush_sleep(user, sleep_batch)
+            if should_stop and result.rows_processed % batch_size == 0 and should_stop():
+                self._flush_habits(user, habit_batch)
+                self._flush_sleep(user, sleep_batch)
+                raise ImportCancelled(f"Stopped after {result.rows_processed} rows")
+
+        self._flush_habits(user, habit_batch)
+        self._flush_sleep(user, sleep_batch)
+
+        return {
+            "success": True,
+            "sleep_imported": result.sleep_imported,
+            "habits_imported": result.habits_imported,
+            "error_count": result.error_count,
+            "errors": result.errors,
+            "summary": self.sleep.get_summary(user),
+        }
+
+    def _flush_sleep(self, user: User, batch: dict[date, SleepSession]) -> None:
+        if batch:
+            self.store.upsert_sleep_sessions(user.id, list(batch.values()))
+            batch.clear()
+
+    def _flush_habits(
+        self,
+        user: User,
+        batch: list[tuple[str, date, Union[bool, int]]],
+    ) -> None:
+        if batch:
+            self.habits.bulk_check_in(user, batch)
+            batch.clear()
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds: from cached lookups to Garmin pulls that hit the request timeout
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+Reading = Union[float, Dict[Labels, float]]
+
+
+class _Shards:
+    """Per-thread copies of a metric's values, added up when scraped.
+
+    Each thread only writes its own dict, so recording takes no lock and
+    never loses an update; a thread's first record registers its dict
+    (``list.append`` is atomic). Scrapes copy each dict in one step.
+    """
+
+    def __init__(self) -> None:
+        self.local = threading.local()
+        self.all: List[dict] = []
+
+    def mine(self) -> dict:
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = {}
+            self.all.append(shard)
+        return shard
+
+    def snapshot(self) -> List[dict]:
+        return [dict(shard) for shard in list(self.all)]
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        read: Optional[Callable[[], Reading]] = None,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # Sampled at scrape time instead of recorded, for values kept elsewhere
+        self.read = read
+        self.shards = _Shards()
+
+    def values(self) -> Dict[Labels, float]:
+        if self.read is not None:
+            reading = self.read()
+            return reading if isinstance(reading, dict) else {(): reading}
+        totals: Dict[Labels, float] = {}
+        for shard in self.shards.snapshot():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def render(self) -> Iterator[str]:
+        for labels, value in sorted(self.values().items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+    def _add(self, labels: Labels, amount: float) -> None:
+        shard = self.shards.mine()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._add(labels, amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def add(self, amount: float, *labels: str) -> None:
+        self._add(labels, amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self.shards.mine()
+        counts = shard.get(labels)
+        if counts is None:
+            # One count per bucket plus +Inf, then the sum of observations
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self) -> Iterator[str]:
+        merged: Dict[Labels, List[float]] = {}
+        for shard in self.shards.snapshot():
+            for labels, counts in shard.items():
+                counts = list(counts)
+                total = merged.get(labels)
+                merged[labels] = counts if total is None else [a + b for a, b in zip(total, counts)]
+        for labels, counts in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = _labels(self.labels + ("le",), labels + ("+Inf" if bound == math.inf else repr(float(bound)),))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(counts[-1])}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    """The metrics /metrics exports, in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Any:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = (), read: Optional[Callable[[], Reading]] = None) -> Counter:
+        return self.register(Counter(name, help, labels, read))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), read: Optional[Callable[[], Reading]] = None) -> Gauge:
+        return self.register(Gauge(name, help, labels, read))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Labels, values: Labels) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+
+# Caches with ``hits`` and ``misses`` counters, by name ----------------
+caches: Dict[str, Any] = {}
+
+
+def watch_cache(name: str, cache: Any) -> None:
+    caches[name] = cache
+
+
+def _hit_ratios() -> Dict[Labels, float]:
+    ratios = {}
+    for name, cache in list(caches.items()):
+        lookups = cache.hits + cache.misses
+        if lookups:
+            ratios[(name,)] = cache.hits / lookups
+    return ratios
+
+
+registry.counter(
+    "sleephabits_cache_hits_total", "Lookups answered from the cache.", ("cache",),
+    read=lambda: {(name,): cache.hits for name, cache in list(caches.items())},
+)
+registry.counter(
+    "sleephabits_cache_misses_total", "Lookups the cache could not answer.", ("cache",),
+    read=lambda: {(name,): cache.misses for name, cache in list(caches.items())},
+)
+registry.gauge("sleephabits_cache_hit_ratio", "Hits over all lookups since the process started.", ("cache",), read=_hit_ratios)
+
+
+# HTTP ------------------------------------------------------------------
+http_requests = registry.histogram(
+    "sleephabits_http_request_duration_seconds",
+    "Time from receiving a request to sending the end of its response.",
+    ("method", "route", "status"),
+)
+http_in_flight = registry.gauge("sleephabits_http_requests_in_flight", "Requests being handled, including open event streams.")
+
+
+class MetricsMiddleware:
+    """Latency per route template (``/me/sleep/series``, not each user's URL) and requests in flight."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500  # unless a response starts
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.add(1)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.add(-1)
+            # The router records the matched route in the scope on its way in
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_requests.observe(time.perf_counter() - started, scope["method"], path, str(status))
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Protocol, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.metrics import registry
+from app.services.tokens import InvalidToken, access_tokens
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# Unset: counters live in this process. redis://host:port/db shares them between workers.
+BACKEND_URL = os.getenv("RATE_LIMIT_BACKEND")
+MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+@dataclass(frozen=True)
+class Quota:
+    """``limit`` units per ``period`` seconds, of which up to ``burst`` may be spent at once."""
+
+    limit: float
+    period: float
+    burst: float
+
+    @classmethod
+    def parse(cls, spec: str) -> Quota:
+        """``"LIMIT/PERIOD"`` or ``"LIMIT/PERIOD/BURST"``, e.g. ``"900/3600/300"``."""
+        parts = [float(part) for part in spec.split("/")]
+        limit, period = parts[0], parts[1]
+        return cls(limit=limit, period=period, burst=parts[2] if len(parts) > 2 else limit)
+
+    @property
+    def interval(self) -> float:
+        """Seconds one unit takes to replenish."""
+        return self.period / self.limit
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Requests whose method and path match share one quota per client.
+
+    ``costs`` weighs paths (exact match) by how much work they start, in
+    units of the quota; anything else under the rule costs 1.
+    """
+
+    name: str
+    methods: Tuple[str, ...]
+    prefix: str
+    quota: Quota
+    costs: Dict[str, float] = field(default_factory=dict)
+
+    def cost(self, path: str) -> float:
+        return min(self.costs.get(path, 1.0), self.quota.burst)
+
+
+def _quota(name: str, default: str) -> Quota:
+    return Quota.parse(os.getenv(f"RATE_LIMIT_{name.upper()}", default))
+
+
+# First match wins. Garmin costs are roughly the Garmin calls a request fans out into.
+RULES = (
+    Rule("auth", ("POST",), "/auth/", _quota("auth", "120/60/60")),
+    Rule(
+        "garmin",
+        ("POST",),
+        "/garmin/",
+        _quota("garmin", "900/3600/300"),
+        costs={"/garmin/connect": 30, "/garmin/pull": 30, "/garmin/backfill": 90},
+    ),
+    Rule("imports", ("POST",), "/me/import/", _quota("imports", "20/3600/5")),
+    Rule("export", ("GET",), "/me/export", _quota("export", "30/3600/5")),
+    Rule("default", (), "/", _quota("default", "1200/60/300")),
+)
+EXEMPT = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+
+
+class CounterBackend(Protocol):
+    def acquire(self, key: str, cost: float, quota: Quota) -> float:
+        """Spend ``cost`` units of ``key``'s quota; 0 if allowed, else seconds until it would be."""
+
+
+class MemoryBackend:
+    """GCRA counters in this process: one float per key, O(1) per request.
+
+    Each key stores its theoretical arrival time (TAT): when its quota would
+    be fully replenished. A request is allowed while that stays within the
+    burst window of now. Once the key limit is hit the least recently used
+    keys go first; those are almost always already replenished, so dropping
+    them forgets nothing.
+    """
+
+    def __init__(self, max_keys: int = MAX_KEYS, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_keys = max_keys
+        self.clock = clock
+        self.tats: OrderedDict[str, float] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, key: str, cost: float, quota: Quota) -> float:
+        now = self.clock()
+        with self.lock:
+            tat = max(self.tats.get(key, now), now) + quota.interval * cost
+            wait = tat - quota.interval * quota.burst - now
+            if wait > 0:
+                return wait
+            self.tats[key] = tat
+            self.tats.move_to_end(key)
+            if len(self.tats) > self.max_keys:
+                self.tats.popitem(last=False)
+            return 0.0
+
+
+# KEYS[1]: counter; ARGV: interval, burst window, cost. Uses the server's
+# clock so workers on different hosts agree.
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), now) + tonumber(ARGV[1]) * tonumber(ARGV[3])
+local wait = tat - tonumber(ARGV[2]) - now
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+return '0'
+"""
+
+
+class RedisBackend:
+    """GCRA counters in Redis, shared by every worker; keys expire once replenished."""
+
+    def __init__(self, url: str) -> None:
+        import redis  # optional; only needed with RATE_LIMIT_BACKEND=redis://...
+
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(_GCRA_SCRIPT)
+
+    def acquire(self, key: str, cost: float, quota: Quota) -> float:
+        args = [quota.interval, quota.interval * quota.burst, cost]
+        return float(self.script(keys=[f"ratelimit:{key}"], args=args))
+
+
+class RateLimiter:
+    def __init__(self, backend: Optional[CounterBackend] = None, rules: Tuple[Rule, ...] = RULES) -> None:
+        self.backend = backend or (RedisBackend(BACKEND_URL) if BACKEND_URL else MemoryBackend())
+        self.rules = rules
+        self.enabled = ENABLED
+        self.rejected = 0
+
+    def rule_for(self, method: str, path: str) -> Optional[Rule]:
+        if path.startswith(EXEMPT):
+            return None
+        for rule in self.rules:
+            if path.startswith(rule.prefix) and (not rule.methods or method in rule.methods):
+                return rule
+        return None
+
+    def check(self, client: str, method: str, path: str) -> Tuple[Optional[Rule], float]:
+        """The rule that applies and how long ``client`` must wait (0: go ahead)."""
+        rule = self.rule_for(method, path)
+        if rule is None:
+            return None, 0.0
+        wait = self.backend.acquire(f"{client}:{rule.name}", rule.cost(path), rule.quota)
+        if wait > 0:
+            self.rejected += 1
+        return rule, wait
+
+
+rate_limiter = RateLimiter()
+registry.counter("sleephabits_rate_limited_total", "Requests rejected with 429.", read=lambda: rate_limiter.rejected)
+
+
+class RateLimitMiddleware:
+    """Answers 429 with Retry-After once a client exceeds a rule's quota.
+
+    Signed-in clients are counted by user id, so every worker (with a shared
+    backend) and device adds up; anonymous ones by address.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter | None = None) -> None:
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.limiter.enabled or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        rule, wait = self.limiter.check(_client_key(scope), scope["method"], scope["path"])
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+        body = json.dumps({"detail": f"Rate limit exceeded for {rule.name} requests; retry in {math.ceil(wait)} s"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _client_key(scope: Scope) -> str:
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{access_tokens.verify(token)}"
+        except InvalidToken:
+            pass  # the route answers 401; count it against the address
+    client = scope.get("client")
+    return f"addr:{client[0] if client else 'unknown'}"
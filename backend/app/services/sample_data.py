@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import threading
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.services.storage import SleepSession
+
+SAMPLE_FILE = Path(__file__).resolve().parent.parent / "data" / "sample_garmin_sleep.json"
+
+
+class SampleNight(NamedTuple):
+    days_before_latest: int
+    duration_minutes: int
+    sleep_score: Optional[int]
+    bedtime: str
+    wake_time: str
+    stage_minutes: Dict[str, int]  # shared by every user's view; never mutate
+
+
+class SampleDataset:
+    """The bundled demo sleep history, parsed once and shared by all users.
+
+    The file is parsed into a tuple of ``SampleNight`` records keyed by their
+    distance from the newest night, and re-parsed only when its mtime or size
+    changes. ``sessions_for`` lays that template out for one user so that its
+    newest night is ``today``. The per-user sessions share the template's
+    stage dicts instead of copying them. ``laid_out`` remembers the oldest
+    night last laid out per user, so a later load can replace those nights.
+    """
+
+    def __init__(self, path: Path = SAMPLE_FILE) -> None:
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.signature: Optional[Tuple[int, int]] = None
+        self.nights: Tuple[SampleNight, ...] = ()
+        self.loads = 0
+        self.laid_out: Dict[str, date] = {}
+
+    def template(self) -> Tuple[SampleNight, ...]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return ()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self.signature:
+            with self.lock:
+                if signature != self.signature:
+                    self.nights = self._parse()
+                    self.signature = signature
+                    self.loads += 1
+        return self.nights
+
+    def sessions_for(self, user_id: str, today: Optional[date] = None) -> List[SleepSession]:
+        today = today or datetime.now(tz=UTC).astimezone().date()
+        return [
+            SleepSession(
+                user_id=user_id,
+                date=today - timedelta(days=night.days_before_latest),
+                duration_minutes=night.duration_minutes,
+                sleep_score=night.sleep_score,
+                bedtime=night.bedtime,
+                wake_time=night.wake_time,
+                stage_minutes=night.stage_minutes,
+            )
+            for night in self.template()
+        ]
+
+    def _parse(self) -> Tuple[SampleNight, ...]:
+        payload = json.loads(self.path.read_text())
+        items = [
+            (datetime.fromisoformat(item["date"]).date(), item)
+            for item in payload.get("sleep_sessions", [])
+        ]
+        if not items:
+            return ()
+        latest = max(day for day, _ in items)
+        return tuple(
+            SampleNight(
+                days_before_latest=(latest - day).days,
+                duration_minutes=int(item.get("duration_minutes", 0)),
+                sleep_score=item.get("sleep_score"),
+                bedtime=item.get("bedtime", "22:30"),
+                wake_time=item.get("wake_time", "06:30"),
+                stage_minutes={key: int(value) for key, value in item.get("stage_minutes", {}).items()},
+            )
+            for day, item in sorted(items, key=lambda pair: pair[0], reverse=True)
+        )
+
+
+sample_dataset = SampleDataset()
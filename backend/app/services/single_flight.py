@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """At most one call per key at a time; callers arriving meanwhile share its result.
+
+    ``run`` returns a Future: threads wait on ``.result()``, coroutines on
+    ``asyncio.wrap_future`` without tying up a thread. Errors are shared the
+    same way. The key is released as soon as the call finishes, so the next
+    caller starts a fresh one.
+    """
+
+    def __init__(self) -> None:
+        self.calls: Dict[Hashable, Future] = {}
+        self.lock = threading.Lock()
+        self.started = 0
+        self.shared = 0
+
+    def run(self, key: Hashable, func: Callable[[], T], executor: Optional[Executor] = None) -> Future:
+        """Join the call in flight for ``key``, or start ``func`` (on ``executor``, else inline)."""
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            future = self.calls[key] = Future()
+            self.started += 1
+
+        def call() -> None:
+            try:
+                result = func()
+            except BaseException as exc:
+                self._release(key)
+                future.set_exception(exc)
+            else:
+                self._release(key)
+                future.set_result(result)
+
+        if executor is None:
+            call()
+            return future
+        try:
+            executor.submit(call)
+        except RuntimeError as exc:  # executor shut down
+            self._release(key)
+            future.set_exception(exc)
+        return future
+
+    def _release(self, key: Hashable) -> None:
+        with self.lock:
+            self.calls.pop(key, None)
@@ -1,22 +1,36 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import math
 import statistics
 from datetime import date
+from typing import TYPE_CHECKING
 
+from app.services.activity_log import VIRTUAL_HABITS
+from app.services import executors
+from app.services.executors import run_io
 from app.services.habits import HabitService
-from app.services.garmin import GarminConnectService
-from app.services.storage import SleepSession, User, store
+from app.services.garmin_api import LazyGarminService
+from app.services.sleep_series import SERIES, STAGE_CODES, downsample, sleep_series
+from app.services.storage import Habit, SleepSession, User, store
+
+if TYPE_CHECKING:
+    from app.services.garmin import GarminConnectService
+
+logger = logging.getLogger(__name__)
 
 
 class SleepService:
     def __init__(
         self,
         habit_service: HabitService | None = None,
-        garmin_service: GarminConnectService | None = None,
+        garmin_service: GarminConnectService | LazyGarminService | None = None,
     ) -> None:
         self.store = store
         self.habits = habit_service or HabitService()
-        self.garmin = garmin_service or GarminConnectService()
+        self.garmin = garmin_service or LazyGarminService()
+        self.series = sleep_series
 
     async def connect_garmin(
         self,
@@ -27,7 +41,9 @@ class SleepService:
         mfa_code: str | None = None,
         mfa_token: str | None = None,
     ) -> dict:
-        result = self.garmin.connect(
+        # Login and the day fetches block; keep them off the event loop
+        result = await run_io(
+            self.garmin.connect,
             user=user,
             email=email,
             password=password,
@@ -41,11 +57,27 @@ class SleepService:
             result.pop("summary", None)
         return result
 
+    async def disconnect_garmin(self, user: User) -> None:
+        await run_io(self.garmin.disconnect, user=user)
+
     async def pull_latest(self, user: User, days: int = 30) -> dict:
-        self.garmin.sync_recent_sleep(user=user, days=days)
+        # Concurrent pulls (app launch, pull-to-refresh, other devices) share
+        # one sync, and a pull right after a clean sync doesn't start another
+        if not self.garmin.synced_recently(user):
+            await asyncio.wrap_future(self.garmin.start_sync(user=user, days=days, executor=executors.io_pool))
         summary = self.get_summary(user)
         return summary
 
+    async def backfill_garmin(self, user: User, days: int) -> dict:
+        sessions = await run_io(self.garmin.backfill_sleep, user=user, days=days)
+        account = self.store.get_garmin_account(user.id)
+        return {
+            "nights_imported": len(sessions),
+            "backfilled_until": account.backfilled_until if account else None,
+            "complete": account.backfill_complete if account else False,
+            "summary": self.get_summary(user),
+        }
+
     def add_manual_entry(
         self,
         user: User,
@@ -133,14 +165,14 @@ class SleepService:
     def get_analytics(self, user: User) -> dict:
         """Calculate correlations between habits and sleep quality."""
         sessions = self.store.list_sleep_sessions(user.id)
-        print(f"[DEBUG] Analytics for user {user.id}: Found {len(sessions)} sleep sessions")
+        logger.debug("Analytics for user %s: %d sleep sessions", user.id, len(sessions))
         
         if len(sessions) < 7:
             return {"correlations": [], "message": "Need at least 7 nights of data"}
 
         # Get all habit checkins (without date filter to get all history)
         all_checkins = self.store.list_checkins(user.id)
-        print(f"[DEBUG] Found {len(all_checkins)} habit checkins")
+        logger.debug("%d habit checkins", len(all_checkins))
         
         # Group checkins by date and habit
         checkins_by_date = {}
@@ -153,20 +185,38 @@ class SleepService:
         all_habits = self.store.list_habits(user.id)
         habits_by_id = {h.id: h for h in all_habits}
 
+        # Activity features join in as virtual habits, read from per-night
+        # aggregates the activity log maintains on insert
+        activity_log = self.store.get_activity_log(user.id)
+        if activity_log:
+            for virtual in VIRTUAL_HABITS:
+                habits_by_id[virtual.id] = Habit(
+                    id=virtual.id,
+                    name=virtual.name,
+                    type=virtual.type,
+                    description=virtual.description,
+                )
+            for night, aggregate in activity_log.nights.items():
+                if not aggregate.count:
+                    continue
+                date_checkins = checkins_by_date.setdefault(night, {})
+                for virtual in VIRTUAL_HABITS:
+                    date_checkins[virtual.id] = virtual.predicate(aggregate)
+
         # Get unique habit IDs that have been checked in
         habit_ids = set()
         for date_checkins in checkins_by_date.values():
             habit_ids.update(date_checkins.keys())
         
-        print(f"[DEBUG] Unique habit IDs found: {habit_ids}")
-        print(f"[DEBUG] Available habits in system: {list(habits_by_id.keys())}")
+        logger.debug("Habit ids checked in: %s", habit_ids)
+        logger.debug("Habits configured: %s", list(habits_by_id))
 
         # Calculate average sleep score with/without each habit
         correlations = []
         for habit_id in habit_ids:
             habit = habits_by_id.get(habit_id)
             if not habit:
-                print(f"[DEBUG] Skipping unknown habit ID: {habit_id}")
+                logger.debug("Skipping unknown habit id %s", habit_id)
                 continue
 
             scores_with = []
@@ -195,7 +245,7 @@ class SleepService:
                     else:
                         scores_without.append(session.sleep_score)
             
-            print(f"[DEBUG] Habit {habit.name}: {len(scores_with)} with, {len(scores_without)} without")
+            logger.debug("Habit %s: %d nights with, %d without", habit.name, len(scores_with), len(scores_without))
 
             # Need at least 3 data points in each group
             if len(scores_with) >= 3 and len(scores_without) >= 3:
@@ -251,6 +301,38 @@ class SleepService:
             "total_sessions": len(timeline_data),
         }
 
+    def get_series(
+        self,
+        user: User,
+        start: date,
+        end: date,
+        names: list[str] | None = None,
+        resolution: int | None = None,
+        max_points: int = 1000,
+    ) -> dict:
+        """Intraday series for the nights from ``start`` to ``end``, as min/max buckets.
+
+        Without ``resolution`` (seconds per bucket) it is chosen so no series
+        spans more than ``max_points`` buckets. Stages are step data: a bucket
+        holds the stage codes entered within it, so carry the last one forward
+        across gaps when drawing a hypnogram.
+        """
+        names = names or list(SERIES)
+        nights = list(self.series.nights(user.id, start, end))
+        selected = {name: [night[name] for _, night in nights if name in night] for name in names}
+        times = [t for parts in selected.values() for series in parts for t in (series.times[0], series.times[-1])]
+        if resolution is None:
+            span = max(times) - min(times) if times else 0
+            resolution = max(60, math.ceil(span / max_points))
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "nights": [day.isoformat() for day, _ in nights],
+            "resolution_seconds": resolution,
+            "stage_codes": STAGE_CODES,
+            "series": {name: downsample(parts, resolution) for name, parts in selected.items()},
+        }
+
     @staticmethod
     def _clock_to_minutes(value: str) -> int:
         parts = value.split(":")
@@ -264,7 +346,3 @@ class SleepService:
         hour = value // 60
         minute = value % 60
         return f"{hour:02d}:{minute:02d}"
-
-
-def get_sleep_service() -> SleepService:
-    return SleepService()
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Stored per night, in this order. Stage codes follow Garmin's sleepLevels:
+# 0 deep, 1 light, 2 REM, 3 awake.
+SERIES = ("stages", "heart_rate", "hrv", "spo2")
+STAGE_CODES = {0: "deep", 1: "light", 2: "rem", 3: "awake"}
+# Unset: nights are kept in memory only
+SERIES_DIR = os.getenv("SLEEP_SERIES_DIR")
+
+_COUNT = struct.Struct("<I")
+_BASE = struct.Struct("<q")
+_RECORD = struct.Struct("<II")  # date ordinal, blob length
+
+
+class Series(NamedTuple):
+    times: array  # epoch seconds (UTC), typecode "q"
+    values: array  # typecode "h"
+
+
+def series_from_payload(payload: Any) -> Dict[str, Series]:
+    """Pull the intraday series out of a raw dailySleepData response."""
+    if not isinstance(payload, dict):
+        return {}
+    points: Dict[str, List[Tuple[int, float]]] = {
+        "stages": [],
+        "heart_rate": [(_epoch(p.get("startGMT")), p.get("value")) for p in payload.get("sleepHeartRate") or []],
+        "hrv": [(_epoch(p.get("startGMT")), p.get("value")) for p in payload.get("hrvData") or []],
+        "spo2": [
+            (_epoch(p.get("epochTimestamp")), p.get("spo2Reading"))
+            for p in payload.get("wellnessEpochSPO2DataDTOList") or []
+        ],
+    }
+    levels = payload.get("sleepLevels") or []
+    for level in levels:
+        points["stages"].append((_epoch(level.get("startGMT")), level.get("activityLevel")))
+    if levels:
+        # Close the last stage so its length is known
+        points["stages"].append((_epoch(levels[-1].get("endGMT")), levels[-1].get("activityLevel")))
+
+    series = {}
+    for name, items in points.items():
+        items = sorted((t, round(v)) for t, v in items if t is not None and v is not None)
+        if items:
+            series[name] = Series(array("q", (t for t, _ in items)), array("h", (v for _, v in items)))
+    return series
+
+
+def encode_night(series: Dict[str, Series]) -> bytes:
+    """Pack a night's series as delta-encoded int32 times and int16 values.
+
+    Layout: the night's first timestamp (int64), then per series in
+    ``SERIES`` order a point count, the time deltas and the value deltas.
+    Two minutes of heart rate cost 6 bytes instead of ~30 as JSON.
+    """
+    base = min((s.times[0] for s in series.values() if s.times), default=0)
+    parts = [_BASE.pack(base)]
+    for name in SERIES:
+        times, values = series.get(name) or (array("q"), array("h"))
+        parts.append(_COUNT.pack(len(times)))
+        parts.append(_le(array("i", _deltas(times, base))).tobytes())
+        parts.append(_le(array("h", _deltas(values, 0))).tobytes())
+    return b"".join(parts)
+
+
+def decode_night(blob: bytes | memoryview) -> Dict[str, Series]:
+    (base,) = _BASE.unpack_from(blob, 0)
+    offset = _BASE.size
+    series = {}
+    for name in SERIES:
+        (count,) = _COUNT.unpack_from(blob, offset)
+        offset += _COUNT.size
+        time_deltas = _le(array("i", bytes(blob[offset:offset + 4 * count])))
+        offset += 4 * count
+        value_deltas = _le(array("h", bytes(blob[offset:offset + 2 * count])))
+        offset += 2 * count
+        if count:
+            series[name] = Series(array("q", _cumulative(time_deltas, base)), array("h", _cumulative(value_deltas, 0)))
+    return series
+
+
+def downsample(series: Iterable[Series], resolution: int) -> Dict[str, list]:
+    """Min/max per ``resolution``-second bucket across nights; empty buckets are left out.
+
+    Keeping both extremes means spikes and dips survive any zoom level,
+    unlike averaging or picking every n-th point.
+    """
+    buckets: Dict[int, List[int]] = {}
+    for times, values in series:
+        for t, v in zip(times, values):
+            key = t - t % resolution
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [v, v]
+            elif v < bucket[0]:
+                bucket[0] = v
+            elif v > bucket[1]:
+                bucket[1] = v
+    keys = sorted(buckets)
+    return {
+        "t": keys,
+        "min": [buckets[k][0] for k in keys],
+        "max": [buckets[k][1] for k in keys],
+    }
+
+
+class SleepSeriesStore:
+    """Encoded intraday series per user and night.
+
+    With a ``root`` directory, each user's nights are appended to
+    ``<root>/<user_id>.bin`` and read back through a read-only memory map, so
+    only the nights being served are paged in. A rewritten night leaves its
+    old record behind; the file is compacted once dead records outweigh
+    live ones. Without ``root`` the encoded nights stay in memory.
+    """
+
+    def __init__(self, root: Optional[Path] = Path(SERIES_DIR) if SERIES_DIR else None) -> None:
+        self.root = Path(root) if root else None
+        self.blobs: Dict[str, Dict[date, bytes]] = {}
+        self.files: Dict[str, _SeriesFile] = {}
+        self.lock = threading.Lock()
+
+    def put(self, user_id: str, day: date, series: Dict[str, Series]) -> None:
+        if not series:
+            return
+        blob = encode_night(series)
+        with self.lock:
+            if self.root is None:
+                self.blobs.setdefault(user_id, {})[day] = blob
+            else:
+                self._file(user_id).append(day, blob)
+
+    def get(self, user_id: str, day: date) -> Optional[Dict[str, Series]]:
+        with self.lock:
+            blob = self._blob(user_id, day)
+        return decode_night(blob) if blob is not None else None
+
+    def nights(self, user_id: str, start: date, end: date) -> Iterator[Tuple[date, Dict[str, Series]]]:
+        """Decoded nights from ``start`` to ``end`` inclusive, oldest first."""
+        with self.lock:
+            days = self._days(user_id)
+            blobs = [(day, self._blob(user_id, day)) for day in sorted(d for d in days if start <= d <= end)]
+        for day, blob in blobs:
+            yield day, decode_night(blob)
+
+    def close(self) -> None:
+        with self.lock:
+            for series_file in self.files.values():
+                series_file.close()
+            self.files.clear()
+
+    # ------------------------------------------------------------------
+    def _days(self, user_id: str) -> Iterable[date]:
+        if self.root is None:
+            return list(self.blobs.get(user_id, {}))
+        return list(self._file(user_id).index)
+
+    def _blob(self, user_id: str, day: date) -> Optional[bytes | memoryview]:
+        if self.root is None:
+            return self.blobs.get(user_id, {}).get(day)
+        return self._file(user_id).read(day)
+
+    def _file(self, user_id: str) -> _SeriesFile:
+        series_file = self.files.get(user_id)
+        if series_file is None:
+            assert self.root is not None
+            series_file = self.files[user_id] = _SeriesFile(self.root / f"{user_id}.bin")
+        return series_file
+
+
+class _SeriesFile:
+    """An append-only log of (date, encoded night) records, read via mmap."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.index: Dict[date, Tuple[int, int]] = {}  # day -> (offset, length) of the latest record
+        self.size = 0
+        self.dead = 0
+        self.map: Optional[mmap.mmap] = None
+        if path.exists():
+            self._scan()
+
+    def append(self, day: date, blob: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(_RECORD.pack(day.toordinal(), len(blob)))
+            f.write(blob)
+        if day in self.index:
+            self.dead += _RECORD.size + self.index[day][1]
+        self.index[day] = (self.size + _RECORD.size, len(blob))
+        self.size += _RECORD.size + len(blob)
+        if self.dead > self.size - self.dead:
+            self._compact()
+
+    def read(self, day: date) -> Optional[memoryview]:
+        location = self.index.get(day)
+        if location is None:
+            return None
+        offset, length = location
+        if self.map is None or len(self.map) < offset + length:
+            self._remap()
+        assert self.map is not None
+        return memoryview(self.map)[offset:offset + length]
+
+    def close(self) -> None:
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # a reader still holds a view; the map goes when it does
+            self.map = None
+
+    def _scan(self) -> None:
+        self._remap()
+        if self.map is None:
+            return
+        offset = 0
+        while offset + _RECORD.size <= len(self.map):
+            ordinal, length = _RECORD.unpack_from(self.map, offset)
+            if offset + _RECORD.size + length > len(self.map):
+                break
+            day = date.fromordinal(ordinal)
+            if day in self.index:
+                self.dead += _RECORD.size + self.index[day][1]
+            self.index[day] = (offset + _RECORD.size, length)
+            offset += _RECORD.size + length
+        if offset < len(self.map):
+            # Drop a record torn by a crash mid-append, so new records line up again
+            self.close()
+            os.truncate(self.path, offset)
+        self.size = offset
+
+    def _remap(self) -> None:
+        self.close()
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _compact(self) -> None:
+        records = [(day, bytes(self.read(day))) for day in sorted(self.index)]
+        self.close()
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            for day, blob in records:
+                f.write(_RECORD.pack(day.toordinal(), len(blob)))
+                f.write(blob)
+        os.replace(tmp, self.path)
+        self.index, self.size, self.dead = {}, 0, 0
+        self._scan()
+
+
+def _epoch(value: Any) -> Optional[int]:
+    """Epoch seconds from Garmin's epoch milliseconds or naive GMT ISO strings."""
+    if isinstance(value, (int, float)):
+        return int(value // 1000)
+    if isinstance(value, str):
+        try:
+            return int(datetime.fromisoformat(value).replace(tzinfo=UTC).timestamp())
+        except ValueError:
+            return None
+    return None
+
+
+def _deltas(values: array, start: int) -> Iterator[int]:
+    previous = start
+    for value in values:
+        yield value - previous
+        previous = value
+
+
+def _cumulative(deltas: array, start: int) -> Iterator[int]:
+    total = start
+    for delta in deltas:
+        total += delta
+        yield total
+
+
+def _le(values: array) -> array:
+    """Stored little-endian; swap in place on big-endian hosts."""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+sleep_series = SleepSeriesStore()
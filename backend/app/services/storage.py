@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import uuid
 from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from app.services.activity_log import Activity, ActivityLog
+from app.services.habit_stats import HabitStreakTracker
+from app.services.metrics import registry
 
 
 @dataclass
@@ -12,6 +17,7 @@ class User:
     timezone: str = "UTC"
     garmin_connected: bool = False
     created_at: datetime = field(default_factory=datetime.utcnow)
+    last_seen_at: Optional[datetime] = None  # last authenticated request
 
 
 @dataclass
@@ -20,7 +26,13 @@ class GarminAccount:
     email: str
     token_path: str
     display_name: Optional[str] = None
+    # High-water mark for incremental syncs; None until the first sync succeeds
     last_synced_at: Optional[datetime] = None
+    # Oldest night requested by backfills, how many nights in a row up to it
+    # had no data, and whether Garmin had nothing older
+    backfilled_until: Optional[date] = None
+    backfill_empty_nights: int = 0
+    backfill_complete: bool = False
     created_at: datetime = field(default_factory=datetime.utcnow)
 
 
@@ -66,28 +78,47 @@ class SleepSession:
 
 class InMemoryStore:
     def __init__(self) -> None:
+        # Tells this store's contents apart from a previous process's, e.g. in bulk-load checkpoints
+        self.instance_id = uuid.uuid4().hex
         self.users: Dict[str, User] = {}
+        self.user_ids_by_email: Dict[str, str] = {}
         self.habits: Dict[str, List[Habit]] = {}
-        self.habit_checkins: Dict[tuple[str, date, str], HabitCheckin] = {}
+        # user_id -> (local_date, habit_id) -> check-in
+        self.habit_checkins: Dict[str, Dict[tuple[date, str], HabitCheckin]] = {}
+        self.habit_stats: Dict[tuple[str, str], HabitStreakTracker] = {}
         self.sleep_sessions: Dict[str, List[SleepSession]] = {}
-        self.tokens: Dict[str, str] = {}
+        self.activities: Dict[str, ActivityLog] = {}
         self.garmin_accounts: Dict[str, GarminAccount] = {}
         self.garmin_mfa_sessions: Dict[str, GarminMFASession] = {}
+        # Called with (user_id, topic) after sleep, habit or activity data changes
+        self.listeners: List[Callable[[str, str], None]] = []
+
+    def subscribe(self, listener: Callable[[str, str], None]) -> None:
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, str], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _changed(self, user_id: str, topic: str) -> None:
+        for listener in self.listeners:
+            listener(user_id, topic)
 
     # User operations --------------------------------------------------
     def upsert_user(self, user: User) -> User:
+        previous = self.users.get(user.id)
+        if previous is not None:
+            self.user_ids_by_email.pop(previous.email.lower(), None)
         self.users[user.id] = user
+        self.user_ids_by_email[user.email.lower()] = user.id
         return user
 
     def get_user(self, user_id: str) -> Optional[User]:
         return self.users.get(user_id)
 
     def get_user_by_email(self, email: str) -> Optional[User]:
-        lowered = email.lower()
-        for user in self.users.values():
-            if user.email.lower() == lowered:
-                return user
-        return None
+        user_id = self.user_ids_by_email.get(email.lower())
+        return self.users.get(user_id) if user_id else None
 
     # Habit operations -------------------------------------------------
     def list_habits(self, user_id: str) -> List[Habit]:
@@ -95,52 +126,100 @@ class InMemoryStore:
 
     def set_habits(self, user_id: str, habits: List[Habit]) -> None:
         self.habits[user_id] = habits
+        self._changed(user_id, "habits")
 
     def record_checkin(self, checkin: HabitCheckin) -> HabitCheckin:
-        key = (checkin.user_id, checkin.local_date, checkin.habit_id)
-        self.habit_checkins[key] = checkin
+        self._record_checkin(checkin)
+        self._changed(checkin.user_id, "habits")
         return checkin
 
+    def record_checkins(self, checkins: List[HabitCheckin]) -> None:
+        """Bulk variant of ``record_checkin`` for imports."""
+        for checkin in checkins:
+            self._record_checkin(checkin)
+        for user_id in {checkin.user_id for checkin in checkins}:
+            self._changed(user_id, "habits")
+
+    def _record_checkin(self, checkin: HabitCheckin) -> None:
+        user_checkins = self.habit_checkins.setdefault(checkin.user_id, {})
+        user_checkins[(checkin.local_date, checkin.habit_id)] = checkin
+        tracker = self.habit_stats.get((checkin.user_id, checkin.habit_id))
+        if tracker is None:
+            tracker = self.habit_stats[(checkin.user_id, checkin.habit_id)] = HabitStreakTracker()
+        tracker.record(checkin.local_date, bool(checkin.value))
+
     def get_checkin(self, user_id: str, local_date: date, habit_id: str) -> Optional[HabitCheckin]:
-        return self.habit_checkins.get((user_id, local_date, habit_id))
+        return self.habit_checkins.get(user_id, {}).get((local_date, habit_id))
 
     def list_checkins(self, user_id: str, local_date: Optional[date] = None) -> List[HabitCheckin]:
         results = []
-        for (uid, checkin_date, _), checkin in self.habit_checkins.items():
-            if uid != user_id:
-                continue
+        for (checkin_date, _), checkin in self.habit_checkins.get(user_id, {}).items():
             if local_date and checkin_date != local_date:
                 continue
             results.append(checkin)
         return results
 
+    def iter_checkins(self, user_id: str) -> Iterator[HabitCheckin]:
+        """Yield a user's check-ins oldest first (then by habit id)."""
+        user_checkins = self.habit_checkins.get(user_id, {})
+        for key in sorted(user_checkins):
+            checkin = user_checkins.get(key)
+            if checkin is not None:
+                yield checkin
+
+    def get_habit_stats(self, user_id: str, habit_id: str) -> Optional[HabitStreakTracker]:
+        return self.habit_stats.get((user_id, habit_id))
+
     # Sleep operations -------------------------------------------------
     def add_sleep_sessions(self, user_id: str, sessions: List[SleepSession]) -> None:
-        existing = self.sleep_sessions.setdefault(user_id, [])
-        existing.extend(sessions)
-        existing.sort(key=lambda s: s.date, reverse=True)
+        existing = self.sleep_sessions.get(user_id, [])
+        self.sleep_sessions[user_id] = sorted(existing + sessions, key=lambda s: s.date, reverse=True)
+        self._changed(user_id, "sleep")
 
     def upsert_sleep_session(self, user_id: str, session: SleepSession) -> None:
         """Add or update a sleep session for a specific date."""
-        existing = self.sleep_sessions.setdefault(user_id, [])
-        # Remove any existing session for this date
-        existing[:] = [s for s in existing if s.date != session.date]
-        # Add the new session
-        existing.append(session)
-        existing.sort(key=lambda s: s.date, reverse=True)
+        self.upsert_sleep_sessions(user_id, [session])
+
+    def upsert_sleep_sessions(self, user_id: str, sessions: List[SleepSession]) -> None:
+        """Add or update many sleep sessions, one per date (last one wins)."""
+        if not sessions:
+            return
+        incoming = {s.date: s for s in sessions}
+        existing = self.sleep_sessions.get(user_id, [])
+        kept = [s for s in existing if s.date not in incoming]
+        # Both parts are already newest-first, so this sort is a linear merge
+        kept.extend(sorted(incoming.values(), key=lambda s: s.date, reverse=True))
+        kept.sort(key=lambda s: s.date, reverse=True)
+        self.sleep_sessions[user_id] = kept
+        self._changed(user_id, "sleep")
 
     def overwrite_sleep_sessions(self, user_id: str, sessions: List[SleepSession]) -> None:
         self.sleep_sessions[user_id] = sorted(sessions, key=lambda s: s.date, reverse=True)
+        self._changed(user_id, "sleep")
 
     def list_sleep_sessions(self, user_id: str) -> List[SleepSession]:
         return list(self.sleep_sessions.get(user_id, []))
 
-    # Token operations -------------------------------------------------
-    def store_token(self, token: str, user_id: str) -> None:
-        self.tokens[token] = user_id
+    def iter_sleep_sessions(self, user_id: str) -> Iterator[SleepSession]:
+        """Yield a user's sleep sessions oldest first without copying the list."""
+        # Writers replace the list rather than mutating it, so this stays consistent
+        return reversed(self.sleep_sessions.get(user_id, []))
+
+    # Activity operations ----------------------------------------------
+    def upsert_activities(self, user_id: str, activities: List[Activity]) -> None:
+        """Add activities, replacing any with the same start time and type."""
+        log = self.activities.get(user_id)
+        if log is None:
+            log = self.activities[user_id] = ActivityLog(user_id)
+        log.add_many(activities)
+        self._changed(user_id, "activities")
 
-    def resolve_token(self, token: str) -> Optional[str]:
-        return self.tokens.get(token)
+    def get_activity_log(self, user_id: str) -> Optional[ActivityLog]:
+        return self.activities.get(user_id)
+
+    def list_activities(self, user_id: str) -> List[Activity]:
+        log = self.activities.get(user_id)
+        return list(log.iter_rows()) if log else []
 
     # Garmin credential operations ------------------------------------
     def set_garmin_account(self, account: GarminAccount) -> None:
@@ -149,6 +228,9 @@ class InMemoryStore:
     def get_garmin_account(self, user_id: str) -> Optional[GarminAccount]:
         return self.garmin_accounts.get(user_id)
 
+    def list_garmin_accounts(self) -> List[GarminAccount]:
+        return list(self.garmin_accounts.values())
+
     def delete_garmin_account(self, user_id: str) -> None:
         self.garmin_accounts.pop(user_id, None)
 
@@ -158,5 +240,22 @@ class InMemoryStore:
     def pop_mfa_session(self, token: str) -> Optional[GarminMFASession]:
         return self.garmin_mfa_sessions.pop(token, None)
 
+    # Metrics ----------------------------------------------------------
+    def counts(self) -> Dict[str, int]:
+        """Objects held per kind; values are copied first since writers don't lock."""
+        return {
+            "users": len(self.users),
+            "habits": sum(map(len, list(self.habits.values()))),
+            "checkins": sum(map(len, list(self.habit_checkins.values()))),
+            "sleep_sessions": sum(map(len, list(self.sleep_sessions.values()))),
+            "activities": sum(map(len, list(self.activities.values()))),
+            "garmin_accounts": len(self.garmin_accounts),
+            "mfa_sessions": len(self.garmin_mfa_sessions),
+        }
+
 
 store = InMemoryStore()
+registry.gauge(
+    "sleephabits_store_objects", "Objects in the in-memory store, by kind.", ("kind",),
+    read=lambda: {(kind,): count for kind, count in store.counts().items()},
+)
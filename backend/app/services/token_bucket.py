@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursting to ``capacity``.
+
+    ``acquire`` blocks until a token is free. ``debit`` takes one without
+    waiting and may leave the bucket in debt, which later ``acquire`` calls
+    wait out. Callers that must not be slowed down still count that way.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def available(self) -> float:
+        with self.lock:
+            self._refill()
+            return self.tokens
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until ``acquire(tokens)`` would get through, without taking anything."""
+        with self.lock:
+            self._refill()
+            return max(min(tokens, self.capacity) - self.tokens, 0.0) / self.rate
+
+    def debit(self, tokens: float = 1.0) -> None:
+        with self.lock:
+            self._refill()
+            self.tokens -= tokens
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from typing import Callable, Dict, Optional, Protocol, Tuple
+
+from app.services.metrics import registry, watch_cache
+
+# Every worker and node must share the secret; without one, tokens only
+# verify in the process that issued them and die with it.
+TOKEN_SECRET = os.getenv("AUTH_TOKEN_SECRET")
+TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", str(30 * 24 * 3600)))
+CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+# Unset: logouts only count in this process. redis://host:port/db shares them
+# between workers; the rate limiter's Redis is used if there is one.
+REVOCATION_BACKEND = os.getenv("AUTH_REVOCATION_BACKEND", os.getenv("RATE_LIMIT_BACKEND"))
+# How long a cached token is accepted before its revocation is looked up again
+REVOCATION_RECHECK = float(os.getenv("AUTH_REVOCATION_RECHECK_SECONDS", "5"))
+
+
+class InvalidToken(Exception):
+    """The token is malformed, forged, expired or revoked."""
+
+
+class Revocations(Protocol):
+    def revoke(self, token_id: str, expires: int) -> None:
+        """Reject ``token_id`` from now on; it may be forgotten after ``expires``."""
+
+    def is_revoked(self, token_id: str) -> bool: ...
+
+    def __len__(self) -> int: ...
+
+
+class MemoryRevocations:
+    """Revoked token ids in this process, each kept until its token expires."""
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self.clock = clock
+        self.until: Dict[str, int] = {}  # token id -> expires
+        self.lock = threading.Lock()
+
+    def revoke(self, token_id: str, expires: int) -> None:
+        now = self.clock()
+        with self.lock:
+            # Expired tokens fail verification on their own; keep the list small
+            for stale in [t for t, until in self.until.items() if until <= now]:
+                del self.until[stale]
+            self.until[token_id] = expires
+
+    def is_revoked(self, token_id: str) -> bool:
+        return token_id in self.until
+
+    def __len__(self) -> int:
+        return len(self.until)
+
+
+class RedisRevocations:
+    """Revoked token ids in one Redis sorted set scored by expiry, shared by every worker."""
+
+    KEY = "auth:revoked"
+
+    def __init__(self, url: str, clock: Callable[[], float] = time.time) -> None:
+        import redis  # optional; only needed with a redis:// revocation backend
+
+        self.client = redis.Redis.from_url(url)
+        self.clock = clock
+
+    def revoke(self, token_id: str, expires: int) -> None:
+        pipeline = self.client.pipeline()
+        pipeline.zremrangebyscore(self.KEY, "-inf", self.clock())
+        pipeline.zadd(self.KEY, {token_id: expires})
+        pipeline.execute()
+
+    def is_revoked(self, token_id: str) -> bool:
+        return self.client.zscore(self.KEY, token_id) is not None
+
+    def __len__(self) -> int:
+        return self.client.zcard(self.KEY)
+
+
+class AccessTokens:
+    """HMAC-signed bearer tokens: ``<user_id>.<expires>.<token_id>.<signature>``.
+
+    Tokens are verified with the shared secret alone, so no token store is
+    needed and any process holding the secret accepts them. Logging out
+    revokes a token id until the token would have expired anyway; with a
+    shared revocation backend that holds on every worker. Verified tokens
+    are cached, so a repeat request costs one dict lookup instead of an
+    HMAC, and their revocation is looked up again every ``recheck`` seconds.
+    """
+
+    def __init__(
+        self,
+        secret: bytes | None = None,
+        ttl: int = TOKEN_TTL,
+        cache_size: int = CACHE_SIZE,
+        clock: Callable[[], float] = time.time,
+        revocations: Optional[Revocations] = None,
+        recheck: float = REVOCATION_RECHECK,
+    ) -> None:
+        self.secret = secret or (TOKEN_SECRET.encode() if TOKEN_SECRET else secrets.token_bytes(32))
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.clock = clock
+        self.recheck = recheck
+        # token -> (user_id, expires, token id, when to look up its revocation again)
+        self.verified: Dict[str, Tuple[str, int, str, float]] = {}
+        if revocations is None:
+            revocations = RedisRevocations(REVOCATION_BACKEND, clock) if REVOCATION_BACKEND else MemoryRevocations(clock)
+        self.revoked = revocations
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def issue(self, user_id: str) -> str:
+        body = f"{user_id}.{int(self.clock()) + self.ttl}.{secrets.token_urlsafe(12)}"
+        return f"{body}.{self._sign(body)}"
+
+    def verify(self, token: str) -> str:
+        """The user id the token was issued to; raises InvalidToken otherwise."""
+        now = self.clock()
+        cached = self.verified.get(token)
+        if cached is not None:
+            user_id, expires, token_id, recheck_at = cached
+            if expires <= now:
+                with self.lock:
+                    self.verified.pop(token, None)
+                raise InvalidToken("Token expired")
+            self.hits += 1
+            if recheck_at > now:
+                return user_id
+        else:
+            self.misses += 1
+            user_id, expires, token_id = self._parse(token)
+            if expires <= now:
+                raise InvalidToken("Token expired")
+
+        # Another worker may have revoked it since this one last looked
+        if self.revoked.is_revoked(token_id):
+            with self.lock:
+                self.verified.pop(token, None)
+            raise InvalidToken("Token revoked")
+        with self.lock:
+            if cached is None and len(self.verified) >= self.cache_size:
+                # Drop the oldest entry; dicts keep insertion order
+                del self.verified[next(iter(self.verified))]
+            self.verified[token] = (user_id, expires, token_id, now + self.recheck)
+        return user_id
+
+    def revoke(self, token: str) -> None:
+        _, expires, token_id = self._parse(token)
+        self.revoked.revoke(token_id, expires)
+        with self.lock:
+            self.verified.pop(token, None)
+
+    def _parse(self, token: str) -> Tuple[str, int, str]:
+        body, _, signature = token.rpartition(".")
+        if not body or not hmac.compare_digest(signature, self._sign(body)):
+            raise InvalidToken("Invalid token")
+        user_id, expires, token_id = body.rsplit(".", 2)
+        return user_id, int(expires), token_id
+
+    def _sign(self, body: str) -> str:
+        digest = hmac.new(self.secret, body.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+access_tokens = AccessTokens()
+watch_cache("access_tokens", access_tokens)
+registry.gauge(
+    "sleephabits_access_tokens", "Verified tokens cached, and token ids revoked until they expire.", ("state",),
+    read=lambda: {("cached",): len(access_tokens.verified), ("revoked",): len(access_tokens.revoked)},
+)
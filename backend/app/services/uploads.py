@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import os
+from typing import Any, BinaryIO, Optional
+
+from multipart.multipart import parse_form
+
+UPLOAD_FIELD = "file"
+# Larger request bodies are refused with 413 before they are spooled
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "512")) * 1024 * 1024)
+# Spool in writes of about this size, each on the I/O pool
+SPOOL_WRITE_BYTES = 1024 * 1024
+
+
+def extract_upload(body: BinaryIO, content_type: str, field: str = UPLOAD_FIELD) -> BinaryIO:
+    """The ``field`` file from a spooled multipart request body, rewound.
+
+    python-multipart parses in pure Python (~80 ms per MB), which is why
+    routes hand this to a worker thread rather than letting FastAPI parse
+    the form on the event loop. Parts beyond 1 MB are spooled to disk.
+    """
+    found: Optional[BinaryIO] = None
+
+    def on_file(part: Any) -> None:
+        nonlocal found
+        if found is None and (part.field_name or b"").decode("latin-1") == field:
+            found = part.file_object
+
+    try:
+        parse_form({"Content-Type": content_type}, body, lambda _: None, on_file)
+    except Exception as exc:  # python-multipart raises a mix of its own and ValueErrors
+        raise ValueError(f"Malformed upload: {exc}") from exc
+    finally:
+        body.close()
+    if found is None:
+        raise ValueError(f"Upload must include a '{field}' file part")
+    found.seek(0)
+    return found
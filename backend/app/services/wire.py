@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, Tuple
+
+import msgpack
+from fastapi import Response
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR_JSON = "application/vnd.sleephabits.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.sleephabits.columnar+msgpack"
+
+
+def columnar(value: Any) -> Any:
+    """Turn every list of objects into one object of per-field arrays.
+
+    ``[{"a": 1, "b": {"x": 2}}, {"a": 3, "b": {"x": 4}}]`` becomes
+    ``{"a": [1, 3], "b": {"x": [2, 4]}}``, so each key is sent once instead
+    of once per row. Rows missing a field get null in that column.
+    """
+    if isinstance(value, dict):
+        return {key: columnar(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+        fields: Dict[str, None] = {}
+        for row in value:
+            fields.update(dict.fromkeys(row))
+        return {field: columnar([row.get(field) for row in value]) for field in fields}
+    return value
+
+
+def _json(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, default=str)
+
+
+# media type -> (reshape rows into columns?, encoder)
+ENCODINGS: Dict[str, Tuple[bool, Callable[[Any], bytes]]] = {
+    JSON: (False, _json),
+    MSGPACK: (False, _msgpack),
+    "application/x-msgpack": (False, _msgpack),
+    COLUMNAR_JSON: (True, _json),
+    COLUMNAR_MSGPACK: (True, _msgpack),
+}
+
+
+def negotiate(accept: str | None) -> str:
+    """The media type to answer with, by the Accept header's q-values; JSON by default."""
+    best, best_q = JSON, 0.0
+    for part in (accept or "").split(","):
+        media_type, *params = (item.strip() for item in part.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, raw = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        if media_type.lower() in ENCODINGS and q > best_q:
+            best, best_q = media_type.lower(), q
+    return best
+
+
+def render(payload: Any, accept: str | None) -> Response:
+    """``payload`` encoded in the format the client prefers."""
+    media_type = negotiate(accept)
+    reshape, encode = ENCODINGS[media_type]
+    body = encode(columnar(payload) if reshape else payload)
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,74 @@
+"""
+Benchmark the streaming CSV importer at increasing row counts.
+
+For each size a CSV in the generate_synthetic_data.py layout is written to a
+temporary file, then:
+- the parser alone is run under tracemalloc (peak should stay flat), and
+- the full import into the in-memory store is timed.
+
+Usage (from backend/):  python -m benchmarks.bench_csv_import [rows ...]
+"""
+
+import csv
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+
+from app.services.imports import CsvImportService, iter_text_lines
+from app.services.storage import User, store
+
+HEADER = ['type', 'date', 'sleep_score', 'duration_minutes', 'bedtime', 'wake_time', 'habit_id', 'habit_name', 'value']
+HABIT_IDS = ['habit-read', 'habit-meditate', 'habit-alcohol']
+
+
+def write_csv(path: str, rows: int) -> None:
+    start = date(1900, 1, 1)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        written = 0
+        day = 0
+        while written < rows:
+            current = (start + timedelta(days=day)).isoformat()
+            writer.writerow(['sleep', current, 60 + day % 40, 420 + day % 60, '23:00', '06:30', '', '', ''])
+            written += 1
+            for habit_id in HABIT_IDS:
+                if written >= rows:
+                    break
+                writer.writerow(['habit', current, '', '', '', '', habit_id, habit_id, day % 2 == 0])
+                written += 1
+            day += 1
+
+
+def bench(rows: int) -> None:
+    with tempfile.NamedTemporaryFile(suffix='.csv') as tmp:
+        write_csv(tmp.name, rows)
+
+        tracemalloc.start()
+        with open(tmp.name, 'rb') as f:
+            parsed = sum(1 for _ in csv.DictReader(iter_text_lines(f)))
+        _, parse_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        user = User(id=str(uuid.uuid4()), email=f'bench-{rows}@example.com')
+        store.upsert_user(user)
+        service = CsvImportService()
+        started = time.perf_counter()
+        with open(tmp.name, 'rb') as f:
+            result = service.import_stream(user, f)
+        elapsed = time.perf_counter() - started
+
+    imported = result['sleep_imported'] + result['habits_imported']
+    print(
+        f"{rows:>9} rows | parsed {parsed:>9} | parse peak {parse_peak / 1024:8.1f} KiB | "
+        f"import {elapsed:7.2f}s | {imported / elapsed:>10,.0f} rows/s"
+    )
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,174 @@
+"""
+Benchmark /me/summary latency while heavy requests share the event loop.
+
+The app runs in-process on one event loop (as under a single uvicorn
+worker). A probe user polls GET /me/summary, first alone and then while
+other users concurrently run:
+- analytics over several years of synthetic history,
+- CSV imports, and
+- Garmin backfills against a local fake Garmin server.
+Reports p50/p95/p99/max latency of the probe for both phases.
+
+Usage (from backend/):  python -m benchmarks.bench_event_loop [--seconds 10] [--years 5] [--import-rows 20000]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+from app.main import app, lifespan
+from app.services import garmin
+from app.services.garmin import GarminConnectService
+from app.services.rate_limit import rate_limiter
+from benchmarks.bench_csv_import import write_csv
+from benchmarks.fake_garmin import FakeGarminServer
+from generate_synthetic_data import generate_user, populate_store
+
+ANALYTICS_USERS = 4
+IMPORT_USERS = 2
+GARMIN_USERS = 4
+
+
+async def login(client: httpx.AsyncClient, email: str) -> dict:
+    response = await client.post('/auth/login', json={'email': email})
+    response.raise_for_status()
+    return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+
+async def probe(client: httpx.AsyncClient, headers: dict, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get('/me/summary', headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def keep_running(stop: asyncio.Event, request) -> int:
+    done = 0
+    while not stop.is_set():
+        await request()
+        done += 1
+    return done
+
+
+async def import_loop(client: httpx.AsyncClient, headers: dict, csv_bytes: bytes, stop: asyncio.Event) -> int:
+    done = 0
+    while not stop.is_set():
+        # A unique trailing row, so the upload isn't deduplicated against the last one
+        night = date(1800, 1, 1) + timedelta(days=done)
+        body = csv_bytes + f'sleep,{night},70,420,23:00,06:30,,,\n'.encode()
+        response = await client.post('/me/import/csv', files={'file': ('bench.csv', body, 'text/csv')}, headers=headers)
+        job_id = response.json()['job_id']
+        while not stop.is_set():
+            status = (await client.get(f'/me/import/{job_id}', headers=headers)).json()['status']
+            if status not in ('queued', 'running'):
+                break
+            await asyncio.sleep(0.05)
+        done += 1
+    return done
+
+
+def report(name: str, latencies: list[float]) -> str:
+    ordered = sorted(latencies)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return (
+        f"{name:<7} {len(ordered):>6} requests | p50 {pick(0.5):7.2f} ms | p95 {pick(0.95):7.2f} ms | "
+        f"p99 {pick(0.99):7.2f} ms | max {ordered[-1] * 1000:7.2f} ms | mean {statistics.mean(ordered) * 1000:6.2f} ms"
+    )
+
+
+async def run(args: argparse.Namespace) -> list[str]:
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport doesn't send lifespan events; start the app's services by hand
+    async with lifespan(app), httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+        probe_headers = await login(client, 'probe@example.com')
+
+        start = date.today() - timedelta(days=int(args.years * 365))
+        populate_store(ANALYTICS_USERS, args.years, seed=42, start=start)
+        analytics_headers = [
+            await login(client, generate_user(i, start, 1).email) for i in range(ANALYTICS_USERS)
+        ]
+        import_headers = [await login(client, f'bench-import-{i}@example.com') for i in range(IMPORT_USERS)]
+        garmin_headers = []
+        for i in range(GARMIN_USERS):
+            headers = await login(client, f'bench-garmin-{i}@example.com')
+            response = await client.post('/garmin/connect', json={'email': 'x@example.com', 'password': 'x'}, headers=headers)
+            response.raise_for_status()
+            garmin_headers.append(headers)
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as tmp:
+            write_csv(tmp.name, args.import_rows)
+            csv_bytes = Path(tmp.name).read_bytes()
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, probe_headers, stop))
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        lines = [report('idle', await probe_task)]
+
+        stop = asyncio.Event()
+        load = [
+            *(keep_running(stop, lambda h=h: client.get('/me/analytics', headers=h)) for h in analytics_headers),
+            *(import_loop(client, h, csv_bytes, stop) for h in import_headers),
+            *(keep_running(stop, lambda h=h: client.post('/garmin/backfill?days=30', headers=h)) for h in garmin_headers),
+        ]
+        load_tasks = [asyncio.create_task(task) for task in load]
+        probe_task = asyncio.create_task(probe(client, probe_headers, stop))
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        lines.append(report('loaded', await probe_task))
+        counts = await asyncio.gather(*load_tasks)
+        lines.append(
+            f"        background: {sum(counts[:ANALYTICS_USERS])} analytics, "
+            f"{sum(counts[ANALYTICS_USERS:ANALYTICS_USERS + IMPORT_USERS])} imports, "
+            f"{sum(counts[ANALYTICS_USERS + IMPORT_USERS:])} Garmin backfills"
+        )
+    return lines
+
+
+def use_token_root(root: Path) -> None:
+    """Keep the simulated users' Garmin tokens out of app/data."""
+    def token_root_for(self: GarminConnectService, user) -> Path:
+        path = root / user.id
+        path.mkdir(exist_ok=True)
+        return path
+
+    GarminConnectService._token_root_for = token_root_for
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10, help='length of each phase')
+    parser.add_argument('--years', type=float, default=5, help='history per analytics user')
+    parser.add_argument('--import-rows', type=int, default=20000, help='rows per CSV upload')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated Garmin seconds per request')
+    args = parser.parse_args()
+
+    with FakeGarminServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as scratch:
+        garmin.garmin_transport = server.transport()
+        # The probe and load users far exceed any per-user quota on purpose
+        rate_limiter.enabled = False
+        use_token_root(Path(scratch))
+        # The services log per request; keep that out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            lines = asyncio.run(run(args))
+    print(f"/me/summary latency, {args.seconds:.0f} s per phase:")
+    print('\n'.join(lines))
+
+
+if __name__ == '__main__':
+    main()
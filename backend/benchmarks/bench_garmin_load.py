@@ -0,0 +1,125 @@
+"""
+Load-test the Garmin path for many simulated users, entirely offline.
+
+For each user count (1/10/100/1000 by default, up to 10k) fresh users are
+created and, against a local fake or replay Garmin server:
+- connect: every user logs in and runs the first 30-night sync,
+- pull: every user runs an incremental sync (as POST /garmin/pull does),
+- scheduler: GarminSyncScheduler syncs every account once in the background.
+Each phase reports wall time, users per second and Garmin requests made.
+
+Usage (from backend/):
+    python -m benchmarks.bench_garmin_load [users ...] [--latency 0.02] [--concurrency 32]
+        [--fixtures DIR] [--error-rate 0.01] [--rate-limit-rate 0.001] [--requests-per-second N]
+Without --fixtures nights are synthesised; with it they are replayed from
+fixtures recorded by benchmarks.record_garmin.
+"""
+
+import argparse
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.services import garmin, garmin_scheduler
+from app.services.garmin import GarminConnectService
+from app.services.garmin_cache import SleepPayloadCache
+from app.services.garmin_clients import garmin_clients
+from app.services.garmin_scheduler import GarminSyncScheduler
+from app.services.storage import User, store
+from app.services.token_bucket import TokenBucket
+from benchmarks.fake_garmin import FakeGarminServer, ReplayGarminServer
+
+
+def run_phase(name: str, server: FakeGarminServer, users: list[User], concurrency: int, work) -> None:
+    requests_before = server.requests
+    errors = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(work, user) for user in users]:
+            if future.exception() is not None:
+                errors += 1
+    elapsed = time.perf_counter() - started
+    report(name, len(users), elapsed, server.requests - requests_before, errors)
+
+
+def run_scheduler(server: FakeGarminServer, service: GarminConnectService, users: list[User], workers: int, timeout: float) -> None:
+    interval = garmin_scheduler.SYNC_INTERVAL
+    scheduler = GarminSyncScheduler(workers=workers, clock=lambda: time.time() + 2 * interval)
+    scheduler.service.transport = service.transport
+    scheduler.service.cache = service.cache
+    accounts = len(store.list_garmin_accounts())
+    requests_before = server.requests
+    started = time.perf_counter()
+    scheduler.start()
+    try:
+        while scheduler.syncs_completed + scheduler.syncs_failed + scheduler.rate_limited < accounts:
+            if time.perf_counter() - started > timeout:
+                print(f"  scheduler: timed out, {scheduler.metrics()}")
+                break
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+    elapsed = time.perf_counter() - started
+    errors = scheduler.syncs_failed + scheduler.rate_limited
+    report('scheduler', accounts, elapsed, server.requests - requests_before, errors)
+
+
+def report(name: str, users: int, elapsed: float, requests: int, errors: int) -> None:
+    print(
+        f"  {name:<9} {elapsed:8.2f}s | {users / elapsed:8.1f} users/s | "
+        f"{requests:>7} requests ({requests / elapsed:7.0f}/s) | {errors} errors"
+    )
+
+
+def bench(count: int, args: argparse.Namespace) -> None:
+    options = dict(latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=count)
+    server = ReplayGarminServer(args.fixtures, **options) if args.fixtures else FakeGarminServer(**options)
+    # Only this run's accounts should be due for the scheduler
+    store.garmin_accounts.clear()
+    garmin_clients.close()
+
+    with server, tempfile.TemporaryDirectory() as scratch:
+        service = GarminConnectService()
+        service.transport = server.transport(pool_maxsize=garmin.SYNC_WORKERS)
+        service.token_root = Path(scratch) / 'tokens'
+        service.cache = SleepPayloadCache(Path(scratch) / 'cache')
+        service.allow_sample = False
+
+        run_id = uuid.uuid4().hex[:8]
+        users = [
+            store.upsert_user(User(id=f'load-{run_id}-{i}', email=f'load-{run_id}-{i}@example.com'))
+            for i in range(count)
+        ]
+        print(f"{count} users:")
+        run_phase('connect', server, users, args.concurrency,
+                  lambda user: service.connect(user=user, email=user.email, password='replay'))
+        run_phase('pull', server, users, args.concurrency,
+                  lambda user: service.sync_recent_sleep(user=user))
+        run_scheduler(server, service, users, args.concurrency, args.timeout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('users', type=int, nargs='*', default=[1, 10, 100, 1000])
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated seconds per request')
+    parser.add_argument('--concurrency', type=int, default=32, help='users synced at once (and scheduler workers)')
+    parser.add_argument('--fixtures', type=Path, help='replay recorded fixtures from this directory')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of sleep requests answering 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of sleep requests answering 429')
+    parser.add_argument('--requests-per-second', type=float, default=1e9, help='shared Garmin request budget')
+    parser.add_argument('--timeout', type=float, default=600, help='give up on the scheduler phase after this')
+    args = parser.parse_args()
+
+    budget = TokenBucket(rate=args.requests_per_second, capacity=max(args.requests_per_second, 1))
+    garmin.request_budget = garmin_scheduler.request_budget = budget
+    # Measure sync throughput, not the wait for the scheduler's next tick
+    garmin_scheduler.TICK_SECONDS = 0.05
+    print(f"Simulated Garmin latency: {args.latency * 1000:.0f} ms per request, {garmin.SYNC_WORKERS} fetch workers")
+    for count in args.users:
+        bench(count, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark Garmin sleep sync wall time against a local fake Garmin server.
+
+For each window (30/90/365 days by default) the same day fetches are run:
+- one after another, as sync_recent_sleep used to, and
+- through GarminConnectService.fetch_sleep_days on the shared worker pool.
+
+Usage (from backend/):  python -m benchmarks.bench_garmin_sync [days ...] [--latency 0.05]
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+from app.services.garmin import SYNC_WORKERS, GarminConnectService, parse_sleep_payload
+from benchmarks.fake_garmin import FakeGarminServer
+
+
+def bench(days: int, latency: float) -> None:
+    service = GarminConnectService()
+    today = date.today()
+    target_dates = [today - timedelta(days=offset) for offset in range(days)]
+
+    with FakeGarminServer(latency=latency) as server:
+        client = server.client(pool_maxsize=SYNC_WORKERS)
+        _ = client.username  # profile lookup is shared by both runs
+
+        started = time.perf_counter()
+        serial = [parse_sleep_payload(service._fetch_sleep_payload(client, day)) for day in target_dates]
+        serial_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        found, failed = service.fetch_sleep_days(client, target_dates)[:2]
+        concurrent_time = time.perf_counter() - started
+
+    assert len(found) == sum(1 for data in serial if data) and not failed
+    print(
+        f"{days:>4} days: serial {serial_time:6.2f}s | concurrent ({SYNC_WORKERS} workers) "
+        f"{concurrent_time:6.2f}s | {serial_time / concurrent_time:4.1f}x"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('days', type=int, nargs='*', default=[30, 90, 365])
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated seconds per request')
+    args = parser.parse_args()
+    print(f"Simulated Garmin latency: {args.latency * 1000:.0f} ms per request")
+    for days in args.days:
+        bench(days, args.latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Measure how many idle /me/events streams one worker holds, and their memory.
+
+Starts the app under uvicorn in a subprocess (one worker), signs in a few
+users, then opens idle Server-Sent Events connections in steps. After each
+step it reports the worker's resident memory, the memory per connection,
+and how long a change takes to reach every stream of the user it belongs
+to. Needs an open-file limit above the largest step (see `ulimit -n`).
+
+Usage (from backend/):  python -m benchmarks.bench_sse_connections [--steps 1000 5000 10000] [--users 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def rss_kb(pid: int) -> int:
+    for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1])
+    return 0
+
+
+def post(base: str, path: str, payload: dict, token: str | None = None) -> dict:
+    request = urllib.request.Request(
+        base + path,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json', **({'Authorization': f'Bearer {token}'} if token else {})},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read() or b'null')
+
+
+async def open_stream(port: int, token: str) -> tuple:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(
+        f'GET /me/events HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n'
+        f'Accept: text/event-stream\r\n\r\n'.encode()
+    )
+    await reader.readuntil(b'event: summary')  # connected and subscribed
+    await reader.readuntil(b'\n\n')
+    return reader, writer
+
+
+async def run(args: argparse.Namespace, port: int, pid: int) -> None:
+    base = f'http://127.0.0.1:{port}'
+    tokens = [post(base, '/auth/login', {'email': f'sse-{i}@example.com'})['access_token'] for i in range(args.users)]
+    await asyncio.sleep(0.5)
+    baseline = rss_kb(pid)
+    print(f"worker RSS before streams: {baseline / 1024:.1f} MB")
+
+    streams = []
+    for target in args.steps:
+        started = time.perf_counter()
+        while len(streams) < target:
+            batch = [open_stream(port, tokens[(len(streams) + i) % args.users]) for i in range(min(500, target - len(streams)))]
+            streams.extend(await asyncio.gather(*batch))
+        opened = time.perf_counter() - started
+        await asyncio.sleep(0.5)
+        rss = rss_kb(pid)
+
+        # One check-in for user 0 should reach all of that user's streams
+        own = streams[::args.users]
+        started = time.perf_counter()
+        await asyncio.to_thread(
+            post, base, '/me/habits/checkin', {'habit_id': 'habit-read', 'value': True}, tokens[0]
+        )
+        await asyncio.gather(*(reader.readuntil(b'event: summary') for reader, _ in own))
+        fanout = time.perf_counter() - started
+        print(
+            f"{len(streams):>6} streams | opened in {opened:6.2f}s | RSS {rss / 1024:7.1f} MB | "
+            f"{(rss - baseline) / len(streams):5.1f} KB per stream | "
+            f"summary pushed to {len(own)} streams in {fanout * 1000:6.1f} ms"
+        )
+
+    for _, writer in streams:
+        writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--steps', type=int, nargs='*', default=[1000, 5000, 10000])
+    parser.add_argument('--users', type=int, default=100, help='users the streams are spread over')
+    args = parser.parse_args()
+
+    port = free_port()
+    env = {**os.environ, 'RATE_LIMIT_ENABLED': '0', 'GARMIN_BACKGROUND_SYNC': '0'}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port), '--log-level', 'warning',
+         '--backlog', '4096'],
+        env=env,
+    )
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/health').close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        asyncio.run(run(args, port, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
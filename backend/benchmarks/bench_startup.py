@@ -0,0 +1,119 @@
+"""
+Measure how long a fresh process takes to import the app and serve its first request.
+
+Runs ``python -X importtime -c "import app.main"`` several times and
+reports the median import time with the slowest top-level packages, then
+starts the app under uvicorn (one worker) and times launch to the first
+200 from /health. Also checks that the Garmin stack (garminconnect,
+garth, requests) is not imported with the app. Exits non-zero when a
+median exceeds its budget or the Garmin stack is loaded, so it can gate
+CI.
+
+Usage (from backend/):  python -m benchmarks.bench_startup [--runs 5] [--import-budget-ms 500] [--first-request-budget-ms 1000]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+LAZY_MODULES = ('garminconnect', 'garth', 'requests', 'app.services.garmin', 'app.services.garmin_transport')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def import_profile() -> tuple[float, dict[str, float]]:
+    """(ms to import app.main, self ms per top-level package) from one ``-X importtime`` run."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app.main'],
+        capture_output=True, text=True, check=True,
+    )
+    total = 0.0
+    packages: dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        packages[name.split('.')[0]] += int(self_us) / 1000
+        if name == 'app.main':
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def lazily_loaded_modules() -> list[str]:
+    """Modules of ``LAZY_MODULES`` that ``import app.main`` pulled in anyway."""
+    check = f'import sys, app.main; print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])'
+    result = subprocess.run([sys.executable, '-c', check], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def time_to_first_request() -> float:
+    """Seconds from launching uvicorn to the first successful /health."""
+    port = free_port()
+    env = {**os.environ, 'GARMIN_BACKGROUND_SYNC': '0'}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port), '--log-level', 'warning'],
+        env=env,
+    )
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/health').close()
+                return time.perf_counter() - started
+            except OSError:
+                if server.poll() is not None or time.perf_counter() - started > 30:
+                    raise RuntimeError('server did not come up')
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='slowest packages to list')
+    parser.add_argument('--import-budget-ms', type=float, default=500)
+    parser.add_argument('--first-request-budget-ms', type=float, default=1000)
+    args = parser.parse_args()
+
+    import_profile()  # warm the bytecode and file caches
+    totals, by_package = [], defaultdict(list)
+    for _ in range(args.runs):
+        total, packages = import_profile()
+        totals.append(total)
+        for name, ms in packages.items():
+            by_package[name].append(ms)
+    import_ms = statistics.median(totals)
+    print(f"import app.main: median {import_ms:.0f} ms over {args.runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+    slowest = sorted(by_package.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+    for name, samples in slowest:
+        print(f"  {name:<24} {statistics.median(samples):7.1f} ms")
+
+    first_request_ms = statistics.median(time_to_first_request() for _ in range(args.runs)) * 1000
+    print(f"launch to first /health: median {first_request_ms:.0f} ms")
+
+    failures = []
+    if loaded := lazily_loaded_modules():
+        failures.append(f"imported with the app: {', '.join(loaded)}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import {import_ms:.0f} ms > budget {args.import_budget_ms:.0f} ms")
+    if first_request_ms > args.first_request_budget_ms:
+        failures.append(f"first request {first_request_ms:.0f} ms > budget {args.first_request_budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
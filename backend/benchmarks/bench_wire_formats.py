@@ -0,0 +1,98 @@
+"""
+Compare payload size and server CPU per wire format and compression.
+
+Builds one user with several years of history (and a week of intraday
+series), then for the year timeline, analytics and the week's series
+encodes the response in every negotiable format and compresses it with
+gzip and brotli. Reports bytes on the wire and CPU time per request for
+encoding, compressing, and compressing through the cache when the
+payload is unchanged. Exports are streamed, so only their sizes are shown.
+
+Usage (from backend/):  python -m benchmarks.bench_wire_formats [--years 3] [--repeat 50]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from datetime import date, datetime, timedelta
+
+from app.services.compression import CompressedBodyCache, compress
+from app.services.export import ExportService
+from app.services.sleep import SleepService
+from app.services.sleep_series import series_from_payload
+from app.services.storage import store
+from app.services.wire import COLUMNAR_JSON, COLUMNAR_MSGPACK, JSON, MSGPACK, render
+from benchmarks.fake_garmin import sleep_series_payload
+from generate_synthetic_data import generate_user, populate_store
+
+FORMATS = (JSON, COLUMNAR_JSON, MSGPACK, COLUMNAR_MSGPACK)
+
+
+def cpu_per_call(func, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat
+
+
+def build_user(years: float):
+    start = date.today() - timedelta(days=int(years * 365))
+    populate_store(1, years, seed=7, start=start)
+    user = store.get_user_by_email(generate_user(0, start, 1).email)
+    # Synthetic nights have no stage breakdown; give them one like Garmin's
+    for session in store.list_sleep_sessions(user.id):
+        minutes = session.duration_minutes
+        session.stage_minutes = {'deep': minutes // 5, 'light': minutes // 2, 'rem': minutes // 5, 'awake': minutes // 10}
+    service = SleepService()
+    for offset in range(7):
+        night = date.today() - timedelta(days=offset)
+        night_start = datetime.combine(night - timedelta(days=1), datetime.min.time()) + timedelta(hours=23)
+        service.series.put(user.id, night, series_from_payload(sleep_series_payload(night_start, 7 * 3600)))
+    return user, service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--repeat', type=int, default=50, help='calls per CPU measurement')
+    args = parser.parse_args()
+
+    user, service = build_user(args.years)
+    # The services log per call; keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        payloads = {
+            'timeline (year)': service.get_timeline(user, 'year'),
+            'analytics': service.get_analytics(user),
+            'series (week)': service.get_series(user, date.today() - timedelta(days=6), date.today()),
+        }
+
+    print(f"{'payload':<16} {'format':<44} {'bytes':>8} {'gzip':>7} {'br':>7} | "
+          f"{'encode':>8} {'gzip':>8} {'br':>8} {'cached':>8}  (CPU per request)")
+    for name, payload in payloads.items():
+        for media_type in FORMATS:
+            body = render(payload, media_type).body
+            encode = cpu_per_call(lambda: render(payload, media_type), args.repeat)
+            sizes, times = [], []
+            for encoding in ('gzip', 'br'):
+                sizes.append(len(compress(body, encoding)))
+                times.append(cpu_per_call(lambda: compress(body, encoding), args.repeat))
+            cache = CompressedBodyCache()
+            cache.compress(body, 'br')
+            cached = cpu_per_call(lambda: cache.compress(body, 'br'), args.repeat)
+            print(
+                f"{name:<16} {media_type:<44} {len(body):>8} {sizes[0]:>7} {sizes[1]:>7} | "
+                f"{encode * 1e3:6.2f}ms {times[0] * 1e3:6.2f}ms {times[1] * 1e3:6.2f}ms {cached * 1e3:6.3f}ms"
+            )
+
+    exports = ExportService()
+    for export_format in ('csv', 'ndjson'):
+        body = b''.join(exports.stream(user, export_format))
+        print(
+            f"{'export':<16} {export_format:<44} {len(body):>8} "
+            f"{len(compress(body, 'gzip')):>7} {len(compress(body, 'br')):>7} | streamed"
+        )
+
+
+if __name__ == '__main__':
+    main()
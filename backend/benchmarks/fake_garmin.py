@@ -0,0 +1,265 @@
+"""
+A local stand-in for the Garmin Connect API, for benchmarks and tests.
+
+Serves the profile, settings and dailySleepData endpoints over plain HTTP
+on 127.0.0.1 with a configurable per-request latency, error rate and 429
+rate. `FakeGarminServer` synthesises nights; `ReplayGarminServer` answers
+from fixtures captured with `RecordingTransport`
+(`python -m benchmarks.record_garmin`). `.client()` returns a garth client
+and `.transport()` a `ReplayTransport` whose HTTPS requests go to the
+server, so the real garth/requests stack (sessions, connection pool,
+timeouts) is exercised end to end.
+"""
+
+import json
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from garth import Client
+
+from app.services.garmin_transport import FIXTURE_USERNAME, ReplayTransport
+
+USERNAME = FIXTURE_USERNAME
+SLEEP_PREFIX = '/wellness-service/wellness/dailySleepData/'
+
+
+def sleep_payload(day: date) -> dict:
+    """A dailySleepData response shaped like Garmin's, varying a little per night."""
+    start = datetime.combine(day - timedelta(days=1), datetime.min.time()) + timedelta(hours=23, minutes=day.day % 40)
+    seconds = 7 * 3600 + (day.toordinal() % 5) * 600
+    start_ms = int(start.timestamp() * 1000)
+    end_ms = start_ms + seconds * 1000
+    score = {'qualifierKey': 'GOOD', 'value': 60 + day.toordinal() % 35}
+    return {
+        'dailySleepDTO': {
+            'id': day.toordinal(),
+            'userProfilePK': 1,
+            'calendarDate': day.isoformat(),
+            'sleepTimeSeconds': seconds,
+            'napTimeSeconds': 0,
+            'sleepWindowConfirmed': True,
+            'sleepWindowConfirmationType': 'enhanced_confirmed_final',
+            'sleepStartTimestampGMT': start_ms,
+            'sleepEndTimestampGMT': end_ms,
+            'sleepStartTimestampLocal': start_ms,
+            'sleepEndTimestampLocal': end_ms,
+            'deviceRemCapable': True,
+            'retro': False,
+            'deepSleepSeconds': seconds // 5,
+            'lightSleepSeconds': seconds // 2,
+            'remSleepSeconds': seconds // 5,
+            'awakeSleepSeconds': seconds // 10,
+            'sleepScores': {
+                name: score
+                for name in (
+                    'totalDuration', 'stress', 'awakeCount', 'overall',
+                    'remPercentage', 'restlessness', 'lightPercentage', 'deepPercentage',
+                )
+            },
+        },
+        **sleep_series_payload(start, seconds),
+    }
+
+
+def sleep_series_payload(start: datetime, seconds: int) -> dict:
+    """Intraday series for one night: 30-minute stage cycles, HR every 2 min, HRV every 5, SpO2 every 5."""
+    def gmt(offset: int) -> str:
+        return (start + timedelta(seconds=offset)).isoformat(timespec='milliseconds')[:-2]
+
+    start_ms = int(start.timestamp() * 1000)
+    cycle = (1, 0, 1, 2, 3)  # light, deep, light, REM, awake
+    return {
+        'sleepLevels': [
+            {'startGMT': gmt(offset), 'endGMT': gmt(min(offset + 1800, seconds)), 'activityLevel': float(cycle[i % len(cycle)])}
+            for i, offset in enumerate(range(0, seconds, 1800))
+        ],
+        'sleepHeartRate': [
+            {'value': 50 + (offset // 120) % 15, 'startGMT': start_ms + offset * 1000}
+            for offset in range(0, seconds, 120)
+        ],
+        'hrvData': [
+            {'value': 40.0 + (offset // 300) % 20, 'startGMT': start_ms + offset * 1000}
+            for offset in range(0, seconds, 300)
+        ],
+        'wellnessEpochSPO2DataDTOList': [
+            {'epochTimestamp': gmt(offset), 'spo2Reading': 92 + (offset // 300) % 7, 'readingConfidence': 20}
+            for offset in range(0, seconds, 300)
+        ],
+    }
+
+
+class FakeGarminServer:
+    """Threaded HTTP server answering like connectapi.garmin.com.
+
+    ``failing`` days answer 500, ``missing`` days (and any day before
+    ``history_start``) answer without a night, and every day answers 429
+    while ``rate_limit`` is set. Independently of that, a random
+    ``error_rate`` share of sleep requests answer 500 and ``rate_limit_rate``
+    answer 429. ``sleep_requests`` counts the dailySleepData calls.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        failing: Iterable[date] = (),
+        missing: Iterable[date] = (),
+        history_start: Optional[date] = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = latency
+        self.failing = set(failing)
+        self.missing = set(missing)
+        self.history_start = history_start
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit = False
+        self.requests = 0
+        self.sleep_requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def respond(self, method: str, path: str, query: str) -> tuple[int, Any]:
+        """Status and JSON body for one request."""
+        if path == '/userprofile-service/socialProfile':
+            return 200, {'userName': USERNAME, 'displayName': USERNAME}
+        if path == '/userprofile-service/userprofile/user-settings':
+            return 200, {'id': 1, 'userData': {'measurementSystem': 'metric'}}
+        if path.startswith(SLEEP_PREFIX):
+            day = date.fromisoformat(parse_qs(query)['date'][0])
+            with self._lock:
+                self.sleep_requests += 1
+                roll = self._rng.random()
+            if self.rate_limit or roll < self.rate_limit_rate:
+                return 429, {'message': 'Too Many Requests'}
+            if day in self.failing or roll < self.rate_limit_rate + self.error_rate:
+                return 500, {'message': 'upstream error'}
+            return 200, self.sleep_response(day)
+        return 404, {'message': 'not found'}
+
+    def sleep_response(self, day: date) -> dict:
+        if day in self.missing or (self.history_start and day < self.history_start):
+            return {'dailySleepDTO': {'id': None}}
+        return sleep_payload(day)
+
+    def __enter__(self) -> 'FakeGarminServer':
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                self._handle()
+
+            def do_POST(self) -> None:
+                self._handle()
+
+            def _handle(self) -> None:
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                url = urlsplit(self.path)
+                status, body = fake.respond(self.command, url.path, url.query)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        ThreadingHTTPServer.daemon_threads = True
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.request_queue_size = 1024
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        assert self._server is not None
+        self._server.shutdown()
+        self._server.server_close()
+
+    def transport(self, pool_maxsize: int = 16) -> ReplayTransport:
+        """A transport for ``GarminConnectService`` that logs in and syncs against this server."""
+        return ReplayTransport(self.base_url, pool_maxsize=pool_maxsize)
+
+    def client(self, retries: int = 0, pool_maxsize: int = 16) -> Client:
+        """A garth client with dummy tokens, talking to this server."""
+        return self.transport(pool_maxsize).client(retries=retries)
+
+
+class ReplayGarminServer(FakeGarminServer):
+    """Answers from recorded fixtures instead of synthesised nights.
+
+    Requests that were recorded get their recorded response. Nights that
+    weren't are served from a recorded night chosen by date, with its dates
+    and timestamps moved to the requested day, so any number of simulated
+    users and days can be replayed from one recording.
+    """
+
+    def __init__(self, fixture_dir: Path, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.fixtures: dict[tuple[str, str], tuple[int, Any]] = {}
+        self.recorded_nights: dict[date, Any] = {}
+        for path in sorted(Path(fixture_dir).glob('*.json')):
+            fixture = json.loads(path.read_text(encoding='utf-8'))
+            if fixture['path'].startswith(SLEEP_PREFIX):
+                if fixture['status'] == 200:
+                    day = date.fromisoformat(parse_qs(fixture['query'])['date'][0])
+                    self.recorded_nights[day] = fixture['body']
+            else:
+                self.fixtures[(fixture['method'], fixture['path'])] = (fixture['status'], fixture['body'])
+        self.nights = sorted(
+            (day, body) for day, body in self.recorded_nights.items()
+            if (body.get('dailySleepDTO') or {}).get('id')
+        )
+        if not self.nights:
+            raise ValueError(f'No recorded nights in {fixture_dir}')
+
+    def respond(self, method: str, path: str, query: str) -> tuple[int, Any]:
+        recorded = self.fixtures.get((method, path))
+        if recorded is not None and not path.startswith(SLEEP_PREFIX):
+            return recorded
+        return super().respond(method, path, query)
+
+    def sleep_response(self, day: date) -> dict:
+        if day in self.recorded_nights:
+            return self.recorded_nights[day]
+        recorded_day, body = self.nights[day.toordinal() % len(self.nights)]
+        return _shift_dates(body, day - recorded_day)
+
+
+def _shift_dates(value: Any, delta: timedelta) -> Any:
+    """A copy of ``value`` with ISO dates, datetimes and epoch-millisecond timestamps moved by ``delta``."""
+    if isinstance(value, dict):
+        return {
+            key: item + int(delta.total_seconds() * 1000)
+            if isinstance(item, int) and key.endswith(('GMT', 'Local'))
+            else _shift_dates(item, delta)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_shift_dates(item, delta) for item in value]
+    if isinstance(value, str) and len(value) >= 10 and value[4:5] == '-' and value[7:8] == '-':
+        try:
+            if len(value) == 10:
+                return (date.fromisoformat(value) + delta).isoformat()
+            shifted = datetime.fromisoformat(value) + delta
+        except ValueError:
+            return value
+        return shifted.isoformat(timespec='milliseconds' if '.' in value else 'seconds')
+    return value
@@ -0,0 +1,58 @@
+"""
+Record real Garmin Connect responses as replay fixtures.
+
+Logs in with your Garmin credentials through RecordingTransport, syncs the
+last N nights, and writes every connectapi response to the fixture
+directory. The username is replaced and obvious profile fields are blanked,
+but the nights are your real sleep data: keep the fixtures out of git.
+Replay them with ReplayGarminServer (see bench_garmin_load.py).
+
+Usage (from backend/):
+    python -m benchmarks.record_garmin you@example.com fixtures/garmin [--days 30]
+The password is read from GARMIN_PASSWORD or prompted for.
+"""
+
+import argparse
+import getpass
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+from app.services.garmin import GarminConnectService
+from app.services.garmin_cache import SleepPayloadCache
+from app.services.garmin_transport import RecordingTransport
+from app.services.storage import User, store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Record Garmin Connect responses as replay fixtures.')
+    parser.add_argument('email')
+    parser.add_argument('fixture_dir', type=Path)
+    parser.add_argument('--days', type=int, default=30, help='nights to record')
+    args = parser.parse_args()
+    password = os.getenv('GARMIN_PASSWORD') or getpass.getpass('Garmin password: ')
+
+    with tempfile.TemporaryDirectory() as scratch:
+        service = GarminConnectService()
+        service.transport = RecordingTransport(args.fixture_dir)
+        service.token_root = Path(scratch) / 'tokens'
+        # Start from an empty cache so every night is actually requested
+        service.cache = SleepPayloadCache(Path(scratch) / 'cache')
+        service.allow_sample = False
+
+        user = store.upsert_user(User(id=str(uuid.uuid4()), email=args.email))
+        result = service.connect(user=user, email=args.email, password=password)
+        if result['mfa_required']:
+            code = input('Garmin MFA code: ')
+            result = service.connect(user=user, mfa_token=result['mfa_token'], mfa_code=code)
+        if args.days > 30:
+            service.backfill_sleep(user=user, days=args.days - 30)
+        service.clients.discard(user.id)
+
+    fixtures = len(list(args.fixture_dir.glob('*.json')))
+    print(f"✅ {result['message']} Recorded {fixtures} responses in {args.fixture_dir}")
+
+
+if __name__ == '__main__':
+    main()
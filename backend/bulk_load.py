@@ -0,0 +1,65 @@
+"""
+Parse, validate and time a bulk load of many users' sleep and habit histories.
+
+Each file holds one user in the /me/import/csv layout (or NDJSON as written
+by /me/export?format=ndjson) and is named after the user, for example
+`alice@example.com.csv` or `synthetic-000042.csv` (→ synthetic-000042@sleephabits.app).
+Files are parsed and validated on a process pool and written in bulk.
+
+The store lives in memory, so this script cannot fill a running API: it
+loads into its own store to report bad files and rows and the throughput.
+To serve the data, start the API with BULK_LOAD_DIR pointing at the directory;
+it loads in the background and resumes from a checkpoint if it stops part-way.
+
+Usage (from backend/):
+    python generate_synthetic_data.py --users 1000 --years 3 --out data/synthetic
+    python bulk_load.py data/synthetic --workers 4
+    BULK_LOAD_DIR=data/synthetic uvicorn app.main:app
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from app.services.bulk_load import BulkLoader, BulkLoadReport
+
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Dry-run a bulk load of per-user SleepHabits files.')
+    parser.add_argument('directory', type=Path)
+    parser.add_argument('--workers', type=int, default=0, help='parser processes (default: CPU count)')
+    args = parser.parse_args()
+
+    last_report = [time.perf_counter()]
+
+    def show_progress(report: BulkLoadReport) -> None:
+        now = time.perf_counter()
+        if now - last_report[0] < PROGRESS_INTERVAL:
+            return
+        last_report[0] = now
+        done = report.files_loaded + len(report.failed)
+        print(
+            f"  {done}/{report.files_total} files, {report.rows_processed:,} rows "
+            f"({report.rows_per_second:,.0f} rows/s)",
+            file=sys.stderr,
+        )
+
+    report = BulkLoader().load_directory(args.directory, workers=args.workers, progress=show_progress)
+
+    print(
+        f"✅ Loaded {report.files_loaded} users: {report.sleep_imported:,} sleep sessions and "
+        f"{report.habits_imported:,} habit checkins in {report.elapsed:.1f}s "
+        f"({report.rows_per_second:,.0f} rows/s)"
+    )
+    if report.error_count:
+        print(f"⚠️  {report.error_count} rows could not be parsed")
+    for name, error in report.failed:
+        print(f"❌ {name}: {error}")
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
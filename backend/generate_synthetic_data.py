@@ -1,246 +1,303 @@
 """
-Generate realistic synthetic sleep and habit data for testing.
+Generate realistic synthetic sleep and habit data for testing and load runs.
 
-Creates 3 months of data (July 7 - Oct 7, 2025) with realistic patterns:
+Every user gets their own traits (baseline score, chronotype, how often they
+do each habit) and a seeded random stream, so any user can be regenerated on
+its own and shards can be produced by independent processes:
 - Weekends: tend to sleep later, more alcohol
-- Good nights: meditation, reading, no alcohol → better sleep scores
-- Bad nights: late bedtime, alcohol, screens → worse sleep scores
+- Good nights: meditation, reading, no screens → better sleep scores
+- Bad nights: late bedtime, alcohol → worse sleep scores
 - Some random variation for realism
 
-Output: sleep_habits_export.csv
+Random numbers are drawn as one block of bytes per user (a single C call)
+and turned into per-day columns, instead of calling `random` per value.
+
+Usage (from backend/):
+    python generate_synthetic_data.py
+        → one user, July 7 - Oct 7 2025, written to sleep_habits_export.csv
+    python generate_synthetic_data.py --users 10000 --years 3 --out data/synthetic --workers 8
+        → one CSV (or --format ndjson) file per user, sharded across processes
+
+populate_store() loads users straight into an in-process store; it is meant
+for tests and benchmarks and has no command-line flag.
 """
 
-import csv
+import argparse
+import json
+import os
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
 from datetime import date, timedelta
-from typing import List, Dict, Any
-
-
-def generate_realistic_sleep_data(start_date: date, end_date: date) -> List[Dict[str, Any]]:
-    """Generate realistic sleep sessions with correlated habits."""
-    
-    data = []
-    current_date = start_date
-    
-    # Habit IDs (matching the default habits from the system)
-    habits = {
-        'reading': 'habit-read',
-        'meditation': 'habit-meditate',
-        'no_screens': 'habit-no-screens',
-        'alcohol': 'habit-alcohol',
-        'consistent_bedtime': 'habit-consistent-bedtime',
-    }
-    
-    while current_date <= end_date:
-        is_weekend = current_date.weekday() >= 5  # Saturday=5, Sunday=6
-        
-        # Base patterns
-        if is_weekend:
-            # Weekends: more likely to stay up late, drink alcohol
-            base_bedtime_hour = random.choice([23, 0, 1])  # 11pm, midnight, 1am
-            alcohol_chance = 0.6
-            meditation_chance = 0.2
-            reading_chance = 0.4
-        else:
-            # Weekdays: more consistent bedtime
-            base_bedtime_hour = random.randint(22, 23)  # 10pm - 11pm
-            alcohol_chance = 0.2
-            meditation_chance = 0.5
-            reading_chance = 0.6
-        
-        # Determine habits for tonight
-        did_reading = random.random() < reading_chance
-        did_meditation = random.random() < meditation_chance
-        did_alcohol = random.random() < alcohol_chance
-        # If drinking, how many drinks? (1-4)
-        alcohol_count = random.randint(1, 4) if did_alcohol else 0
-        did_no_screens = random.random() < (0.7 if did_meditation else 0.3)
-        
-        # Consistent bedtime if went to bed around the same time
-        bedtime_hour = base_bedtime_hour + random.randint(-1, 1)
-        # Normalize to 0-23 range (handle wraparound)
-        while bedtime_hour >= 24:
-            bedtime_hour -= 24
-        while bedtime_hour < 0:
-            bedtime_hour += 24
-            
-        did_consistent_bedtime = 22 <= bedtime_hour <= 23
-        
-        bedtime_minute = random.randint(0, 59)
-        bedtime = f"{bedtime_hour:02d}:{bedtime_minute:02d}"
-        
-        # Calculate sleep quality based on habits
-        base_score = 70
-        
-        # Positive habits increase score
-        if did_reading:
-            base_score += random.randint(3, 8)
-        if did_meditation:
-            base_score += random.randint(5, 12)
-        if did_no_screens:
-            base_score += random.randint(4, 9)
-        if did_consistent_bedtime:
-            base_score += random.randint(2, 6)
-        
-        # Negative habits decrease score
-        if did_alcohol:
-            # More drinks = worse sleep
-            base_score -= random.randint(8, 15) + (alcohol_count - 1) * 3
-        if bedtime_hour >= 0 and bedtime_hour < 2:  # Very late bedtime
-            base_score -= random.randint(5, 10)
-        
-        # Add some random variation
-        base_score += random.randint(-5, 5)
-        
-        # Clamp score to 0-100
-        sleep_score = max(40, min(100, base_score))
-        
-        # Duration correlates with score
-        if sleep_score >= 80:
-            duration_hours = random.uniform(7.5, 9.0)
-        elif sleep_score >= 65:
-            duration_hours = random.uniform(6.5, 8.0)
-        else:
-            duration_hours = random.uniform(5.5, 7.0)
-        
-        duration_minutes = int(duration_hours * 60)
-        
-        # Calculate wake time (handle day wraparound)
-        total_minutes = bedtime_hour * 60 + bedtime_minute + duration_minutes
-        wake_hour = (total_minutes // 60) % 24
-        wake_minute = total_minutes % 60
-        wake_time = f"{wake_hour:02d}:{wake_minute:02d}"
-        
-        # Add sleep entry
-        data.append({
+from typing import Dict, Iterator, List, Tuple, Union
+
+CSV_HEADER = 'type,date,sleep_score,duration_minutes,bedtime,wake_time,habit_id,habit_name,value\n'
+
+# habit_id, name, weekday chance, weekend chance, score effect when done
+HABITS = [
+    ('habit-read', 'Read ≥15 minutes', 0.6, 0.4, 5),
+    ('habit-meditate', 'Meditate ≥10 minutes', 0.5, 0.2, 8),
+    ('habit-no-screens', 'No screens last hour', 0.45, 0.35, 6),
+    ('habit-alcohol', 'Consumed alcohol', 0.2, 0.6, -11),
+]
+CONSISTENT_BEDTIME = ('habit-consistent-bedtime', 'Bedtime between 22:30-23:30')
+BYTES_PER_DAY = len(HABITS) + 4  # habits, drinks, bedtime, score noise, duration
+
+
+@dataclass
+class UserHistory:
+    """Column-oriented history for one synthetic user."""
+
+    user_index: int
+    dates: List[date]
+    sleep_scores: List[int]
+    durations: List[int]
+    bedtimes: List[str]
+    wake_times: List[str]
+    # habit_id -> per-day value (False/0 when not done)
+    habits: Dict[str, List[Union[bool, int]]] = field(default_factory=dict)
+
+    @property
+    def email(self) -> str:
+        return f'synthetic-{self.user_index:06d}@sleephabits.app'
+
+    def rows(self) -> Iterator[Tuple[str, int, int, str, str, List[Tuple[str, str, Union[bool, int]]]]]:
+        """Per night: date, score, duration, bedtime, wake time and the habits done."""
+        names = dict((habit_id, name) for habit_id, name, *_ in HABITS)
+        names[CONSISTENT_BEDTIME[0]] = CONSISTENT_BEDTIME[1]
+        for i, day in enumerate(self.dates):
+            done = [
+                (habit_id, names[habit_id], values[i])
+                for habit_id, values in self.habits.items()
+                if values[i]
+            ]
+            yield day.isoformat(), self.sleep_scores[i], self.durations[i], self.bedtimes[i], self.wake_times[i], done
+
+
+def generate_user(user_index: int, start: date, days: int, seed: int = 0) -> UserHistory:
+    """Generate one user's correlated sleep and habit columns."""
+    rng = random.Random(seed * 1_000_003 + user_index)
+
+    # Per-user traits
+    base_score = rng.randint(62, 76)
+    chronotype = rng.randint(-60, 60)  # minutes relative to a 22:45 bedtime
+    propensity = [rng.uniform(0.6, 1.4) for _ in HABITS]
+
+    noise = rng.randbytes(days * BYTES_PER_DAY)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    weekend = [d.weekday() >= 5 for d in dates]
+
+    # Habit columns: a byte below the day's threshold means the habit was done
+    habits: Dict[str, List[Union[bool, int]]] = {}
+    thresholds = [
+        (int(weekday * p * 256), int(weekend_chance * p * 256))
+        for (_, _, weekday, weekend_chance, _), p in zip(HABITS, propensity)
+    ]
+    for h, (habit_id, *_rest) in enumerate(HABITS):
+        weekday_t, weekend_t = thresholds[h]
+        column = noise[h::BYTES_PER_DAY]
+        habits[habit_id] = [b < (weekend_t if we else weekday_t) for b, we in zip(column, weekend)]
+    drinks = [1 + b % 4 for b in noise[len(HABITS)::BYTES_PER_DAY]]
+    habits['habit-alcohol'] = [d if done else 0 for d, done in zip(drinks, habits['habit-alcohol'])]
+
+    # Bedtime in minutes after 22:45, later on weekends and when drinking
+    bed_noise = noise[len(HABITS) + 1::BYTES_PER_DAY]
+    bed_offsets = [
+        chronotype + (60 if we else 0) + (b - 128) * 90 // 128 + (20 if alcohol else 0)
+        for b, we, alcohol in zip(bed_noise, weekend, habits['habit-alcohol'])
+    ]
+    bed_minutes = [(22 * 60 + 45 + offset) % (24 * 60) for offset in bed_offsets]
+    habits[CONSISTENT_BEDTIME[0]] = [22 * 60 + 30 <= m <= 23 * 60 + 30 for m in bed_minutes]
+
+    # Score: baseline + habit effects + late-bedtime penalty + noise
+    effects = [effect for *_, effect in HABITS]
+    score_noise = noise[len(HABITS) + 2::BYTES_PER_DAY]
+    scores = []
+    for i in range(days):
+        score = base_score + score_noise[i] % 11 - 5
+        for h, (habit_id, *_rest) in enumerate(HABITS):
+            value = habits[habit_id][i]
+            if value:
+                score += effects[h] - (3 * (value - 1) if habit_id == 'habit-alcohol' else 0)
+        if habits[CONSISTENT_BEDTIME[0]][i]:
+            score += 4
+        if bed_minutes[i] < 2 * 60:  # very late bedtime
+            score -= 7
+        scores.append(max(40, min(100, score)))
+
+    # Duration correlates with score
+    duration_noise = noise[len(HABITS) + 3::BYTES_PER_DAY]
+    durations = [330 + (score - 40) * 2 + b % 60 for score, b in zip(scores, duration_noise)]
+    wake_times = [
+        f'{((m + d) // 60) % 24:02d}:{(m + d) % 60:02d}'
+        for m, d in zip(bed_minutes, durations)
+    ]
+    bedtimes = [f'{m // 60:02d}:{m % 60:02d}' for m in bed_minutes]
+
+    return UserHistory(
+        user_index=user_index,
+        dates=dates,
+        sleep_scores=scores,
+        durations=durations,
+        bedtimes=bedtimes,
+        wake_times=wake_times,
+        habits=habits,
+    )
+
+
+# Writers ---------------------------------------------------------------------
+def to_csv(history: UserHistory) -> str:
+    """Same columns as the /me/import/csv format, one night's rows together."""
+    parts = [CSV_HEADER]
+    for day, score, duration, bedtime, wake_time, done in history.rows():
+        parts.append(f'sleep,{day},{score},{duration},{bedtime},{wake_time},,,\n')
+        for habit_id, name, value in done:
+            parts.append(f'habit,{day},,,,,{habit_id},{name},{value}\n')
+    return ''.join(parts)
+
+
+def to_ndjson(history: UserHistory) -> str:
+    parts = []
+    for day, score, duration, bedtime, wake_time, done in history.rows():
+        parts.append(json.dumps({
             'type': 'sleep',
-            'date': current_date.isoformat(),
-            'sleep_score': sleep_score,
-            'duration_minutes': duration_minutes,
+            'date': day,
+            'sleep_score': score,
+            'duration_minutes': duration,
             'bedtime': bedtime,
             'wake_time': wake_time,
-        })
-        
-        # Add habit checkins
-        if did_reading:
-            data.append({
-                'type': 'habit',
-                'date': current_date.isoformat(),
-                'habit_id': habits['reading'],
-                'habit_name': 'Read ≥15 minutes',
-                'value': True,
-            })
-        
-        if did_meditation:
-            data.append({
-                'type': 'habit',
-                'date': current_date.isoformat(),
-                'habit_id': habits['meditation'],
-                'habit_name': 'Meditate ≥10 minutes',
-                'value': True,
-            })
-        
-        # Track alcohol consumption (unhealthy habit)
-        # Always log it - 0 if no alcohol, count if consumed
-        if did_alcohol:
-            data.append({
-                'type': 'habit',
-                'date': current_date.isoformat(),
-                'habit_id': habits['alcohol'],
-                'habit_name': 'Consumed alcohol',
-                'value': alcohol_count,  # Number of drinks
-            })
-        
-        if did_no_screens:
-            data.append({
+            'stage_minutes': {},
+        }, ensure_ascii=False))
+        for habit_id, name, value in done:
+            parts.append(json.dumps({
                 'type': 'habit',
-                'date': current_date.isoformat(),
-                'habit_id': habits['no_screens'],
-                'habit_name': 'No screens last hour',
-                'value': True,
-            })
-        
-        if did_consistent_bedtime:
-            data.append({
-                'type': 'habit',
-                'date': current_date.isoformat(),
-                'habit_id': habits['consistent_bedtime'],
-                'habit_name': 'Bedtime between 22:30-23:30',
-                'value': True,
-            })
-        
-        current_date += timedelta(days=1)
-    
-    return data
-
-
-def save_to_csv(data: List[Dict[str, Any]], filename: str):
-    """Save data to CSV file."""
-    
-    if not data:
-        print("No data to save")
+                'date': day,
+                'habit_id': habit_id,
+                'habit_name': name,
+                'value': value,
+            }, ensure_ascii=False))
+    parts.append('')
+    return '\n'.join(parts)
+
+
+def load_into_store(history: UserHistory, target_store=None) -> Tuple[int, int]:
+    """Write one user's history through the store's bulk APIs."""
+    from app.services.habits import DEFAULT_HABITS
+    from app.services.storage import HabitCheckin, SleepSession, User, store
+
+    target_store = target_store or store
+    user = target_store.get_user_by_email(history.email)
+    if not user:
+        user = target_store.upsert_user(User(id=f'synthetic-{history.user_index:06d}', email=history.email))
+    if not target_store.list_habits(user.id):
+        target_store.set_habits(user.id, [replace(habit) for habit in DEFAULT_HABITS])
+    sessions = [
+        SleepSession(
+            user_id=user.id,
+            date=history.dates[i],
+            duration_minutes=history.durations[i],
+            sleep_score=history.sleep_scores[i],
+            bedtime=history.bedtimes[i],
+            wake_time=history.wake_times[i],
+            stage_minutes={},
+        )
+        for i in range(len(history.dates))
+    ]
+    checkins = [
+        HabitCheckin(user_id=user.id, habit_id=habit_id, local_date=history.dates[i], value=value)
+        for habit_id, values in history.habits.items()
+        for i, value in enumerate(values)
+        if value
+    ]
+    target_store.upsert_sleep_sessions(user.id, sessions)
+    target_store.record_checkins(checkins)
+    return len(sessions), len(checkins)
+
+
+def populate_store(users: int, years: float, seed: int = 0, start: date | None = None,
+                   target_store=None) -> Tuple[int, int]:
+    """Generate users in-process and load them straight into a store.
+
+    Library-only, for tests and benchmarks that share the process with the
+    store: a command-line run would fill a store that exits with it. For a
+    running API, write files with --out and start it with BULK_LOAD_DIR.
+    """
+    days = int(round(years * 365))
+    start = start or date.today() - timedelta(days=days)
+    sessions = checkins = 0
+    for user_index in range(users):
+        added = load_into_store(generate_user(user_index, start, days, seed), target_store)
+        sessions += added[0]
+        checkins += added[1]
+    return sessions, checkins
+
+
+def write_shard(job: Tuple[range, str, str, date, int, int]) -> Tuple[int, int]:
+    """Generate and write a contiguous range of users; runs in a worker process."""
+    user_range, out_dir, fmt, start, days, seed = job
+    render = to_ndjson if fmt == 'ndjson' else to_csv
+    rows = 0
+    for user_index in user_range:
+        history = generate_user(user_index, start, days, seed)
+        text = render(history)
+        path = os.path.join(out_dir, f'synthetic-{user_index:06d}.{fmt}')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        rows += text.count('\n') - (1 if fmt == 'csv' else 0)
+    return len(user_range), rows
+
+
+def write_shards(users: int, years: float, out_dir: str, fmt: str = 'csv', workers: int = 0,
+                 seed: int = 0, start: date | None = None, users_per_shard: int = 100) -> Tuple[int, int]:
+    days = int(round(years * 365))
+    start = start or date.today() - timedelta(days=days)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [
+        (range(first, min(first + users_per_shard, users)), out_dir, fmt, start, days, seed)
+        for first in range(0, users, users_per_shard)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = list(map(write_shard, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(write_shard, jobs))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Generate synthetic SleepHabits data.')
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--years', type=float, default=None, help='history length per user')
+    parser.add_argument('--start', type=date.fromisoformat, default=None, help='first night (YYYY-MM-DD)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+    parser.add_argument('--out', default=None, help='output directory for per-user files')
+    parser.add_argument('--workers', type=int, default=0, help='processes (default: CPU count)')
+    args = parser.parse_args()
+
+    if args.out is None and args.users == 1 and args.years is None:
+        # Classic single-user export used by HOW_TO_IMPORT_DATA.md
+        start, end = args.start or date(2025, 7, 7), date(2025, 10, 7)
+        print(f"Generating synthetic sleep and habit data from {start} to {end}...")
+        history = generate_user(0, start, (end - start).days + 1, args.seed)
+        with open('sleep_habits_export.csv', 'w', encoding='utf-8', newline='') as f:
+            f.write(to_csv(history))
+        habit_count = sum(1 for values in history.habits.values() for v in values if v)
+        print(f"✅ Saved {len(history.dates)} sleep entries and {habit_count} habit checkins to sleep_habits_export.csv")
+        print(f"\n📊 Average sleep score: {sum(history.sleep_scores) / len(history.sleep_scores):.1f}")
+        print(f"\n💡 Next step: Upload 'sleep_habits_export.csv' in the app!")
         return
-    
-    # Separate sleep and habit entries
-    sleep_entries = [d for d in data if d['type'] == 'sleep']
-    habit_entries = [d for d in data if d['type'] == 'habit']
-    
-    # Write to CSV
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        
-        # Header
-        writer.writerow(['type', 'date', 'sleep_score', 'duration_minutes', 'bedtime', 'wake_time', 'habit_id', 'habit_name', 'value'])
-        
-        # Write sleep entries
-        for entry in sleep_entries:
-            writer.writerow([
-                'sleep',
-                entry['date'],
-                entry['sleep_score'],
-                entry['duration_minutes'],
-                entry['bedtime'],
-                entry['wake_time'],
-                '',  # no habit_id
-                '',  # no habit_name
-                '',  # no value
-            ])
-        
-        # Write habit entries
-        for entry in habit_entries:
-            writer.writerow([
-                'habit',
-                entry['date'],
-                '',  # no sleep_score
-                '',  # no duration_minutes
-                '',  # no bedtime
-                '',  # no wake_time
-                entry['habit_id'],
-                entry['habit_name'],
-                entry['value'],
-            ])
-    
-    print(f"✅ Saved {len(sleep_entries)} sleep entries and {len(habit_entries)} habit checkins to {filename}")
+
+    out_dir = args.out or 'synthetic_data'
+    started = time.perf_counter()
+    users, rows = write_shards(
+        args.users, args.years or 1, out_dir, args.format, args.workers, args.seed, args.start
+    )
+    elapsed = time.perf_counter() - started
+    print(f"✅ Wrote {users} users / {rows:,} rows to {out_dir} in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
 
 
 if __name__ == '__main__':
-    # Generate data from July 7 to Oct 7, 2025 (3 months)
-    start = date(2025, 7, 7)
-    end = date(2025, 10, 7)
-    
-    print(f"Generating synthetic sleep and habit data from {start} to {end}...")
-    
-    data = generate_realistic_sleep_data(start, end)
-    
-    save_to_csv(data, 'sleep_habits_export.csv')
-    
-    # Print some statistics
-    sleep_count = sum(1 for d in data if d['type'] == 'sleep')
-    habit_count = sum(1 for d in data if d['type'] == 'habit')
-    avg_score = sum(d['sleep_score'] for d in data if d['type'] == 'sleep') / sleep_count
-    
-    print(f"\n📊 Statistics:")
-    print(f"   Sleep sessions: {sleep_count}")
-    print(f"   Habit checkins: {habit_count}")
-    print(f"   Average sleep score: {avg_score:.1f}")
-    print(f"\n💡 Next step: Upload 'sleep_habits_export.csv' in the app!")
+    main()
@@ -0,0 +1,42 @@
+"""
+Rebuild sleep sessions from the local cache of raw Garmin responses.
+
+Use this after changing how a SleepSession is derived from Garmin's
+daily_sleep_dto (stage mapping, score fields, ...): every cached night is
+parsed again and merged into the store, without any request to Garmin.
+
+The store lives in memory, so this script only checks what a rebuild
+yields (and prunes the cache with --prune). For the running API, start it
+with GARMIN_REPROCESS_CACHE=1 to rebuild the cached nights at startup.
+
+Usage (from backend/):
+    python reprocess_garmin_cache.py                 # every cached user
+    python reprocess_garmin_cache.py USER_ID ...     # selected users
+    python reprocess_garmin_cache.py --prune         # apply size/age limits first
+"""
+
+import argparse
+import time
+
+from app.services.garmin import GarminConnectService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Rebuild sleep sessions from cached Garmin responses.')
+    parser.add_argument('user_ids', nargs='*', help='limit to these users (default: all cached users)')
+    parser.add_argument('--prune', action='store_true', help='evict expired/oversized cache entries first')
+    args = parser.parse_args()
+
+    service = GarminConnectService()
+    if args.prune:
+        removed = service.cache.prune()
+        print(f"🧹 Removed {removed} cached payloads")
+
+    started = time.perf_counter()
+    counts = service.reprocess_from_cache(args.user_ids or None)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Rebuilt {counts['nights']} nights for {counts['users']} users from {service.cache.root} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,8 @@
+import io
+import time
+import zipfile
+
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -5,6 +10,13 @@ from app.main import app
 client = TestClient(app)
 
 
+@pytest.fixture(scope="module", autouse=True)
+def app_lifespan():
+    # Runs the app's startup and shutdown, which build and tear down its services
+    with client:
+        yield
+
+
 def authenticate(email: str = "codex@example.com") -> str:
     response = client.post("/auth/login", json={"email": email})
     assert response.status_code == 200, response.text
@@ -64,3 +76,1163 @@ def test_login_and_summary_flow() -> None:
     assert refreshed.status_code == 200
     refreshed_data = refreshed.json()
     assert refreshed_data["last_night"] is not None
+
+
+def test_access_tokens_are_signed_expire_and_revoke() -> None:
+    from app.services.tokens import AccessTokens, InvalidToken, MemoryRevocations
+
+    token = authenticate("tokens@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/me/summary", headers=headers).status_code == 200
+
+    body, _, signature = token.rpartition(".")
+    forged = body.replace(body.split(".")[0], "someone-else", 1) + "." + signature
+    response = client.get("/me/summary", headers={"Authorization": f"Bearer {forged}"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid token"
+
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+    response = client.get("/me/summary", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+
+    now = [1_000_000.0]
+    tokens = AccessTokens(secret=b"test", ttl=60, clock=lambda: now[0])
+    issued = tokens.issue("user-1")
+    assert tokens.verify(issued) == "user-1"
+    assert AccessTokens(secret=b"test", ttl=60, clock=lambda: now[0]).verify(issued) == "user-1"
+    with pytest.raises(InvalidToken):
+        AccessTokens(secret=b"other").verify(issued)
+    now[0] += 61
+    with pytest.raises(InvalidToken, match="expired"):
+        tokens.verify(issued)
+
+    # Workers sharing a revocation backend honour each other's logouts once their cache rechecks
+    shared = MemoryRevocations(clock=lambda: now[0])
+    workers = [AccessTokens(secret=b"test", ttl=60, clock=lambda: now[0], revocations=shared, recheck=5) for _ in range(2)]
+    issued = workers[0].issue("user-1")
+    assert workers[1].verify(issued) == "user-1"
+    workers[0].revoke(issued)
+    with pytest.raises(InvalidToken, match="revoked"):
+        workers[0].verify(issued)
+    assert workers[1].verify(issued) == "user-1"  # cached
+    now[0] += 5
+    with pytest.raises(InvalidToken, match="revoked"):
+        workers[1].verify(issued)
+
+
+def test_services_are_built_once_per_app(monkeypatch) -> None:
+    from app.services.garmin import GarminConnectService
+    from app.services.sleep import SleepService
+
+    services = app.state.services
+    assert services.sleep.habits is services.habits
+    assert services.sleep.garmin is services.garmin
+    assert services.auth.habits is services.habits
+
+    def fail(*args, **kwargs):
+        raise AssertionError("service constructed during a request")
+
+    monkeypatch.setattr(SleepService, "__init__", fail)
+    monkeypatch.setattr(GarminConnectService, "__init__", fail)
+    headers = {"Authorization": f"Bearer {authenticate('container@example.com')}"}
+    assert client.get("/me/summary", headers=headers).status_code == 200
+    assert client.get("/me/analytics", headers=headers).status_code == 200
+
+
+def test_lifespan_can_run_twice() -> None:
+    import subprocess
+    import sys
+
+    # A fresh process, so the first lifespan's shutdown is the last one
+    script = """
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.storage import store
+
+for _ in range(2):
+    with TestClient(app) as client:
+        assert len(store.listeners) == 1
+        token = client.post("/auth/login", json={"email": "twice@example.com"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/me/analytics", headers=headers).status_code == 200
+        job = client.post("/me/import/csv", files={"file": ("rows.csv", b"type,date\\n")}, headers=headers)
+        assert job.status_code == 202, job.text
+    assert store.listeners == []
+"""
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+
+def test_app_starts_without_loading_the_garmin_stack() -> None:
+    import subprocess
+    import sys
+
+    from benchmarks.bench_startup import LAZY_MODULES
+
+    check = (
+        "import sys; from fastapi.testclient import TestClient; from app.main import app\n"
+        "with TestClient(app) as client: assert client.get('/health').status_code == 200\n"
+        f"print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    )
+    result = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
+
+
+def test_habit_stats_repair_back_dated_checkins() -> None:
+    token = authenticate("streaks@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for day in ("2025-10-01", "2025-10-02", "2025-10-04", "2025-10-05"):
+        response = client.post(
+            "/me/habits/checkin",
+            json={"habit_id": "habit-read", "value": True, "local_date": day},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    def read_stats(as_of: str = "2025-10-05") -> dict:
+        response = client.get(f"/me/habits/stats?as_of={as_of}", headers=headers)
+        assert response.status_code == 200
+        return next(item for item in response.json() if item["habit_id"] == "habit-read")
+
+    stats = read_stats()
+    assert stats["current_streak"] == 2
+    assert stats["longest_streak"] == 2
+    assert stats["compliance_7d"] == round(4 / 7, 3)
+
+    # Back-filling the gap joins both runs into one streak
+    client.post(
+        "/me/habits/checkin",
+        json={"habit_id": "habit-read", "value": True, "local_date": "2025-10-03"},
+        headers=headers,
+    )
+    stats = read_stats()
+    assert stats["current_streak"] == 5
+    assert stats["longest_streak"] == 5
+
+    # Un-checking a day in the middle splits it again
+    client.post(
+        "/me/habits/checkin",
+        json={"habit_id": "habit-read", "value": False, "local_date": "2025-10-02"},
+        headers=headers,
+    )
+    stats = read_stats()
+    assert stats["current_streak"] == 3
+    assert stats["longest_streak"] == 3
+    assert stats["compliance_7d"] == round(4 / 7, 3)
+    assert stats["last_completed"] == "2025-10-05"
+
+    # Other dates are read relative to themselves and leave the counters alone
+    stats = read_stats("2025-10-04")
+    assert (stats["compliance_7d"], stats["compliance_30d"]) == (round(3 / 7, 3), round(3 / 30, 3))
+    stats = read_stats("2025-10-08")
+    assert (stats["compliance_7d"], stats["compliance_30d"]) == (round(3 / 7, 3), round(4 / 30, 3))
+    stats = read_stats("2026-03-01")
+    assert (stats["compliance_7d"], stats["compliance_90d"]) == (0.0, 0.0)
+    stats = read_stats()
+    assert stats["current_streak"] == 3
+    assert (stats["compliance_7d"], stats["compliance_30d"]) == (round(4 / 7, 3), round(4 / 30, 3))
+
+
+def wait_for_import(job_id: str, headers: dict) -> dict:
+    for _ in range(100):
+        response = client.get(f"/me/import/{job_id}", headers=headers)
+        assert response.status_code == 200, response.text
+        payload = response.json()
+        if payload["status"] not in ("queued", "running"):
+            return payload
+        time.sleep(0.05)
+    raise AssertionError(f"import {job_id} did not finish")
+
+
+def test_csv_import_streams_rows_in_batches() -> None:
+    token = authenticate("importer@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    csv_body = (
+        "type,date,sleep_score,duration_minutes,bedtime,wake_time,habit_id,habit_name,value\n"
+        "sleep,2025-07-07,82,456,22:35,06:11,,,\n"
+        "habit,2025-07-07,,,,,habit-read,Read,True\n"
+        "sleep,2025-07-08,68,412,23:45,06:37,,,\n"
+        "habit,2025-07-08,,,,,habit-alcohol,Alcohol,3\n"
+        "sleep,2025-07-08,70,420,23:30,06:30,,,\n"
+        "sleep,not-a-date,70,420,23:30,06:30,,,\n"
+    )
+
+    response = client.post(
+        "/me/import/csv",
+        files={"file": ("export.csv", csv_body.encode("utf-8"), "text/csv")},
+        headers=headers,
+    )
+    assert response.status_code == 202, response.text
+    payload = wait_for_import(response.json()["job_id"], headers)
+    assert payload["status"] == "completed"
+    assert payload["rows_processed"] == 6
+    assert payload["sleep_imported"] == 3
+    assert payload["habits_imported"] == 2
+    assert payload["error_count"] == 1
+    # Duplicate dates collapse to the last row for that night
+    assert payload["summary"]["last_night"]["date"] == "2025-07-08"
+    assert payload["summary"]["last_night"]["sleep_score"] == 70
+
+    # Uploading the same content again reuses the finished job
+    again = client.post(
+        "/me/import/csv",
+        files={"file": ("copy.csv", csv_body.encode("utf-8"), "text/csv")},
+        headers=headers,
+    )
+    assert again.json()["job_id"] == payload["job_id"]
+    # ... but the same bytes sent to another importer are a job of their own
+    as_garmin = client.post(
+        "/me/import/garmin",
+        files={"file": ("copy.csv", csv_body.encode("utf-8"), "text/csv")},
+        headers=headers,
+    )
+    assert as_garmin.json()["job_id"] != payload["job_id"]
+    wait_for_import(as_garmin.json()["job_id"], headers)
+
+    other = client.get(
+        f"/me/import/{payload['job_id']}",
+        headers={"Authorization": f"Bearer {authenticate('someone-else@example.com')}"},
+    )
+    assert other.status_code == 404
+
+
+def test_synthetic_shards_are_reproducible(tmp_path) -> None:
+    from datetime import date
+
+    from app.services.storage import InMemoryStore
+    from generate_synthetic_data import populate_store, write_shards
+
+    def shards(name: str, **kwargs) -> dict:
+        write_shards(5, 0.1, str(tmp_path / name), start=date(2025, 1, 1), **kwargs)
+        return {path.name: path.read_bytes() for path in (tmp_path / name).iterdir()}
+
+    first = shards("a", seed=3, workers=1, users_per_shard=2)
+    assert len(first) == 5
+    # Same seed, same files, however the users are split over processes
+    assert shards("b", seed=3, workers=2, users_per_shard=5) == first
+    assert shards("c", seed=4, workers=1) != first
+
+    target = InMemoryStore()
+    sessions, _ = populate_store(5, 0.1, seed=3, start=date(2025, 1, 1), target_store=target)
+    assert sessions == sum(text.count(b"\nsleep,") for text in first.values())
+
+
+def test_uploads_are_checked_and_parsed_off_the_event_loop(monkeypatch) -> None:
+    import asyncio
+    import threading
+
+    from app.routers import me
+    from app.services.executors import run_cpu, run_io
+
+    async def offloaded() -> tuple:
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        names = await asyncio.gather(
+            run_io(lambda: time.sleep(0.1) or threading.current_thread().name),
+            run_cpu(lambda: time.sleep(0.1) or threading.current_thread().name),
+        )
+        ticker.cancel()
+        return names, ticks
+
+    (io_thread, cpu_thread), ticks = asyncio.run(offloaded())
+    assert io_thread.startswith("io_") and cpu_thread.startswith("cpu_")
+    assert ticks >= 5  # the loop kept running while both calls blocked
+
+    headers = {"Authorization": f"Bearer {authenticate('uploads@example.com')}"}
+    missing = client.post("/me/import/csv", files={"other": ("rows.csv", b"type,date\n")}, headers=headers)
+    assert missing.status_code == 422
+    assert missing.json()["detail"] == "Upload must include a 'file' file part"
+    malformed = client.post("/me/import/csv", content=b"type,date\n", headers={**headers, "Content-Type": "text/plain"})
+    assert malformed.status_code == 422
+    assert malformed.json()["detail"].startswith("Malformed upload")
+
+    # Oversized bodies are refused, whether or not they declare their length
+    monkeypatch.setattr(me, "MAX_UPLOAD_BYTES", 1000)
+    big = b"type,date\n" + b"x" * 2000
+    declared = client.post("/me/import/csv", files={"file": ("rows.csv", big)}, headers=headers)
+    assert declared.status_code == 413
+    chunked = client.post(
+        "/me/import/csv",
+        content=iter([big[:600], big[600:]]),
+        headers={**headers, "Content-Type": "multipart/form-data; boundary=x"},
+    )
+    assert chunked.status_code == 413
+    monkeypatch.undo()
+
+    # Anonymous uploads are refused before the body is parsed
+    monkeypatch.setattr(me, "extract_upload", lambda *args: pytest.fail("parsed an anonymous upload"))
+    anonymous = client.post("/me/import/csv", files={"file": ("rows.csv", b"type,date\n")})
+    assert anonymous.status_code == 401
+
+
+def test_export_round_trips_through_import() -> None:
+    headers = {"Authorization": f"Bearer {authenticate('exporter@example.com')}"}
+    for day, score in (("2025-09-02", 71), ("2025-09-01", 80)):
+        client.post(
+            "/me/sleep/manual",
+            json={
+                "local_date": day,
+                "sleep_score": score,
+                "bedtime": "23:00",
+                "wake_time": "07:00",
+                "duration_minutes": 480,
+            },
+            headers=headers,
+        )
+    client.post(
+        "/me/habits/checkin",
+        json={"habit_id": "habit-alcohol", "value": 2, "local_date": "2025-09-01"},
+        headers=headers,
+    )
+
+    exported = client.get("/me/export?format=csv", headers=headers)
+    assert exported.status_code == 200
+    lines = exported.text.splitlines()
+    assert lines[0] == "type,date,sleep_score,duration_minutes,bedtime,wake_time,habit_id,habit_name,value"
+    assert lines[1].startswith("sleep,2025-09-01,80")
+    assert lines[2] == "habit,2025-09-01,,,,,habit-alcohol,Consumed alcohol,2"
+    assert lines[3].startswith("sleep,2025-09-02,71")
+
+    other = {"Authorization": f"Bearer {authenticate('importer-copy@example.com')}"}
+    job = client.post(
+        "/me/import/csv",
+        files={"file": ("export.csv", exported.content, "text/csv")},
+        headers=other,
+    ).json()
+    assert wait_for_import(job["job_id"], other)["error_count"] == 0
+    assert client.get("/me/export?format=csv", headers=other).text == exported.text
+
+    ndjson = client.get("/me/export?format=ndjson", headers=headers)
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    assert len(ndjson.text.splitlines()) == 3
+
+
+def test_compact_formats_and_compression() -> None:
+    import msgpack
+
+    from app.services.compression import compressed_bodies
+    from app.services.wire import columnar as columnar_layout
+
+    headers = {"Authorization": f"Bearer {authenticate('wire@example.com')}"}
+    for day in range(1, 29):
+        client.post(
+            "/me/sleep/manual",
+            json={
+                "local_date": f"2025-02-{day:02d}",
+                "sleep_score": 60 + day,
+                "bedtime": "23:00",
+                "wake_time": "07:00",
+                "duration_minutes": 480,
+            },
+            headers=headers,
+        )
+
+    plain = client.get("/me/sleep/timeline?range=month", headers=headers)
+    rows = plain.json()["timeline"]
+    assert len(rows) == 28
+    assert plain.headers["content-encoding"] == "br"
+
+    columnar = client.get(
+        "/me/sleep/timeline?range=month",
+        headers={**headers, "Accept": "application/vnd.sleephabits.columnar+json"},
+    )
+    columns = columnar.json()["timeline"]
+    assert columns["sleep_score"] == [row["sleep_score"] for row in rows]
+    assert columns["date"] == [row["date"] for row in rows]
+    assert columnar_layout([{"a": 1, "s": {"deep": 2}}, {"a": 3, "s": {"deep": 4, "rem": 5}}]) == {
+        "a": [1, 3],
+        "s": {"deep": [2, 4], "rem": [None, 5]},
+    }
+
+    packed = client.get(
+        "/me/sleep/timeline?range=month",
+        headers={**headers, "Accept": "application/json;q=0.5, application/msgpack", "Accept-Encoding": "gzip"},
+    )
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert packed.headers["content-encoding"] == "gzip"
+    assert msgpack.unpackb(packed.content)["timeline"] == rows
+    assert len(packed.content) < len(plain.content)
+
+    hits = compressed_bodies.hits
+    client.get("/me/sleep/timeline?range=month", headers=headers)
+    assert compressed_bodies.hits == hits + 1
+
+    small = client.get("/me/sleep/timeline?range=week", headers={**headers, "Accept-Encoding": "br;q=0, gzip;q=0"})
+    assert "content-encoding" not in small.headers
+    small = client.get("/me/summary", headers=headers)
+    assert "content-encoding" not in small.headers
+
+
+def test_rate_limits_are_per_user_and_weighted(monkeypatch) -> None:
+    from app.services.rate_limit import MemoryBackend, Quota, Rule, rate_limiter
+
+    now = [0.0]
+    backend = MemoryBackend(clock=lambda: now[0])
+    rules = (
+        Rule("garmin", ("POST",), "/garmin/", Quota(limit=60, period=60, burst=60), costs={"/garmin/pull": 30}),
+        Rule("default", (), "/", Quota(limit=1000, period=1, burst=1000)),
+    )
+    monkeypatch.setattr(rate_limiter, "backend", backend)
+    monkeypatch.setattr(rate_limiter, "rules", rules)
+
+    heavy = {"Authorization": f"Bearer {authenticate('heavy@example.com')}"}
+    light = {"Authorization": f"Bearer {authenticate('light@example.com')}"}
+    for _ in range(2):
+        assert client.post("/garmin/pull", headers=heavy).status_code != 429
+    limited = client.post("/garmin/pull", headers=heavy)
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "30"
+    # Other routes and other users have their own counters
+    assert client.get("/me/summary", headers=heavy).status_code == 200
+    assert client.post("/garmin/pull", headers=light).status_code != 429
+
+    now[0] += 30
+    assert client.post("/garmin/pull", headers=heavy).status_code != 429
+
+    bounded = MemoryBackend(max_keys=2, clock=lambda: now[0])
+    for key in ("a", "b", "c"):
+        bounded.acquire(key, 1, rules[1].quota)
+    assert list(bounded.tats) == ["b", "c"]
+
+
+def test_garmin_export_zip_import() -> None:
+    headers = {"Authorization": f"Bearer {authenticate('garmin-export@example.com')}"}
+    sleep_report = (
+        "\ufeffDate,Avg Score,Avg Quality,Avg Duration,Avg Sleep Need,Avg Bedtime,Avg Wake Time\n"
+        "Jan 1-7,76,Fair,7h 40min,8h 14min,12:12 AM,8:09 AM\n"
+        "Dec 25-31, 2024,--,--,--,--,--,--\n"
+        "Dec 18-24, 2024,80,Good,8h 2min,8h 0min,11:35 PM,7:48 AM\n"
+    )
+    daily_report = (
+        "Date,Score,Quality,Duration,Sleep Need,Bedtime,Wake Time\n"
+        "Jan 7,76,Fair,7h 40min,8h 14min,12:12 AM,8:09 AM\n"
+        "Jan 6,--,--,--,--,--,--\n"
+        "Dec 31, 2024,80,Good,8h 2min,8h 0min,11:35 PM,7:48 AM\n"
+    )
+    activities = (
+        "Activity Type,Date,Favorite,Title,Distance,Calories,Time,Avg HR,Max HR,Training Stress Score®,Steps,Elapsed Time\n"
+        'Running,2025-01-03 19:06:32,false,"Evening Run","8.98","657","00:47:58","139","159","41.5","7,902","00:50:07"\n'
+    )
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as bundle:
+        bundle.writestr("DI_CONNECT/Sleep.csv", sleep_report.encode("utf-8"))
+        bundle.writestr("DI_CONNECT/Sleep_daily.csv", daily_report.encode("utf-8"))
+        bundle.writestr("DI_CONNECT/Activities.csv", activities.encode("utf-8"))
+
+    response = client.post(
+        "/me/import/garmin",
+        files={"file": ("export.zip", archive.getvalue(), "application/zip")},
+        headers=headers,
+    )
+    assert response.status_code == 202, response.text
+    payload = wait_for_import(response.json()["job_id"], headers)
+    assert payload["status"] == "completed", payload
+    assert payload["sleep_imported"] == 2  # weekly averages are not spread over invented nights
+    assert payload["errors"] == ["Skipped 2 weekly sleep averages; export the daily sleep report instead"]
+    assert payload["activities_imported"] == 1
+    last_night = payload["summary"]["last_night"]
+    assert last_night["date"] == "2025-01-07"
+    assert last_night["duration_minutes"] == 460
+    assert last_night["bedtime"] == "00:12"
+
+    broken = io.BytesIO()
+    with zipfile.ZipFile(broken, "w") as bundle:
+        bundle.writestr("DI_CONNECT/2025_sleepData.json", b"{not json")
+    response = client.post(
+        "/me/import/garmin",
+        files={"file": ("broken.zip", broken.getvalue(), "application/zip")},
+        headers=headers,
+    )
+    payload = wait_for_import(response.json()["job_id"], headers)
+    assert payload["status"] == "failed"
+    assert payload["detail"].startswith("Failed to parse Garmin export: ")
+
+
+def test_activities_join_analytics_as_virtual_habits() -> None:
+    headers = {"Authorization": f"Bearer {authenticate('athlete@example.com')}"}
+    sleep_rows = ["type,date,sleep_score,duration_minutes,bedtime,wake_time,habit_id,habit_name,value"]
+    activity_rows = ["Activity Type,Date,Title,Training Stress Score®,Elapsed Time"]
+    for day in range(1, 11):
+        ran_late = day % 2 == 0
+        # Sessions are dated by the morning they end, so a run counts towards the next one
+        sleep_rows.append(f"sleep,2025-09-{day + 1:02d},{65 if ran_late else 82},450,23:00,06:30,,,")
+        start = "19:30:00" if ran_late else "07:15:00"
+        activity_rows.append(f"Running,2025-09-{day:02d} {start},Run,\"60.0\",00:45:00")
+
+    for path, body in (("/me/import/csv", sleep_rows), ("/me/import/garmin", activity_rows)):
+        job = client.post(
+            path,
+            files={"file": ("upload.csv", "\n".join(body).encode("utf-8"), "text/csv")},
+            headers=headers,
+        ).json()
+        assert wait_for_import(job["job_id"], headers)["status"] == "completed"
+
+    analytics = client.get("/me/analytics", headers=headers).json()
+    by_id = {item["habit_id"]: item for item in analytics["correlations"]}
+    evening = by_id["activity-run-evening"]
+    assert evening["sample_size_with"] == 5
+    assert evening["avg_score_with_habit"] == 65
+    assert evening["avg_score_without_habit"] == 82
+
+    # Bulk inserts merge newest-first batches; a repeated start and type replaces the row
+    from datetime import datetime, timedelta
+
+    from app.services.activity_log import Activity, ActivityLog
+
+    first = datetime(2025, 9, 1, 7)
+    runs = [Activity("bulk", "Running", first + timedelta(hours=9 * i), distance_km=float(i)) for i in range(50)]
+    log = ActivityLog("bulk")
+    log.add_many(runs[25:][::-1])
+    log.add_many(runs[:25][::-1] + [Activity("bulk", "Running", runs[3].start, distance_km=99.0)])
+    assert list(log.starts) == sorted(log.starts) and len(log) == 50
+    assert [row.distance_km for row in log.iter_rows()][:5] == [0.0, 1.0, 2.0, 99.0, 4.0]
+    assert sum(night.count for night in log.nights.values()) == 50
+
+
+def test_bulk_load_directory_and_at_startup(tmp_path) -> None:
+    import os
+    import subprocess
+    import sys
+
+    from app.services.bulk_load import BulkLoader, Checkpoint
+
+    data = tmp_path / "users"
+    data.mkdir()
+    (data / "bulk-a@example.com.csv").write_text(
+        "type,date,sleep_score,duration_minutes,bedtime,wake_time,habit_id,habit_name,value\n"
+        "sleep,2025-09-01,81,470,23:00,06:50,,,\n"
+        "habit,2025-09-01,,,,,habit-read,Read,True\n"
+        "sleep,not-a-date,70,400,23:00,06:00,,,\n",
+        encoding="utf-8",
+    )
+    (data / "bulk-b.ndjson").write_text(
+        '{"type": "sleep", "date": "2025-09-02", "sleep_score": 64, "duration_minutes": 400, '
+        '"bedtime": "00:10", "wake_time": "06:50", "stage_minutes": {}}\n'
+        '{"type": "habit", "date": "2025-09-02", "habit_id": "habit-alcohol", "value": 3}\n',
+        encoding="utf-8",
+    )
+    (data / "broken.csv").write_text("not a header\n", encoding="utf-8")
+
+    checkpoint = Checkpoint(tmp_path / "checkpoint", owner="store-1")
+    report = BulkLoader().load_directory(data, workers=1, checkpoint=checkpoint)
+    checkpoint.close()
+    assert (report.files_loaded, report.sleep_imported, report.habits_imported) == (2, 2, 2)
+    assert report.error_count == 1
+    assert [name for name, _ in report.failed] == ["broken.csv"]
+
+    headers = {"Authorization": f"Bearer {authenticate('bulk-a@example.com')}"}
+    lines = client.get("/me/export?format=csv", headers=headers).text.splitlines()
+    assert lines[1:] == ["sleep,2025-09-01,81,470,23:00,06:50,,,", "habit,2025-09-01,,,,,habit-read,Read ≥15 minutes,True"]
+    headers = {"Authorization": f"Bearer {authenticate('bulk-b@sleephabits.app')}"}
+    stats = client.get("/me/habits/stats?as_of=2025-09-02", headers=headers).json()
+    assert next(s for s in stats if s["habit_id"] == "habit-alcohol")["current_streak"] == 1
+
+    # The same store resumes; another store (a new process) loads everything again
+    resumed = BulkLoader().load_directory(data, workers=1, checkpoint=Checkpoint(tmp_path / "checkpoint", owner="store-1"))
+    assert (resumed.files_skipped, resumed.files_loaded, len(resumed.failed)) == (2, 0, 1)
+    fresh = BulkLoader().load_directory(data, workers=1, checkpoint=Checkpoint(tmp_path / "checkpoint", owner="store-2"))
+    assert (fresh.files_skipped, fresh.files_loaded) == (0, 2)
+
+    # An app started with BULK_LOAD_DIR loads in the background, and a second
+    # lifespan in the same process only loads the file that failed before
+    script = """
+import sys
+from pathlib import Path
+from fastapi.testclient import TestClient
+from app.main import app
+
+with TestClient(app) as client:
+    report = app.state.services.startup_load.wait(30)
+    print(report.files_loaded, report.files_skipped, len(report.failed))
+    token = client.post("/auth/login", json={"email": "bulk-b@sleephabits.app"}).json()["access_token"]
+    print(client.get("/me/export?format=csv", headers={"Authorization": f"Bearer {token}"}).text)
+(Path(sys.argv[1]) / "broken.csv").write_text("type,date\\n", encoding="utf-8")
+with TestClient(app):
+    report = app.state.services.startup_load.wait(30)
+    print(report.files_loaded, report.files_skipped, len(report.failed))
+"""
+    env = {**os.environ, "BULK_LOAD_DIR": str(data)}
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(data)], env=env, capture_output=True, text=True, check=True
+    )
+    lines = result.stdout.splitlines()
+    assert lines[0] == "2 0 1"
+    assert lines[2:4] == [
+        "sleep,2025-09-02,64,400,00:10,06:50,,,",
+        "habit,2025-09-02,,,,,habit-alcohol,Consumed alcohol,3",
+    ]
+    assert lines[-1] == "1 2 0"
+
+
+def test_garmin_day_fetches_run_concurrently_and_tolerate_failures() -> None:
+    from datetime import date, timedelta
+
+    from app.services.garmin import GarminConnectService
+    from benchmarks.fake_garmin import FakeGarminServer
+
+    days = [date(2025, 9, 30) - timedelta(days=offset) for offset in range(16)]
+    with FakeGarminServer(latency=0.1, failing=[days[3]], missing=[days[5]]) as server:
+        started = time.perf_counter()
+        found, failed = GarminConnectService().fetch_sleep_days(server.client(), days)[:2]
+        elapsed = time.perf_counter() - started
+
+    assert failed == [days[3]]
+    assert sorted(found) == sorted(set(days) - {days[3], days[5]})
+    assert found[days[0]].daily_sleep_dto.calendar_date == days[0]
+    assert elapsed < 16 * 0.1 / 2
+
+
+def test_garmin_sync_is_incremental_and_backfills(monkeypatch) -> None:
+    from datetime import date, timedelta
+
+    from app.services import garmin
+    from app.services.garmin import GarminConnectService
+    from app.services.rate_limit import MemoryBackend, rate_limiter
+    from app.services.storage import GarminAccount, store
+    from benchmarks.fake_garmin import FakeGarminServer
+
+    headers = {"Authorization": f"Bearer {authenticate('incremental@example.com')}"}
+    user = store.get_user_by_email("incremental@example.com")
+    store.set_garmin_account(GarminAccount(user_id=user.id, email=user.email, token_path="unused"))
+    today = date.today()
+    manual_day = (today - timedelta(days=400)).isoformat()
+    client.post(
+        "/me/sleep/manual",
+        json={"local_date": manual_day, "sleep_score": 70, "bedtime": "23:00", "wake_time": "07:00", "duration_minutes": 480},
+        headers=headers,
+    )
+
+    with FakeGarminServer(latency=0, history_start=today - timedelta(days=50)) as server:
+        garth_client = server.client()
+        monkeypatch.setattr(GarminConnectService, "_client_for", lambda self, user, account: garth_client)
+
+        assert client.post("/garmin/pull", headers=headers).status_code == 200
+        assert server.sleep_requests == 30
+        assert client.post("/garmin/pull", headers=headers).status_code == 200
+        assert server.sleep_requests == 30  # just synced: answered from the store
+        monkeypatch.setattr(garmin, "PULL_FRESH_SECONDS", 0)
+        assert client.post("/garmin/pull", headers=headers).status_code == 200
+        assert server.sleep_requests == 31  # only tonight is fetched again
+
+        backfill = client.post("/garmin/backfill?days=60", headers=headers).json()
+        assert backfill["nights_imported"] == 21
+        assert backfill["complete"] is False  # one empty month isn't the end
+        assert server.sleep_requests == 31 + 60
+        again = client.post("/garmin/backfill", headers=headers).json()
+        assert (again["nights_imported"], again["complete"]) == (0, True)
+        assert server.sleep_requests == 91 + 60  # stops after 90 empty nights in a row
+        monkeypatch.setattr(rate_limiter, "backend", MemoryBackend())  # past the hourly Garmin burst
+        done = client.post("/garmin/backfill", headers=headers).json()
+        assert (done["nights_imported"], server.sleep_requests) == (0, 151)
+
+    dates = {s.date for s in store.list_sleep_sessions(user.id)}
+    assert len(dates) == 52
+    assert date.fromisoformat(manual_day) in dates
+
+
+def test_concurrent_garmin_pulls_share_one_sync(monkeypatch) -> None:
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.services import garmin
+    from app.services.garmin import GarminConnectService, sync_flights
+    from app.services.storage import GarminAccount, store
+    from app.services.token_bucket import TokenBucket
+    from benchmarks.fake_garmin import FakeGarminServer
+
+    authenticate("single-flight@example.com")
+    user = store.get_user_by_email("single-flight@example.com")
+    store.set_garmin_account(GarminAccount(user_id=user.id, email=user.email, token_path="unused"))
+    sleep_service = app.state.services.sleep
+
+    async def pull_from_devices(count: int) -> list:
+        return await asyncio.gather(*(sleep_service.pull_latest(user) for _ in range(count)))
+
+    with FakeGarminServer(latency=0.05) as server:
+        garth_client = server.client()
+        monkeypatch.setattr(GarminConnectService, "_client_for", lambda self, user, account: garth_client)
+
+        started, shared = sync_flights.started, sync_flights.shared
+        summaries = asyncio.run(pull_from_devices(4))
+        assert server.sleep_requests == 30
+        assert (sync_flights.started - started, sync_flights.shared - shared) == (1, 3)
+        assert all(summary == summaries[0] for summary in summaries)
+
+        # Inside the freshness window the next pull doesn't reach Garmin
+        assert asyncio.run(pull_from_devices(1))[0]["last_night"] == summaries[0]["last_night"]
+        assert server.sleep_requests == 30
+
+        # A throttled background sync in flight is not joined by pulls or by other day counts
+        release = threading.Event()
+        sync = GarminConnectService._sync_recent_sleep
+
+        def held_background(self, user, days):
+            if self.throttle and days == 30:
+                release.wait(5)
+            return sync(self, user, days)
+
+        monkeypatch.setattr(GarminConnectService, "_sync_recent_sleep", held_background)
+        # Earlier tests' pulls have drawn the shared budget down; throttled syncs would wait it out
+        monkeypatch.setattr(garmin, "request_budget", TokenBucket(rate=100, capacity=100))
+        started, shared = sync_flights.started, sync_flights.shared
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            background = GarminConnectService(throttle=True).start_sync(user=user, executor=pool)
+            GarminConnectService().start_sync(user=user).result(timeout=5)
+            GarminConnectService(throttle=True).start_sync(user=user, days=7).result(timeout=5)
+            assert not background.done()
+            release.set()
+            background.result(timeout=5)
+        assert (sync_flights.started - started, sync_flights.shared - shared) == (3, 0)
+
+
+def test_event_stream_pushes_summaries_and_coalesces() -> None:
+    import asyncio
+    import json
+    from datetime import date
+
+    from app.routers.me import _event_stream
+    from app.services.events import event_bus
+    from app.services.storage import SleepSession, store
+
+    authenticate("events@example.com")
+    user = store.get_user_by_email("events@example.com")
+    sleep_service = app.state.services.sleep
+
+    def parse(message: bytes) -> tuple:
+        event, data = message.decode().strip().split("\n")
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def scenario() -> list:
+        subscription = event_bus.subscribe(user.id)
+        stream = _event_stream(subscription, event_bus, sleep_service, user)
+        received = [parse(await anext(stream))]
+
+        night = SleepSession(
+            user_id=user.id,
+            date=date(2025, 3, 1),
+            duration_minutes=450,
+            sleep_score=77,
+            bedtime="23:10",
+            wake_time="06:40",
+            stage_minutes={},
+        )
+        # Writers run on worker threads; several changes and progress updates pile up unread
+        await asyncio.to_thread(store.upsert_sleep_session, user.id, night)
+        await asyncio.to_thread(store.upsert_sleep_session, user.id, night)
+        for rows in (100, 200, 300):
+            await asyncio.to_thread(event_bus.publish, user.id, "import", {"rows_processed": rows}, ("import", "job-1"))
+        await asyncio.sleep(0.05)
+        received.append(parse(await asyncio.wait_for(anext(stream), 5)))
+        received.append(parse(await asyncio.wait_for(anext(stream), 5)))
+        await stream.aclose()
+        return received
+
+    received = asyncio.run(scenario())
+    assert received[0][0] == "summary"
+    assert received[0][1]["last_night"] is None
+    assert received[1] == ("import", {"rows_processed": 300})
+    assert received[2][0] == "summary"
+    assert received[2][1]["last_night"]["sleep_score"] == 77
+    assert not event_bus.watching(user.id)
+
+
+def test_garmin_client_pool_reuses_and_evicts_clients(tmp_path) -> None:
+    import json
+
+    from app.services.garmin_clients import GarminClientPool
+    from benchmarks.fake_garmin import FakeGarminServer
+
+    logins = []
+    with FakeGarminServer(latency=0) as server:
+
+        def login():
+            logins.append(1)
+            return server.client()
+
+        pool = GarminClientPool(max_size=1, idle_seconds=60)
+        first = pool.get("user-a", str(tmp_path / "a"), login)
+        assert pool.get("user-a", str(tmp_path / "a"), login) is first
+        assert (pool.hits, pool.misses, len(logins)) == (1, 1, 1)
+
+        pool.get("user-b", str(tmp_path / "b"), login)  # evicts user-a
+        assert pool.get("user-a", str(tmp_path / "a"), login) is not first
+        assert len(logins) == 3
+
+        # A token refreshed while the client was in use is written back
+        refreshed = pool.get("user-a", str(tmp_path / "a"), login)
+        refreshed.oauth2_token.access_token = "rotated"
+        pool.save_tokens("user-a")
+        saved = json.loads((tmp_path / "a" / "oauth2_token.json").read_text())
+        assert saved["access_token"] == "rotated"
+
+        pool.idle_seconds = 0
+        pool.get("user-a", str(tmp_path / "a"), login)
+        assert len(logins) == 4
+        pool.close()
+
+
+def test_garmin_scheduler_prioritises_active_users_and_backs_off(monkeypatch) -> None:
+    from datetime import datetime
+
+    from app.services import garmin
+    from app.services.garmin import GarminConnectService
+    from app.services.garmin_scheduler import GarminSyncScheduler
+    from app.services.storage import GarminAccount, store
+    from app.services.token_bucket import TokenBucket
+    from benchmarks.fake_garmin import FakeGarminServer
+
+    # Earlier tests' interactive pulls have drawn the shared budget down
+    monkeypatch.setattr(garmin, "request_budget", TokenBucket(rate=100, capacity=100))
+
+    users = []
+    for email in ("sched-idle@example.com", "sched-active@example.com"):
+        authenticate(email)
+        user = store.get_user_by_email(email)
+        store.set_garmin_account(GarminAccount(user_id=user.id, email=email, token_path="unused"))
+        users.append(user)
+    idle, active = users
+    idle.last_seen_at = None
+    active.last_seen_at = datetime.utcnow()
+
+    with FakeGarminServer(latency=0) as server:
+        garth_client = server.client()
+        monkeypatch.setattr(GarminConnectService, "_client_for", lambda self, user, account: garth_client)
+        offset = [0.0]
+        scheduler = GarminSyncScheduler(workers=0, interval=6 * 3600, active_interval=900, clock=lambda: time.time() + offset[0])
+        mine = {idle.id, active.id}
+
+        assert [u for u in scheduler.tick() if u in mine] == [active.id, idle.id]
+        assert not [u for u in scheduler.tick() if u in mine]
+
+        offset[0] = 1200  # past the active interval only
+        assert [u for u in scheduler.tick() if u in mine] == [active.id]
+
+        server.rate_limit = True
+        offset[0] = 2400
+        scheduler.tick()
+        metrics = scheduler.metrics()
+        assert metrics["rate_limited"] >= 1
+        assert metrics["paused_for_seconds"] >= 60
+        assert scheduler.tick() == []  # paused, nothing is started
+        assert scheduler.metrics()["queue_depth"] >= 1
+
+
+def test_throttled_syncs_wait_outside_the_fetch_pool(monkeypatch) -> None:
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import date, timedelta
+
+    from app.services import garmin
+    from app.services.garmin import GarminConnectService
+    from app.services.storage import GarminAccount, store
+    from app.services.token_bucket import TokenBucket
+    from benchmarks.fake_garmin import FakeGarminServer
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(garmin, "_fetch_pool", pool)
+    monkeypatch.setattr(garmin, "request_budget", TokenBucket(rate=10, capacity=1))
+    nights = [date(2025, 6, 1) + timedelta(days=offset) for offset in range(4)]
+
+    with FakeGarminServer(latency=0) as server:
+        garth_client = server.client()
+        background = threading.Thread(
+            target=GarminConnectService(throttle=True).fetch_sleep_days, args=(garth_client, nights)
+        )
+        started = time.perf_counter()
+        background.start()
+        time.sleep(0.05)
+        # The background sync is waiting for budget, but not on the only fetch worker
+        pull = GarminConnectService().fetch_sleep_days(garth_client, [date(2025, 7, 1)])
+        assert len(pull.found) == 1
+        assert time.perf_counter() - started < 0.2
+        background.join()
+        assert time.perf_counter() - started >= 0.3
+
+    # A 429 tells the client how long the budget needs for the nights it missed
+    email = "retry-after@example.com"
+    token = authenticate(email)
+    user = store.get_user_by_email(email)
+    store.set_garmin_account(GarminAccount(user_id=user.id, email=email, token_path="unused"))
+    budget = TokenBucket(rate=2, capacity=100)
+    budget.debit(100)
+    monkeypatch.setattr(garmin, "request_budget", budget)
+    with FakeGarminServer(latency=0) as server:
+        server.rate_limit = True
+        garth_client = server.client()
+        monkeypatch.setattr(GarminConnectService, "_client_for", lambda self, user, account: garth_client)
+        response = client.post("/garmin/pull", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 429
+    # 30 nights failed, after the pull itself put the bucket 30 tokens in debt
+    assert 25 <= int(response.headers["Retry-After"]) <= 30
+
+    # A profile that can't be loaded fails the pull with a 400, not a 500
+    class ProfileDown:
+        @property
+        def username(self) -> str:
+            raise ConnectionError("profile unavailable")
+
+    monkeypatch.setattr(GarminConnectService, "_client_for", lambda self, user, account: ProfileDown())
+    response = client.post("/garmin/pull", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Failed to load the Garmin profile: profile unavailable"
+    pool.shutdown()
+
+
+def test_garmin_payload_cache_skips_settled_nights_and_reprocesses(tmp_path, monkeypatch) -> None:
+    import os
+    import subprocess
+    import sys
+    from datetime import UTC, date, datetime, timedelta
+
+    from app.services.garmin import GarminConnectService
+    from app.services.garmin_cache import NOT_CACHED, SleepPayloadCache
+    from app.services.storage import GarminAccount, store
+    from benchmarks.fake_garmin import FakeGarminServer, sleep_payload
+
+    service = GarminConnectService()
+    service.cache = SleepPayloadCache(tmp_path / "cache")
+    old_nights = [date(2025, 9, 1) + timedelta(days=offset) for offset in range(5)]
+    today = datetime.now(tz=UTC).date()
+
+    with FakeGarminServer(latency=0, missing=[old_nights[2]]) as server:
+        garth_client = server.client()
+        first = service.fetch_sleep_days(garth_client, old_nights + [today], user_id="cache-user")
+        assert (len(first.found), server.sleep_requests) == (5, 6)
+        again = service.fetch_sleep_days(garth_client, old_nights + [today], user_id="cache-user")
+        assert sorted(again.found) == sorted(first.found)
+        assert server.sleep_requests == 7  # only today's night isn't final yet
+        # Garmin answers some empty nights with null; that is cached too, not a miss
+        empty_night = old_nights[0] - timedelta(days=1)
+        service.cache.put("cache-user", empty_night, None)
+        assert service.cache.get("cache-user", empty_night) is None
+        assert service.cache.get("cache-user", empty_night - timedelta(days=1)) is NOT_CACHED
+        assert not service.fetch_sleep_days(garth_client, [empty_night], user_id="cache-user").found
+        assert server.sleep_requests == 7
+
+    counts = service.reprocess_from_cache(["cache-user"])
+    assert counts == {"users": 1, "nights": 5}
+    assert {s.date for s in store.list_sleep_sessions("cache-user")} == set(first.found)
+
+    assert service.cache.prune() == 0
+    service.cache.max_age = timedelta(0)
+    assert service.cache.prune() >= 5
+    assert list(service.cache.iter_user("cache-user")) == []
+
+    # With GARMIN_REPROCESS_CACHE=1 the app rebuilds the cached nights when it starts
+    cache = SleepPayloadCache(tmp_path / "startup")
+    cache.put("cached-user", old_nights[0], sleep_payload(old_nights[0]))
+    cache.flush()
+    script = (
+        "from fastapi.testclient import TestClient\nfrom app.main import app\nfrom app.services.storage import store\n"
+        "with TestClient(app): print(len(store.list_sleep_sessions('cached-user')))"
+    )
+    env = {**os.environ, "GARMIN_CACHE_DIR": str(cache.root), "GARMIN_REPROCESS_CACHE": "1"}
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "1"
+
+    # Disconnecting forgets the login and the cached responses but keeps the nights
+    email = "disconnect@example.com"
+    headers = {"Authorization": f"Bearer {authenticate(email)}"}
+    user = store.get_user_by_email(email)
+    token_dir = tmp_path / "tokens"
+    token_dir.mkdir()
+    store.set_garmin_account(GarminAccount(user_id=user.id, email=email, token_path=str(token_dir)))
+    user.garmin_connected = True
+    monkeypatch.setattr(app.state.services.garmin.service, "cache", cache)
+    cache.put(user.id, old_nights[1], sleep_payload(old_nights[1]))
+    cache.flush()
+    assert app.state.services.garmin.reprocess_from_cache([user.id]) == {"users": 1, "nights": 1}
+
+    assert client.delete("/garmin/connect", headers=headers).status_code == 204
+    assert store.get_garmin_account(user.id) is None and not token_dir.exists()
+    assert cache.users() == ["cached-user"]
+    assert len(list(cache.root.rglob("*.json.gz"))) == 1  # only cached-user's payload is left
+    assert [session.date for session in store.list_sleep_sessions(user.id)] == [old_nights[1]]
+    assert client.get("/me/summary", headers=headers).json()["user"]["garmin_connected"] is False
+
+
+def test_sample_dataset_is_parsed_once_and_date_shifted(tmp_path) -> None:
+    import json
+    import os
+    from datetime import date
+
+    from app.services.sample_data import SAMPLE_FILE, SampleDataset
+
+    sample_file = tmp_path / "sample.json"
+    sample_file.write_text(SAMPLE_FILE.read_text())
+    dataset = SampleDataset(sample_file)
+
+    first = dataset.sessions_for("demo-a", today=date(2026, 1, 10))
+    second = dataset.sessions_for("demo-b", today=date(2026, 1, 10))
+    assert dataset.loads == 1
+    assert first[0].date == date(2026, 1, 10) and first[-1].date == date(2026, 1, 4)
+    assert first[0].stage_minutes is second[0].stage_minutes
+    assert {s.user_id for s in second} == {"demo-b"}
+
+    payload = json.loads(sample_file.read_text())
+    payload["sleep_sessions"] = payload["sleep_sessions"][:2]
+    sample_file.write_text(json.dumps(payload))
+    os.utime(sample_file, ns=(0, 1))
+    assert len(dataset.sessions_for("demo-a")) == 2
+    assert dataset.loads == 2
+
+
+def test_sample_data_replaces_the_previous_demo_nights(monkeypatch) -> None:
+    from datetime import date, timedelta
+
+    from app.services import garmin
+    from app.services.garmin import GarminConnectService
+    from app.services.sample_data import SampleDataset
+    from app.services.storage import SleepSession, User, store
+
+    user = store.upsert_user(User(id="demo-user", email="demo@example.com"))
+    service = GarminConnectService()
+    service.samples = SampleDataset()
+    manual = SleepSession(user_id=user.id, date=date(2020, 1, 1), duration_minutes=420, sleep_score=70,
+                          bedtime="23:00", wake_time="06:00", stage_minutes={})
+    store.upsert_sleep_sessions(user.id, [manual])
+
+    real_datetime = garmin.datetime
+    for shift in (2, 0):
+        class Shifted(real_datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return real_datetime.now(tz) - timedelta(days=shift)
+
+        monkeypatch.setattr(garmin, "datetime", Shifted)
+        nights = service._load_sample_data(user)
+
+    dates = [s.date for s in store.list_sleep_sessions(user.id)]
+    assert dates == [s.date for s in nights] + [manual.date]  # nothing left over from the earlier layout
+
+
+def test_garmin_transport_records_and_replays(tmp_path) -> None:
+    from app.services.garmin import GarminConnectService, GarminRateLimited
+    from app.services.garmin_cache import SleepPayloadCache
+    from app.services.garmin_transport import RecordingTransport
+    from app.services.storage import User, store
+    from benchmarks.fake_garmin import FakeGarminServer, ReplayGarminServer
+
+    def offline_service(transport) -> GarminConnectService:
+        service = GarminConnectService()
+        service.transport = transport
+        service.token_root = tmp_path / "tokens"
+        service.cache = SleepPayloadCache(tmp_path / f"cache-{id(transport)}")
+        service.allow_sample = False
+        return service
+
+    fixtures = tmp_path / "fixtures"
+    with FakeGarminServer(latency=0) as live:
+        recorder = offline_service(RecordingTransport(fixtures, inner=live.transport()))
+        recorded_user = store.upsert_user(User(id="recorded-user", email="recorded@example.com"))
+        result = recorder.connect(user=recorded_user, email="recorded@example.com", password="secret")
+        assert result["connected"] and len(result["summary"]) == 30
+    assert len(list(fixtures.glob("*.json"))) >= 31
+
+    with ReplayGarminServer(fixtures, latency=0) as replay:
+        service = offline_service(replay.transport())
+        user = store.upsert_user(User(id="replayed-user", email="replayed@example.com"))
+        result = service.connect(user=user, email="replayed@example.com", password="anything")
+        assert [s.date for s in result["summary"]] == [s.date for s in store.list_sleep_sessions("recorded-user")]
+        nights = service.backfill_sleep(user=user, days=10)
+        assert len(nights) == 10  # older nights are replayed from recorded ones
+
+        replay.rate_limit_rate = 1.0
+        service.cache = SleepPayloadCache(tmp_path / "cold")
+        with pytest.raises(GarminRateLimited):
+            service.sync_recent_sleep(user=user)
+
+
+def test_sleep_series_are_stored_compactly_and_downsampled(monkeypatch, tmp_path) -> None:
+    from datetime import date, timedelta
+
+    from app.services.garmin import GarminConnectService
+    from app.services.sleep_series import SleepSeriesStore, encode_night, series_from_payload
+    from app.services.storage import GarminAccount, store
+    from benchmarks.fake_garmin import FakeGarminServer, sleep_payload
+
+    headers = {"Authorization": f"Bearer {authenticate('series@example.com')}"}
+    user = store.get_user_by_email("series@example.com")
+    store.set_garmin_account(GarminAccount(user_id=user.id, email=user.email, token_path="unused"))
+    with FakeGarminServer(latency=0) as server:
+        garth_client = server.client()
+        monkeypatch.setattr(GarminConnectService, "_client_for", lambda self, user, account: garth_client)
+        assert client.post("/garmin/pull", headers=headers).status_code == 200
+
+    today = date.today()
+    raw = series_from_payload(sleep_payload(today))
+    full = client.get(f"/me/sleep/series?start={today}&end={today}&resolution=1", headers=headers).json()
+    assert full["nights"] == [today.isoformat()]
+    assert full["series"]["heart_rate"]["t"] == list(raw["heart_rate"].times)
+
+    month = client.get(f"/me/sleep/series?start={today - timedelta(days=29)}&series=heart_rate&max_points=200", headers=headers).json()
+    assert len(month["nights"]) == 30 and list(month["series"]) == ["heart_rate"]
+    heart_rate = month["series"]["heart_rate"]
+    assert len(heart_rate["t"]) <= 201
+    assert max(heart_rate["max"]) == max(raw["heart_rate"].values)  # extremes survive downsampling
+    assert min(heart_rate["min"]) == min(raw["heart_rate"].values)
+    assert client.get("/me/sleep/series?series=steps", headers=headers).status_code == 400
+
+    # On disk: nights are memory-mapped back, rewrites compact the file
+    on_disk = SleepSeriesStore(tmp_path)
+    for _ in range(3):
+        on_disk.put(user.id, today, raw)
+    on_disk.close()
+    reopened = SleepSeriesStore(tmp_path)
+    assert reopened.get(user.id, today) == raw
+    assert (tmp_path / f"{user.id}.bin").stat().st_size < 2 * (len(encode_night(raw)) + 8)
+
+
+def test_metrics_endpoint_reports_routes_stores_and_caches() -> None:
+    import threading
+
+    from app.services.metrics import Registry
+
+    headers = {"Authorization": f"Bearer {authenticate('metrics@example.com')}"}
+    for _ in range(3):
+        assert client.get("/me/summary", headers=headers).status_code == 200
+    assert client.get("/no-such-route").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    route = 'method="GET",route="/me/summary",status="200"'
+    count = next(line for line in lines if line.startswith(f"sleephabits_http_request_duration_seconds_count{{{route}}}"))
+    assert int(count.split()[-1]) >= 3
+    assert f'sleephabits_http_request_duration_seconds_bucket{{{route},le="+Inf"}} {count.split()[-1]}' in lines
+    assert any(line.startswith('sleephabits_http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}') for line in lines)
+    assert "sleephabits_http_requests_in_flight 1" in lines  # the scrape itself
+    users = next(line for line in lines if line.startswith('sleephabits_store_objects{kind="users"}'))
+    assert int(users.split()[-1]) >= 1
+    assert any(line.startswith('sleephabits_cache_hit_ratio{cache="access_tokens"}') for line in lines)
+
+    # Threads record into their own shards; nothing is lost without a lock
+    registry = Registry()
+    counter = registry.counter("test_total", "Test counter.", ("kind",))
+    histogram = registry.histogram("test_seconds", "Test histogram.", buckets=(0.5, 1.0))
+
+    def record() -> None:
+        for value in range(10_000):
+            counter.inc("a")
+            histogram.observe(value % 2)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rendered = registry.render().splitlines()
+    assert 'test_total{kind="a"} 80000' in rendered
+    assert 'test_seconds_bucket{le="0.5"} 40000' in rendered
+    assert 'test_seconds_bucket{le="+Inf"} 80000' in rendered
+    assert "test_seconds_sum 40000" in rendered